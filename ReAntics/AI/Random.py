@@ -21,6 +21,9 @@ from AIPlayerUtils import *
 ##
 class AIPlayer(Player):
 
+    #only reads the state it is given (see Player.acceptsStateView)
+    acceptsStateView = True
+
     #__init__
     #Description: Creates a new Player
     #
@@ -1,8 +1,13 @@
 import random
+import heapq
 from Constants import *
 from Ant import *
 from Construction import *
 from Move import *
+from CompactState import CompactState
+import Zobrist
+import BoardTables
+import GameRules
 
 #
 # AIPlayerUtils.py
@@ -12,8 +17,11 @@ from Move import *
 #
 # Important Note:  All the methods in this file that take a GameState object
 # will not attempt to access the 'board' member of the at object.  This makes
-# these routines safe for a GameState that has been generated via the
-# GameState.fastclone method.
+# these routines cheap for a GameState that has been generated via the
+# GameState.fastclone method (whose board is only built if it is read).
+#
+# The same methods also accept a CompactState (see CompactState.py), which
+# is a much cheaper representation to clone during search.
 #
 
 ##
@@ -114,6 +122,11 @@ def getConstrList(currentState,
 #
 # Return:  the construct at the coordinate or None if there is none
 def getConstrAt(state, coords):
+    coords = tuple(coords)
+    #states that keep a coordinate index of their constructs look it up
+    if hasattr(state, "getConstrAt"):
+        return state.getConstrAt(coords)
+
     #get a list of all constructs
     allConstrs = getConstrList(state)
 
@@ -136,7 +149,12 @@ def getConstrAt(state, coords):
 #
 # Return:  the ant at the coordinate or None if there is none
 def getAntAt(state, coords) -> Ant:
-    #get a list of all constructs
+    coords = tuple(coords)
+    #states that keep a coordinate index of their ants look it up
+    if hasattr(state, "getAntAt"):
+        return state.getAntAt(coords)
+
+    #get a list of all ants
     allAnts = getAntList(state)
 
     #search for one at the given coord
@@ -191,26 +209,16 @@ def getWinner(currentState):
 # Return: a list of all legal coords that are adjacent to the given space
 #
 def listAdjacent(coord):
+    #the common case: a legal coord tuple (see BoardTables.py)
+    try:
+        return list(BoardTables.ADJACENT[coord])
+    except (KeyError, TypeError):
+        pass
+
     #catch invalid inputs
     if not legalCoord(coord):
         return []
-
-    #this set of coord deltas represent movement in each cardinal direction
-    deltas = [ (-1, 0), (1, 0), (0, -1), (0, 1) ]
-    x = coord[0]
-    y = coord[1]
-    result = []
-
-    #calculate the cost after making each move
-    for delta in deltas:
-        newX = delta[0] + coord[0]
-        newY = delta[1] + coord[1]
-
-        #skip illegal moves
-        if legalCoord((newX, newY)):
-            result.append((newX, newY))
-
-    return result
+    return list(BoardTables.ADJACENT[(coord[0], coord[1])])
 
 ##
 # listAttackable
@@ -221,6 +229,12 @@ def listAdjacent(coord):
 # coord - the coordinate of the attacking ant
 # dist - the attack range of the attacking ant
 def listAttackable(coord, dist = 1):
+    #the common case: a legal coord tuple (see BoardTables.py)
+    try:
+        return list(BoardTables.attackableTable(dist)[coord])
+    except (KeyError, TypeError):
+        pass
+
     res = []
 
     # goes L-R across board, offset by 1 for range()
@@ -235,8 +249,64 @@ def listAttackable(coord, dist = 1):
 
     return res
 
+##
+# listAttackTargets
+#
+# lists the enemy ants that an ant could attack: the choices the game will
+# offer its owner's getAttack after it moves (see GameRules.attackTargets)
+#
+# Parameters:
+#    currentState - a GameState or CompactState
+#    ant          - the attacking ant.  Pass coords to ask where it could
+#                   attack from if it moved there.
+#
+# Return: a list of Ants in the order they are in their owner's inventory
+def listAttackTargets(currentState, ant, coords = None):
+    if coords is None:
+        coords = ant.coords
+    return GameRules.attackTargets(currentState, tuple(coords), ant.type, ant.player)
+
+##
+# getAttackMap
+#
+# for every cell, the enemy ants an ant of each type standing there could
+# attack.  Building it once lets an evaluation function ask about many ants
+# and cells cheaply, for example
+#
+#       attackMap = getAttackMap(state, me)
+#       threatened = attackMap[SOLDIER].get(coords, [])
+#
+# Parameters:
+#    currentState - a GameState or CompactState
+#    playerId     - the attacking player
+#
+# Return: a list indexed by ant type of dicts from coords to a list of the
+# enemy Ants in range (see GameRules.attackMap)
+def getAttackMap(currentState, playerId):
+    return GameRules.attackMap(currentState, playerId)
 
 
+##
+# getTerrainCosts
+#
+# returns the cost of moving onto each cell for an ant that doesn't ignore
+# grass, indexed costs[x][y].  Grass and food never move after setup so in the
+# play phase the table is computed once and then shared by reference with
+# every clone and getNextState child of the state (see
+# GameState.terrainCosts).
+#
+# Parameters:
+#    state - a GameState object
+#
+# Return: a tuple of tuples of ints
+def getTerrainCosts(state):
+    costs = state.terrainCosts
+    if costs is None:
+        costs = state.buildTerrainCosts()
+        #constructions can still be placed during setup
+        if state.phase == PLAY_PHASE:
+            state.terrainCosts = costs
+    return costs
 
 ##
 # listReachableAdjacent
@@ -252,37 +322,99 @@ def listAttackable(coord, dist = 1):
 def listReachableAdjacent(state, coords, movement, ignoresGrass = False):
     #build a list of all adjacent cells
     oneStep = listAdjacent(coords)
+    costs = getTerrainCosts(state)
 
     #winnow the list based upon cell contents and cost to reach
     candMoves = []
     for cell in oneStep:
-        ant = getAntAt(state, cell)
-        constr = getConstrAt(state, cell)
         moveCost = 1  #default cost
-        if constr != None and not ignoresGrass:
-            moveCost = CONSTR_STATS[constr.type][MOVE_COST]
-        if (ant == None) and (moveCost <= movement):
+        if not ignoresGrass:
+            moveCost = costs[cell[0]][cell[1]]
+        if (moveCost <= movement) and (getAntAt(state, cell) == None):
             candMoves.append(cell)
 
     return candMoves
 
 ##
-# listAllMovementPaths              <!-- RECURSIVE -->
+# listReachableCells
 #
-# calculates all the legal paths for a single ant to move from a given position.
+# finds every cell an ant can end its move on along with one canonical
+# cheapest path to each.  This is a breadth first search (bucketed by
+# movement spent) over the terrain cost table and the ant index so each cell
+# is expanded at most once.  Ties between equally cheap paths are broken by
+# the order of listAdjacent so the result is deterministic.
+#
+# Parameters:
+#    state        - a GameState object
+#    coords       - where the ant is
+#    movement     - movement points the ant has
+#    ignoresGrass - whether grass costs the same as open ground
+#
+# Return: a dict mapping each reachable destination (not including coords
+# itself) to a path (list of coords) starting at coords
+def listReachableCells(state, coords, movement, ignoresGrass = False):
+    costs = getTerrainCosts(state)
+    antAt = state.getAntAt
+    spentTo = { coords : 0 }
+    paths = { coords : [coords] }
+    #buckets[n] holds the cells first reached having spent n movement points
+    buckets = [[coords]] + [[] for i in range(movement)]
+
+    #cells reached with no movement left can't be expanded
+    for spent in range(movement):
+        for cell in buckets[spent]:
+            #skip cells that were reached more cheaply after being queued
+            if spentTo[cell] != spent: continue
+            path = paths[cell]
+            for newCell in BoardTables.ADJACENT[cell]:
+                if ignoresGrass:
+                    newSpent = spent + 1
+                else:
+                    newSpent = spent + costs[newCell[0]][newCell[1]]
+                if newSpent > movement: continue
+                oldSpent = spentTo.get(newCell)
+                if oldSpent is not None and oldSpent <= newSpent: continue
+                if antAt(newCell) is not None: continue
+                spentTo[newCell] = newSpent
+                paths[newCell] = path + [newCell]
+                if newSpent < movement:
+                    buckets[newSpent].append(newCell)
+
+    del paths[coords]
+    return paths
+
+##
+# listAllMovementPaths
+#
+# calculates the legal paths for a single ant to move from a given position.
 # The ant doesn't actually have to be there for this method to return a valid
 # answer.  This method does not take queen ant movement restrictions
 # into account.
 #
+# By default every distinct path is listed, which grows exponentially with
+# the ant's movement.  Pass allPaths = False to get one path per destination
+# instead (the canonical cheapest path found by listReachableCells), which is
+# all a search needs since paths to the same cell end in the same state.
+#
 # Parameters:
 #    currentState - current game state
 #    coords       - where the ant is
 #    movement     - movement points ant has remaining
+#    allPaths     - list every distinct path rather than one per destination
 #
 # Return: a list of lists of coords (tuples). Each sub-list of tuples is an
 # acceptable set of coords for a Move object
-# TODO: I think this method could be sped up to improve computation time
-def listAllMovementPaths(currentState, coords, movement, ignoresGrass = False):
+def listAllMovementPaths(currentState, coords, movement, ignoresGrass = False, allPaths = True):
+    #with one movement point there is only one path to each destination, and
+    #listing the adjacent cells is quicker than the reachability search
+    if not allPaths and movement > 1:
+        if (movement <= 0): return []
+        validMoves = list(listReachableCells(currentState, coords, movement, ignoresGrass).values())
+        #Append the zero-step move (used to activate attack on adjacent foe)
+        validMoves.append([coords])
+        return validMoves
+
+    #                                     <!-- RECURSIVE -->
     #base case: ant can't move any further
     if (movement <= 0): return []
 
@@ -296,16 +428,16 @@ def listAllMovementPaths(currentState, coords, movement, ignoresGrass = False):
     validMoves = list(oneStepMoves)
 
     #recurse for each adj cell to see if we can take additional steps
+    costs = getTerrainCosts(currentState)
     for move in oneStepMoves:
         #figure out what it would cost to get to the current dest
         moveCoords = move[-1]
-        constrAtDest = getConstrAt(currentState, moveCoords)
         cost = 1   #default
-        if constrAtDest != None and not ignoresGrass:
-            cost = CONSTR_STATS[constrAtDest.type][MOVE_COST]
+        if not ignoresGrass:
+            cost = costs[moveCoords[0]][moveCoords[1]]
 
         #get a list of all moves that will extend this one
-        extensions = listAllMovementPaths(currentState, moveCoords, movement - cost, ignoresGrass)
+        extensions = listAllMovementPaths(currentState, moveCoords, movement - cost, ignoresGrass, True)
 
         #create new moves by adding each extension to the base move
         for ext in extensions:
@@ -324,54 +456,89 @@ def listAllMovementPaths(currentState, coords, movement, ignoresGrass = False):
 # stepsToReach
 #
 # calculates the shortest distance between two cells taking
-# movement costs into account.
+# movement costs into account.  Other ants are ignored unless avoidAnts is
+# set.  Without avoidAnts this is a lookup in the distance table for the
+# state's grass/food layout (see getDistanceTable).
 #
 #Parameters:
 #   currentState   - The state of the game (GameState)
 #   src            - starting position (an x,y coord)
 #   dst            - destination position (an x,y coord)
+#   avoidAnts      - treat cells holding an ant (other than src and dst) as
+#                    impassable.  This runs a fresh search each call.
 #
-# Return: the costs in steps (an integer) or -1 on invalid input
-def stepsToReach(currentState, src, dst):
+# Return: the costs in steps (an integer) or -1 on invalid input (or, with
+# avoidAnts, if the ants block every path)
+def stepsToReach(currentState, src, dst, avoidAnts = False):
     #check for invalid input
     if (not legalCoord(src)): return -1
     if (not legalCoord(dst)): return -1
 
-    #a dictionary of already visted cells and the corresponding cost to reach
-    visited = { src : 0 }
-    #a list of to be processed cells
-    queue = [ src ]
-
-    #this loops processes cells in the queue until it is empty
-    while(len(queue) > 0):
-        cell = queue.pop(0)
-
-        #if this cell is our destination we are done
-        if (cell == dst):
-            return visited[cell]
-
-        #calc distance to all cells adj to this one assuming we reach them
-        #from this one
-        nextSteps = listAdjacent(cell)
-        for newCell in nextSteps:
-            constrAtDest = getConstrAt(currentState, newCell)
-            cost = 1  #default
-            if constrAtDest != None:
-                cost = CONSTR_STATS[constrAtDest.type][MOVE_COST]
-            dist = visited[cell] + cost
-
-            #if the new distance is best so far, update the visited dict
-            if (newCell in visited):
-                if (dist < visited[newCell]):
-                    visited[newCell] = dist
-            #if we've never seen this cell before also update dict and
-            #enqueue this new cell to be processed at a future loop iteration
-            else:
-                visited[newCell] = dist
-                queue.append(newCell)
+    srcCell = src[0] * BOARD_LENGTH + src[1]
+    dstCell = dst[0] * BOARD_LENGTH + dst[1]
+    if not avoidAnts:
+        return getDistanceTable(currentState)[srcCell][dstCell]
 
-    #we should never reach this point
-    return -1
+    blocked = [False] * BoardTables.NUM_CELLS
+    for inv in currentState.inventories:
+        for ant in inv.ants:
+            blocked[ant.coords[0] * BOARD_LENGTH + ant.coords[1]] = True
+    blocked[dstCell] = False
+    dist = _terrainDistances(_flatTerrainCosts(getTerrainCosts(currentState)), srcCell, blocked)
+    return dist[dstCell] if dist[dstCell] is not None else -1
+
+##
+# getDistanceTable
+#
+# returns the stepsToReach distance between every pair of cells for the grass
+# and food layout of the given state: table[srcCell][dstCell] where cells are
+# numbered x * BOARD_LENGTH + y.  Grass and food never move after setup so a
+# layout's table is computed once (Dijkstra from every cell over the terrain
+# cost table) and cached for the rest of the game.
+#
+#Parameters:
+#   currentState   - The state of the game (GameState)
+#
+# Return: a tuple of tuples of ints
+def getDistanceTable(currentState):
+    costs = getTerrainCosts(currentState)
+    table = _distanceTables.get(costs)
+    if table is None:
+        #only the layouts of the current game(s) are worth keeping
+        if len(_distanceTables) >= _MAX_DISTANCE_TABLES:
+            _distanceTables.clear()
+        flatCosts = _flatTerrainCosts(costs)
+        table = tuple(tuple(_terrainDistances(flatCosts, cell))
+                      for cell in range(BoardTables.NUM_CELLS))
+        _distanceTables[costs] = table
+    return table
+
+#distance tables keyed by terrain cost table (see getDistanceTable)
+_distanceTables = {}
+_MAX_DISTANCE_TABLES = 16
+
+##
+# helpers for getDistanceTable and stepsToReach.  _terrainDistances is
+# Dijkstra's algorithm from one cell where entering a cell costs its terrain
+# cost and blocked cells (if given) can't be entered.  Returns a list with the
+# distance to every cell (None if it can't be reached).
+def _flatTerrainCosts(costs):
+    return [cost for col in costs for cost in col]
+
+def _terrainDistances(flatCosts, srcCell, blocked = None):
+    dist = [None] * BoardTables.NUM_CELLS
+    dist[srcCell] = 0
+    heap = [(0, srcCell)]
+    while heap:
+        cellDist, cell = heapq.heappop(heap)
+        if cellDist > dist[cell]: continue
+        for newCell in BoardTables.ADJACENT_CELLS[cell]:
+            if blocked is not None and blocked[newCell]: continue
+            newDist = cellDist + flatCosts[newCell]
+            if dist[newCell] is None or newDist < dist[newCell]:
+                dist[newCell] = newDist
+                heapq.heappush(heap, (newDist, newCell))
+    return dist
 
 
 ##
@@ -395,22 +562,56 @@ def approxDist(sourceCoords, targetCoords):
 # creates a legal path toward a destination.  This method does not verify that
 # the path is okay for a queen.
 #
+# Paths are remembered by the grass layout, the cells holding ants and the
+# arguments, so asking for the same path again (as worker shuttling agents do
+# every turn) is a dictionary lookup.
+#
 # Parameters:
 #   currentState - currentState of the game
 #   sourceCoords - starting position (an x,y coord)
 #   targetCoords - destination position (an x,y coord)
 #   movement     - movement points to spend
+#   useCache     - look up and remember the path in the path cache
 #
 # Return the required path
 #
-def createPathToward(currentState, sourceCoords, targetCoords, movement):
+def createPathToward(currentState, sourceCoords, targetCoords, movement, useCache = True):
     ant = getAntAt(currentState, sourceCoords)
     # paths may be requested with no ant for planning purposes
     if ant is None:
         ignoresGrass = False
     else:
         ignoresGrass = UNIT_STATS[ant.type][IGNORES_GRASS]
-    return findPathRecursive(currentState, sourceCoords, targetCoords, movement, ignoresGrass)[0]
+    sourceCoords = tuple(sourceCoords)
+    targetCoords = tuple(targetCoords)
+    if not useCache:
+        return findPathRecursive(currentState, sourceCoords, targetCoords, movement, ignoresGrass, {})[0]
+
+    #the cost table is shared by every state of a game so its id stands in
+    #for the grass layout (the entry holds on to the table so the id can't be
+    #reused while it's cached)
+    costs = getTerrainCosts(currentState)
+    key = (id(costs), _occupancy(currentState), sourceCoords, targetCoords, movement, ignoresGrass)
+    entry = _pathCache.get(key)
+    if entry is not None and entry[0] is costs:
+        path = entry[1]
+    else:
+        if len(_pathCache) >= _MAX_CACHED_PATHS:
+            _pathCache.clear()
+        path = findPathRecursive(currentState, sourceCoords, targetCoords, movement, ignoresGrass, {})[0]
+        _pathCache[key] = (costs, path)
+    #callers are free to modify the path they get
+    return list(path)
+
+#paths found by createPathToward (see there)
+_pathCache = {}
+_MAX_CACHED_PATHS = 4096
+
+#the cells that hold an ant, which are the only cells besides grass that
+#change the paths findPathRecursive finds
+def _occupancy(state):
+    return frozenset(ant.coords[0] * BOARD_LENGTH + ant.coords[1]
+                     for inv in state.inventories for ant in inv.ants)
 
 
 ##
@@ -425,32 +626,41 @@ def createPathToward(currentState, sourceCoords, targetCoords, movement):
 # target - the target location for the path: (x: int, y:int)
 # movement - amount of movement left to spend on path: int
 # ignoresGrass - if the path should respect grass movement penalty: bool
+# memo - optional dict of results already found during this search, keyed by
+#        (source, movement).  The paths in it are shared so don't modify them.
 #
-def findPathRecursive(state, source, target, movement, ignoresGrass):
+def findPathRecursive(state, source, target, movement, ignoresGrass, memo = None):
     dist = approxDist(source, target)
     if dist == 0:
         return ([source], 0)
     if movement == 0:
         return ([source], dist)
 
+    if memo is not None:
+        found = memo.get((source, movement))
+        if found is not None:
+            return found
+
     bestPath = ([source], dist)
+    costs = getTerrainCosts(state)
     for coord in listReachableAdjacent(state, source, movement, ignoresGrass):
         # find movement cost to go here
         cost = 1
         if not ignoresGrass:
-            const = getConstrAt(state, coord)
-            if const is not None:
-                cost = const.movementCost
+            cost = costs[coord[0]][coord[1]]
 
         # find best path
-        path = findPathRecursive(state, coord, target, movement - cost, ignoresGrass)
+        path = findPathRecursive(state, coord, target, movement - cost, ignoresGrass, memo)
 
         # if this path is better than we've found, use it
         if path[1] < bestPath[1]:
             bestPath = ([source] + path[0], path[1])
             # computation time decrease
             if bestPath[1] == 0 or bestPath[1] == dist - movement:
-                return bestPath
+                break
+
+    if memo is not None:
+        memo[(source, movement)] = bestPath
     return bestPath
 
 
@@ -506,9 +716,11 @@ def isPathOkForQueen(path):
 #
 # Parameters:
 #   currentState - the current state
+#   allPaths - list every distinct path of each ant rather than one per
+#              destination (see listAllMovementPaths)
 #
 # Returns:  a list of Move objects
-def listAllMovementMoves(currentState):
+def listAllMovementMoves(currentState, allPaths = True):
     result = []
 
     #first get all MOVE_ANT moves for each ant in the inventory
@@ -517,26 +729,40 @@ def listAllMovementMoves(currentState):
         #skip ants that have already moved
         if (ant.hasMoved): continue
 
-        #create a Move object for each valid movement path
-        allPaths = listAllMovementPaths(currentState,
-                                        ant.coords,
-                                        UNIT_STATS[ant.type][MOVEMENT],
-                                        UNIT_STATS[ant.type][IGNORES_GRASS])
-
-        #remove moves that take the queen out of her territory
-        if (ant.type == QUEEN):
-            tmpList = []
-            for path in allPaths:
-                if (isPathOkForQueen(path)):
-                    tmpList.append(path)
-            allPaths = tmpList
-
         #construct the list of moves using the paths
-        for path in allPaths:
+        for path in listLegalPathsForAnt(currentState, ant, allPaths):
             result.append(Move(MOVE_ANT, path, None))
 
     return result
 
+##
+# listLegalPathsForAnt
+#
+# calculates the movement paths a given ant may take, taking the queen's
+# restriction to her own territory into account.
+#
+# Parameters:
+#   currentState - the current state
+#   ant - the ant to move (Ant)
+#   allPaths - list every distinct path rather than one per destination
+#
+# Returns: a list of paths (lists of coords)
+def listLegalPathsForAnt(currentState, ant, allPaths = True):
+    paths = listAllMovementPaths(currentState,
+                                 ant.coords,
+                                 UNIT_STATS[ant.type][MOVEMENT],
+                                 UNIT_STATS[ant.type][IGNORES_GRASS],
+                                 allPaths)
+
+    #remove moves that take the queen out of her territory
+    if (ant.type == QUEEN):
+        tmpList = []
+        for path in paths:
+            if (isPathOkForQueen(path)):
+                tmpList.append(path)
+        paths = tmpList
+    return paths
+
 
 ##
 # listAllLegalMoves
@@ -546,15 +772,153 @@ def listAllMovementMoves(currentState):
 #
 # Parameters:
 #   currentState - the current state
+#   allPaths - list every distinct path of each ant rather than one per
+#              destination.  Searches pass False: the other paths to a cell
+#              lead to the same state and only multiply the branching factor.
 #
 # Returns:  a list of Move objects
-def listAllLegalMoves(currentState):
+def listAllLegalMoves(currentState, allPaths = True):
     result = []
-    result.extend(listAllMovementMoves(currentState))
+    result.extend(listAllMovementMoves(currentState, allPaths))
     result.extend(listAllBuildMoves(currentState))
     result.append(Move(END, None, None))
     return result
 
+##
+# Move categories for generateLegalMoves.  MOVE_ANT, BUILD and END select the
+# moves of that type.  ATTACK_MOVE selects the MOVE_ANT moves that end with an
+# enemy ant in attack range of an ant that can do damage; when it is part of
+# an order the MOVE_ANT category yields only the remaining movement moves.
+ATTACK_MOVE = 4
+DEFAULT_MOVE_ORDER = (ATTACK_MOVE, MOVE_ANT, BUILD, END)
+
+##
+# generateLegalMoves
+#
+# a lazy version of listAllLegalMoves.  Moves are produced one at a time, one
+# category after another in the given order, and the paths of each ant are
+# only computed when the generator reaches that ant.  A search that stops
+# early (e.g. an alpha-beta cutoff) never pays for the rest of the moves.
+# Categories left out of the order are not generated at all.
+#
+# The state must not be modified while the generator is in use.
+#
+# Parameters:
+#   currentState - the current state
+#   order - a sequence of move categories (see ATTACK_MOVE above)
+#   allPaths - list every distinct path of each ant rather than one per
+#              destination (see listAllLegalMoves)
+#
+# Returns:  a generator of Move objects
+def generateLegalMoves(currentState, order = DEFAULT_MOVE_ORDER, allPaths = True):
+    myInv = getCurrPlayerInventory(currentState)
+    splitAttacks = ATTACK_MOVE in order
+    #the paths of each ant (keyed by its coords) are computed once even if
+    #two categories need them, paired with whether they are attacks
+    antPaths = {}
+
+    for category in order:
+        if category == END:
+            yield Move(END, None, None)
+        elif category == BUILD:
+            for move in listAllBuildMoves(currentState):
+                yield move
+        elif category == MOVE_ANT or category == ATTACK_MOVE:
+            for ant in myInv.ants:
+                if (ant.hasMoved): continue
+                if ant.coords not in antPaths:
+                    antPaths[ant.coords] = [(path, splitAttacks and _endsInAttackRange(currentState, ant, path[-1]))
+                                            for path in listLegalPathsForAnt(currentState, ant, allPaths)]
+                for path, isAttack in antPaths[ant.coords]:
+                    if splitAttacks and isAttack != (category == ATTACK_MOVE): continue
+                    yield Move(MOVE_ANT, path, None)
+
+##
+# helper for generateLegalMoves: whether the given ant could attack an enemy
+# after moving to coords
+def _endsInAttackRange(currentState, ant, coords):
+    if UNIT_STATS[ant.type][ATTACK] <= 0:
+        return False
+    for cell in BoardTables.attackableTable(UNIT_STATS[ant.type][RANGE])[coords]:
+        other = getAntAt(currentState, cell)
+        if other is not None and other.player != ant.player:
+            return True
+    return False
+
+##
+# Canonical move order
+#
+# Within a turn the ants can move in any order, so a search over
+# listAllLegalMoves (with the getNextStateAdversarial rules) reaches the same
+# positions through every permutation of the same ant moves.  When two moves
+# can't affect each other their order doesn't matter, and a search only
+# needs to try one of them first.  The canonical order is the one where such
+# moves are made in ascending order of where the ants started:
+#
+#       constraint = moveOrderConstraint(state, move)
+#       child = getNextStateAdversarial(state, move)
+#       childMoves = canonicalMoves(child, listAllLegalMoves(child), constraint)
+#
+# Two consecutive MOVE_ANTs are independent if neither ant attacks when it
+# gets where it's going and neither path crosses the other ant's cell at the
+# time (the first ant's start and the second ant's destination).  Then making
+# them the other way around is also legal and leaves the same state.  So
+# every position a turn can reach (in the same number of moves) is still
+# reached by a sequence that never makes an independent move of an ant that
+# started before the last one moved (see tests/test_canonicalOrder.py).
+# Builds and END are never filtered and a build lifts the constraint.
+##
+
+##
+# moveOrderConstraint
+#
+# Description: Returns what canonicalMoves needs to know about a move to
+# filter the moves that follow it.  Call it before making the move.
+#
+# Parameters:
+#   currentState - the state the move is about to be made in
+#   move - the move
+#
+# Return: the constraint, or None if the moves after it are not restricted
+##
+def moveOrderConstraint(currentState, move):
+    if move.moveType != MOVE_ANT:
+        return None
+    start = tuple(move.coordList[0])
+    ant = getAntAt(currentState, start)
+    if _endsInAttackRange(currentState, ant, tuple(move.coordList[-1])):
+        return None
+    return (start, frozenset(tuple(coord) for coord in move.coordList))
+
+##
+# canonicalMoves
+#
+# Description: Removes the moves that only reorder ant moves the canonical
+# order (above) makes the other way around
+#
+# Parameters:
+#   currentState - the state after the move the constraint was made for
+#   moves - currentState's legal moves (list of Move)
+#   constraint - what moveOrderConstraint returned for that move
+#
+# Return: the moves to search (the same list if nothing is removed)
+##
+def canonicalMoves(currentState, moves, constraint):
+    if constraint is None:
+        return moves
+    lastStart, lastPath = constraint
+    result = []
+    for move in moves:
+        if move.moveType == MOVE_ANT:
+            start = tuple(move.coordList[0])
+            end = tuple(move.coordList[-1])
+            if start < lastStart and end not in lastPath \
+                    and lastStart not in set(tuple(coord) for coord in move.coordList) \
+                    and not _endsInAttackRange(currentState, getAntAt(currentState, start), end):
+                continue
+        result.append(move)
+    return result
+
 
 
 ##
@@ -611,12 +975,13 @@ def getEnemyInv(self, currentState):
 #
 # Description: Creates a copy of the given state and modifies the inventories in
 # it to reflect what they would look like after a given move.  For efficiency,
-# only the inventories are modified and the board is set to None.  The original
-# (given) state is not modified.
+# only the inventories are modified and the board is left to be rebuilt from
+# them if it is ever read.  The original (given) state is not modified.
 #
 # CAVEAT: To facilitate longer term analysis without having to take enemy moves
 # into consideration, MOVE_ANT commands do not cause the hasMoved property of
-# the ant to change to True.  Furthermore the END move type is ignored.
+# the ant to change to True.  Furthermore the END move type is ignored.  See
+# GameRules.SEARCH_RULES for how these rules differ from the game engine's.
 #
 # Parameters:
 #   currentState - A clone of the current state (GameState)
@@ -625,75 +990,15 @@ def getEnemyInv(self, currentState):
 # Return: A clone of what the state would look like if the move was made
 ##
 def getNextState(currentState, move):
-    # variables I will need
-    myGameState = currentState.fastclone()
-    myInv = getCurrPlayerInventory(myGameState)
-    me = myGameState.whoseTurn
-    myAnts = myInv.ants
-    myTunnels = myInv.getTunnels()
-    myAntHill = myInv.getAnthill()
+    if isinstance(currentState, CompactState):
+        return currentState.nextState(move)
 
-    # If enemy ant is on my anthill or tunnel update capture health
-    ant = getAntAt(myGameState, myAntHill.coords)
-    if ant is not None:
-        if ant.player != me:
-            myAntHill.captureHealth -= 1
-
-    # If an ant is built update list of ants
-    antTypes = [WORKER, DRONE, SOLDIER, R_SOLDIER]
-    if move.moveType == BUILD:
-        if move.buildType in antTypes:
-            ant = Ant(myInv.getAnthill().coords, move.buildType, me)
-            myInv.ants.append(ant)
-            # Update food count depending on ant built
-            if move.buildType == WORKER:
-                myInv.foodCount -= 1
-            elif move.buildType == DRONE or move.buildType == R_SOLDIER:
-                myInv.foodCount -= 2
-            elif move.buildType == SOLDIER:
-                myInv.foodCount -= 3
-        # ants are no longer allowed to build tunnels, so this is an error
-        elif move.buildType == TUNNEL:
-            print("Attempted tunnel build in getNextState()")
-            return currentState
-
-    # If an ant is moved update their coordinates and has moved
-    elif move.moveType == MOVE_ANT:
-        newCoord = move.coordList[-1]
-        startingCoord = move.coordList[0]
-        for ant in myAnts:
-            if ant.coords == startingCoord:
-                ant.coords = newCoord
-                # TODO: should this be set true? Design decision
-                ant.hasMoved = False
-                # If an ant is carrying food and ends on the anthill or tunnel drop the food
-                if ant.carrying and ant.coords == myInv.getAnthill().coords:
-                    myInv.foodCount += 1
-                    ant.carrying = False
-                for tunnels in myTunnels:
-                    if ant.carrying and (ant.coords == tunnels.coords):
-                        myInv.foodCount += 1
-                        ant.carrying = False
-                # If an ant doesn't have food and ends on the food grab food
-                if not ant.carrying and ant.type == WORKER:
-                    foods = getConstrList(myGameState, 2, [FOOD])
-                    for food in foods:
-                        if food.coords == ant.coords:
-                            ant.carrying = True
-                # If my ant is close to an enemy ant attack it
-                attackable = listAttackable(ant.coords, UNIT_STATS[ant.type][RANGE])
-                for coord in attackable:
-                    foundAnt = getAntAt(myGameState, coord)
-                    if foundAnt is not None:  # If ant is adjacent my ant
-                        if foundAnt.player != me:  # if the ant is not me
-                            foundAnt.health = foundAnt.health - UNIT_STATS[ant.type][ATTACK]  # attack
-                            # If an enemy is attacked and looses all its health remove it from the other players
-                            # inventory
-                            if foundAnt.health <= 0:
-                                myGameState.inventories[1 - me].ants.remove(foundAnt)
-                            # If attacked an ant already don't attack any more
-                            break
-    return myGameState
+    # ants are no longer allowed to build tunnels, so this is an error
+    if move.moveType == BUILD and move.buildType == TUNNEL:
+        print("Attempted tunnel build in getNextState()")
+        return currentState
+
+    return GameRules.nextState(currentState, move, GameRules.SEARCH_RULES)
 
 ##
 # getNextStateAdversarial
@@ -708,24 +1013,109 @@ def getNextState(currentState, move):
 # Return: A clone of what the state would look like if the move was made
 ##
 def getNextStateAdversarial(currentState, move):
-    # variables I will need
-    nextState = getNextState(currentState, move)
-    myInv = getCurrPlayerInventory(nextState)
-    myAnts = myInv.ants
-
-    # If an ant is moved update their coordinates and has moved
-    if move.moveType == MOVE_ANT:
-        startingCoord = move.coordList[0]
-        for ant in myAnts:
-            if ant.coords == startingCoord:
-                ant.hasMoved = True
-    elif move.moveType == END:
-        for ant in myAnts:
-            ant.hasMoved = False
-        nextState.whoseTurn = 1 - currentState.whoseTurn
-    return nextState
+    if isinstance(currentState, CompactState):
+        return currentState.nextState(move, True)
+
+    if move.moveType == BUILD and move.buildType == TUNNEL:
+        print("Attempted tunnel build in getNextState()")
+        return currentState
+
+    return GameRules.nextState(currentState, move, GameRules.ADVERSARIAL_RULES)
+
+##
+# getNextStates
+#
+# Description: Returns the children of a state for each of a list of moves.
+# Each child holds the same information as getNextState (or
+# getNextStateAdversarial) would return for the move, but the work that is the
+# same for every sibling is only done once: hashing the parent, finding the
+# current player's anthill and tunnels, checking whether the anthill is under
+# attack and copying the parent.  The children are copy-on-write copies of
+# the parent (see GameState.shareclones) so they share every Ant and
+# Construction their move doesn't change with it instead of cloning them.
+#
+# CAVEAT: For a GameState this has the side effects of shareclone: the
+# parent becomes copy-on-write too, so an Ant or Construction changed
+# directly (rather than through getNextState, applyMove or
+# writableAnt/writableConstr) in the parent or in any child changes in all of
+# them, and getNextState on any of them returns shareclones.  Call unshare()
+# on a state before changing it by hand.  A tunnel build's "child" is the
+# parent itself, as with getNextState.
+#
+# Parameters:
+#   currentState - the state to expand (GameState or CompactState)
+#   moves - the moves to make (list of Move)
+#   adversarial - use the getNextStateAdversarial rules (bool)
+#
+# Return: a list with the child for each move, in the same order
+##
+def getNextStates(currentState, moves, adversarial = False):
+    if isinstance(currentState, CompactState):
+        return [currentState.nextState(move, adversarial) for move in moves]
+
+    rules = GameRules.ADVERSARIAL_RULES if adversarial else GameRules.SEARCH_RULES
+    currentState.getZobristKey()
+    context = GameRules.moveContext(currentState)
+    children = currentState.shareclones(len(moves))
+    for i in range(len(moves)):
+        move = moves[i]
+        if move.moveType == BUILD and move.buildType == TUNNEL:
+            print("Attempted tunnel build in getNextState()")
+            children[i] = currentState
+            continue
+        GameRules.applyMove(children[i], move, rules, None, context)
+    return children
+
+##
+# applyMove
+#
+# Description: Applies a move to the given state in place using the same rules
+# as getNextStateAdversarial and returns a token that undoMove can use to
+# restore the state exactly.  This lets a depth-first search work on a single
+# state object instead of cloning one per node:
+#
+#       token = applyMove(state, move)
+#       ...search the child...
+#       undoMove(state, token)
+#
+# Moves must be undone in the reverse order they were applied.
+#
+# Parameters:
+#   state - the state to modify (GameState or CompactState)
+#   move - The move to make (Move)
+#
+# Return: the undo token
+##
+def applyMove(state, move):
+    if isinstance(state, CompactState):
+        token = state.clone()
+        state.applyNextState(move, True)
+        return token
+
+    journal = []
+    if move.moveType == BUILD and move.buildType == TUNNEL:
+        print("Attempted tunnel build in getNextState()")
+        return journal
+    GameRules.applyMove(state, move, GameRules.ADVERSARIAL_RULES, journal)
+    return journal
+
+##
+# undoMove
+#
+# Description: Reverts the changes made by applyMove
+#
+# Parameters:
+#   state - the state that was given to applyMove
+#   token - the token applyMove returned
+##
+def undoMove(state, token):
+    if isinstance(state, CompactState):
+        state.copyFrom(token)
+        return
+
+    GameRules.undo(state, token)
+
 
-    
 ##
 # returns a character representation of a given ant
 # (helper for asciiPrintState)
@@ -819,6 +1209,15 @@ def asciiPrintState(state):
     print(" food: " + str(p1Food) + "/" + str(p2Food))
 
 
+##
+# GraphNode
+#
+# a cell on a path being searched for, with the cost of reaching it (g), the
+# estimated cost of the whole path through it (f = g + h) and the node it
+# was reached from.  aStarSearchPath keeps plain coords in its heap instead;
+# this is for callers that build paths node by node (see neighbors and
+# construct_path).
+##
 class GraphNode:
 
     def __init__(self, parent=None, coords=None, f=0.0, g=0.0, h=0.0):
@@ -843,63 +1242,101 @@ class GraphNode:
 ##
 # aStarSearchPath
 #
-# Create a path towards from start to goal
-# CAVEAT: THIS DOES NOT TAKE INTO ACCOUNT GRASS RIGHT NOW
+# Create a path towards from start to goal using A* search.  Grass costs
+# CONSTR_STATS[GRASS][MOVE_COST] to enter unless the ant at start ignores
+# grass, and cells holding other ants are avoided (the goal itself may be
+# occupied, e.g. by an enemy to attack).  As before the path stops on the
+# cell next to the goal and is cut short to what the ant at start can move
+# this turn (see cutPathToMovement).
 # CAVEAT: A-STAR SEARCH IS SLOWER THAN createPathToward() BECAUSE THIS IS OPTIMAL
 #         AND createPathTowards() IS GREEDY FOR TIME EFFICIENCY
 #
+# Parameters:
+#   currentState - the state of the game
+#   start - where the ant is (x, y)
+#   goal - where it is headed (x, y)
+#
+# Return: the path (a list of coords), [] if start is the goal or False if
+# there is no path
 ##
 def aStarSearchPath(currentState, start, goal):
-    start = GraphNode(coords=start)
-    goal = GraphNode(coords=goal)
-
-    ant = getAntAt(currentState, start.coords)
-
-    antMovement = UNIT_STATS[ant.type][MOVEMENT]
-    antMovement = antMovement + 1
-
-    if start.coords == goal.coords:
+    start = (start[0], start[1])
+    goal = (goal[0], goal[1])
+    if start == goal:
         return []
 
-    start.f = start.g + approxDist(start.coords, goal.coords)
-    open_list = [start, ]
-    closed_list = list()
-    current = start
-
-    while open_list:
-        if current == goal:
-            return construct_path(current, antMovement)
+    #with no ant at start the path is neither grass free nor cut short
+    ant = getAntAt(currentState, start)
+    ignoresGrass = ant is not None and UNIT_STATS[ant.type][IGNORES_GRASS]
+    costs = getTerrainCosts(currentState)
 
-        current = open_list.pop(open_list.index(min(open_list, key=lambda x: x.f)))
+    #the open set is a heap of (f, g, coords); entries that have since been
+    #reached more cheaply are skipped when popped
+    openHeap = [(approxDist(start, goal), 0, start)]
+    bestCost = { start : 0 }
+    cameFrom = { start : None }
 
-        if current in closed_list:
+    while openHeap:
+        f, g, current = heapq.heappop(openHeap)
+        if g > bestCost[current]:
             continue
-
-        for neighbor in neighbors(currentState, current, goal):
-            if neighbor == goal:
-                return construct_path(current, antMovement)
-            if neighbor in open_list:
-                other = next((x for x in open_list if x.coords == neighbor.coords), None)
-                if next((x for x in open_list if x.coords == neighbor.coords), None) is not None:
-                    if other.f < neighbor.f:
-                        continue
-            if neighbor in closed_list:
-                other = next((x for x in open_list if x.coords == neighbor.coords), None)
-                if next((x for x in open_list if x.coords == neighbor.coords), None) is not None:
-                    if other.f < neighbor.f:
-                        continue
-                    else:
-                        open_list.append(neighbor)
-                else:
-                    open_list.append(neighbor)
+        if current == goal:
+            #the path ends next to the goal
+            path = []
+            cell = cameFrom[goal]
+            while cell is not None:
+                path.append(cell)
+                cell = cameFrom[cell]
+            path.reverse()
+            if ant is None:
+                return path
+            return cutPathToMovement(path, costs, UNIT_STATS[ant.type][MOVEMENT], ignoresGrass)
+
+        for neighbor in listReachAdj(currentState, current, goal):
+            if ignoresGrass:
+                newCost = g + 1
             else:
-                open_list.append(neighbor)
-
-        closed_list.append(current)
+                newCost = g + costs[neighbor[0]][neighbor[1]]
+            if neighbor not in bestCost or newCost < bestCost[neighbor]:
+                bestCost[neighbor] = newCost
+                cameFrom[neighbor] = current
+                heapq.heappush(openHeap, (newCost + approxDist(neighbor, goal), newCost, neighbor))
 
     return False
 
 
+##
+# cutPathToMovement
+#
+# cuts a path (starting where the ant is) down to the part the ant can
+# travel this turn: the longest prefix whose move cost fits in its movement.
+#
+# Parameters:
+#   path - list of coords
+#   costs - the terrain cost table (see getTerrainCosts)
+#   movement - the ant's movement points
+#   ignoresGrass - whether grass costs the same as open ground
+#
+# Return: the (possibly) shortened path
+def cutPathToMovement(path, costs, movement, ignoresGrass = False):
+    spent = 0
+    for i in range(1, len(path)):
+        if ignoresGrass:
+            spent += 1
+        else:
+            spent += costs[path[i][0]][path[i][1]]
+        if spent > movement:
+            return path[:i]
+    return path
+
+
+##
+# neighbors
+#
+# the GraphNodes one step on from a node towards a goal node (see
+# listReachAdj), each costing one step more than the node
+#
+# Return: a list of GraphNodes whose parent is node
 def neighbors(currentState, node, goal):
     bors = [GraphNode(coords=y) for y in listReachAdj(currentState, node.coords, goal.coords)]
     for bor in bors:
@@ -909,33 +1346,44 @@ def neighbors(currentState, node, goal):
     return bors
 
 
+##
+# construct_path
+#
+# the path that leads to a GraphNode (following its parents back to the
+# start), cut to its first antMovement cells.  See cutPathToMovement for a
+# cut that counts the cost of grass.
+#
+# Parameters:
+#   node - the last GraphNode of the path
+#   antMovement - the most cells the path may have (the start included)
+#
+# Return: the path (a list of coords)
 def construct_path(node, antMovement):
-    path = [node, ]
-    normalPath = list()
-    while node.parent is not None:
+    path = []
+    while node is not None:
+        path.append(node.coords)
         node = node.parent
-        path.append(node)
-
-    for x in path:
-        normalPath.append(x.coords)
-
-    li = normalPath[::-1]
-
-    return li if len(li) <= antMovement else li[:antMovement]
+    path.reverse()
+    return path[:antMovement]
 
 
+##
+# listReachAdj
+#
+# the cells adjacent to coords that a path may step onto: those without an
+# ant, and the goal even if an ant is there (e.g. an enemy to attack).
+# aStarSearchPath expands its cells with this.
+#
+# Parameters:
+#   state - the state of the game
+#   coords - the cell to step from
+#   givenAntCoords - the goal
+#
+# Return: a list of coords
 def listReachAdj(state, coords, givenAntCoords):
-    # build a list of all adjacent cells
-    oneStep = listAdjacent(coords)
-
-    # winnow the list based upon cell contents and cost to reach
+    goal = tuple(givenAntCoords)
     candMoves = []
-    for cell in oneStep:
-        ant = getAntAt(state, cell)
-
-        if ant is None:
+    for cell in BoardTables.ADJACENT[tuple(coords)]:
+        if cell == goal or getAntAt(state, cell) is None:
             candMoves.append(cell)
-        elif ant.coords is givenAntCoords:
-            candMoves.append(cell)
-
     return candMoves
@@ -0,0 +1,299 @@
+import random
+import time
+from Constants import *
+from GameState import GameState
+from Building import Building
+from Construction import Construction
+from Ant import Ant, UNIT_STATS
+import AIPlayerUtils
+
+#
+# Benchmark.py
+#
+# Timing comparisons for the search helpers in AIPlayerUtils, and checks that
+# the faster versions still agree with what they replaced.  The states are
+# generated from random (but seeded, so repeatable) setups followed by a
+# number of random legal moves.  Run from the ReAntics directory:
+#
+#       python Benchmark.py
+#
+
+ANT_NAMES = ["Queen", "Worker", "Drone", "Soldier", "R_Soldier"]
+
+
+##
+# randomSetupState
+#
+# Description: creates a play phase state with a random (legal) setup: each
+# player has an anthill, a tunnel, 9 grass and a queen and worker on their side
+# and 2 food on the opponent's side.
+#
+# Parameters:
+#   rng - a random.Random to draw from
+#
+# Return: a GameState
+##
+def randomSetupState(rng):
+    state = GameState.getBlankState()
+    used = set()
+
+    #pick an unused cell in the given rows
+    def pick(minY, maxY):
+        while True:
+            coords = (rng.randint(0, BOARD_LENGTH - 1), rng.randint(minY, maxY))
+            if coords not in used:
+                used.add(coords)
+                return coords
+
+    def place(inv, constr):
+        inv.constrs.append(constr)
+        state.board[constr.coords[0]][constr.coords[1]].constr = constr
+
+    for player, rows in ((PLAYER_ONE, (0, 3)), (PLAYER_TWO, (6, 9))):
+        place(state.inventories[player], Building(pick(*rows), ANTHILL, player))
+        place(state.inventories[player], Building(pick(*rows), TUNNEL, player))
+        for i in range(9):
+            place(state.inventories[NEUTRAL], Construction(pick(*rows), GRASS))
+    for rows in ((6, 9), (0, 3)):
+        for i in range(2):
+            place(state.inventories[NEUTRAL], Construction(pick(*rows), FOOD))
+
+    for player in (PLAYER_ONE, PLAYER_TWO):
+        inv = state.inventories[player]
+        for ant in (Ant(inv.constrs[0].coords, QUEEN, player), Ant(inv.constrs[1].coords, WORKER, player)):
+            inv.ants.append(ant)
+            state.board[ant.coords[0]][ant.coords[1]].ant = ant
+        inv.foodCount = 1
+
+    state.phase = PLAY_PHASE
+    return state
+
+##
+# randomPlayState
+#
+# Description: plays random legal moves (with getNextStateAdversarial) from a
+# random setup.  Builds are skipped once a player has 6 ants so the states
+# stay representative of real games.
+#
+# Parameters:
+#   seed - seed for the random number generator
+#   plies - number of moves to make (random if None)
+#
+# Return: a GameState (without a board)
+##
+def randomPlayState(seed, plies=None):
+    rng = random.Random(seed)
+    state = randomSetupState(rng)
+    if plies is None:
+        plies = rng.randint(0, 120)
+    for i in range(plies):
+        if AIPlayerUtils.getWinner(state) is not None:
+            break
+        moves = AIPlayerUtils.listAllLegalMoves(state)
+        if len(state.inventories[state.whoseTurn].ants) >= 6:
+            moves = [move for move in moves if move.moveType != BUILD]
+        state = AIPlayerUtils.getNextStateAdversarial(state, rng.choice(moves))
+    return state
+
+##
+# timeCalls
+#
+# Return: the seconds taken to call func(*args) for every args in argList
+##
+def timeCalls(func, argList, repeats=1):
+    start = time.perf_counter()
+    for i in range(repeats):
+        for args in argList:
+            func(*args)
+    return time.perf_counter() - start
+
+
+##
+# benchmarkReachability
+#
+# Description: compares enumerating every distinct movement path (what
+# listAllMovementPaths lists by default) with listing one path per
+# destination (allPaths = False, what the searches use), per ant type.  Also
+# checks both find the same destinations.  The two do different amounts of
+# work, so the last column is the ratio of their times rather than a speedup
+# of the same result.
+##
+def benchmarkReachability(numStates=50, repeats=5):
+    #every ant type is timed from the position of every ant in the states
+    #(the paths don't depend on which ant is actually there)
+    samples = [[] for antType in ANT_NAMES]
+    for seed in range(numStates):
+        state = randomPlayState(seed)
+        for player in (PLAYER_ONE, PLAYER_TWO):
+            for ant in state.inventories[player].ants:
+                for antType in range(len(ANT_NAMES)):
+                    samples[antType].append((state, ant.coords, UNIT_STATS[antType][MOVEMENT],
+                                             UNIT_STATS[antType][IGNORES_GRASS]))
+
+    print("listAllMovementPaths: all distinct paths vs one path per destination")
+    print("%-10s %6s %10s %10s %8s %10s" % ("ant", "calls", "all (ms)", "one (ms)", "all/one", "paths"))
+    for antType in range(len(ANT_NAMES)):
+        argList = samples[antType]
+        if len(argList) == 0:
+            continue
+        numAll = 0
+        numCanonical = 0
+        for (state, coords, movement, ignoresGrass) in argList:
+            allPaths = AIPlayerUtils.listAllMovementPaths(state, coords, movement, ignoresGrass, True)
+            canonical = AIPlayerUtils.listAllMovementPaths(state, coords, movement, ignoresGrass, False)
+            if set(path[-1] for path in allPaths) != set(path[-1] for path in canonical):
+                raise AssertionError("destinations differ for %s at %s" % (ANT_NAMES[antType], coords))
+            numAll += len(allPaths)
+            numCanonical += len(canonical)
+
+        allTime = timeCalls(AIPlayerUtils.listAllMovementPaths, argList, repeats)
+        oneTime = timeCalls(AIPlayerUtils.listAllMovementPaths, [args + (False,) for args in argList], repeats)
+        print("%-10s %6d %10.2f %10.2f %8.2f %5d/%-5d" % (ANT_NAMES[antType], len(argList) * repeats,
+              allTime * 1000, oneTime * 1000, allTime / oneTime, numAll, numCanonical))
+    print("")
+
+##
+# benchmarkPathfinding
+#
+# Description: compares aStarSearchPath with createPathToward on random
+# layouts.  Besides the time per call this reports how far (in stepsToReach
+# terms) each path leaves the ant from its goal on average.  Both are timed
+# finding every path from scratch (createPathToward with useCache = False);
+# the time createPathToward takes to return a path it already has in its
+# cache is reported on its own line.
+##
+def benchmarkPathfinding(numStates=100, goalsPerAnt=5):
+    rng = random.Random(0)
+    argList = []
+    for seed in range(numStates):
+        state = randomPlayState(seed)
+        for player in (PLAYER_ONE, PLAYER_TWO):
+            for ant in state.inventories[player].ants:
+                for i in range(goalsPerAnt):
+                    goal = (rng.randint(0, BOARD_LENGTH - 1), rng.randint(0, BOARD_LENGTH - 1))
+                    if goal != ant.coords:
+                        argList.append((state, ant.coords, goal, UNIT_STATS[ant.type][MOVEMENT]))
+
+    def remaining(state, path, goal):
+        if not path:
+            return 0
+        return AIPlayerUtils.stepsToReach(state, path[-1], goal)
+
+    greedyLeft = 0
+    aStarLeft = 0
+    for (state, start, goal, movement) in argList:
+        greedyLeft += remaining(state, AIPlayerUtils.createPathToward(state, start, goal, movement, False), goal)
+        aStarLeft += remaining(state, AIPlayerUtils.aStarSearchPath(state, start, goal), goal)
+
+    greedyTime = timeCalls(AIPlayerUtils.createPathToward, [args + (False,) for args in argList])
+    aStarTime = timeCalls(lambda state, start, goal, movement: AIPlayerUtils.aStarSearchPath(state, start, goal),
+                          argList)
+    #every path is cached by the first pass, so the second only hits
+    AIPlayerUtils._pathCache.clear()
+    timeCalls(AIPlayerUtils.createPathToward, argList)
+    cachedTime = timeCalls(AIPlayerUtils.createPathToward, argList)
+    print("path finding over %d random start/goal pairs" % len(argList))
+    print("%-18s %12s %14s" % ("", "us per call", "steps left"))
+    print("%-18s %12.1f %14.2f" % ("createPathToward", greedyTime / len(argList) * 1e6, greedyLeft / len(argList)))
+    print("%-18s %12.1f %14.2f" % ("aStarSearchPath", aStarTime / len(argList) * 1e6, aStarLeft / len(argList)))
+    print("(aStarSearchPath stops next to the goal so its best case is 1 step left)")
+    print("createPathToward returning a cached path: %.1f us per call" % (cachedTime / len(argList) * 1e6))
+    print("")
+
+
+##
+# helper for benchmarkCanonicalOrder: the number of nodes in the tree of
+# every move sequence to the given depth
+def _treeSize(state, depth, canonical, constraint=None):
+    if depth == 0 or AIPlayerUtils.getWinner(state) is not None:
+        return 1
+    moves = AIPlayerUtils.listAllLegalMoves(state, False)
+    if canonical:
+        moves = AIPlayerUtils.canonicalMoves(state, moves, constraint)
+    size = 1
+    for move in moves:
+        childConstraint = AIPlayerUtils.moveOrderConstraint(state, move) if canonical else None
+        token = AIPlayerUtils.applyMove(state, move)
+        size += _treeSize(state, depth - 1, canonical, childConstraint)
+        AIPlayerUtils.undoMove(state, token)
+    return size
+
+##
+# helper for benchmarkCanonicalOrder: food, ants and health, for the search
+def _materialEval(state, playerId):
+    myInv = state.inventories[playerId]
+    enemyInv = state.inventories[1 - playerId]
+    return (myInv.foodCount - enemyInv.foodCount + 0.1 * (len(myInv.ants) - len(enemyInv.ants))
+            + 0.01 * (sum(ant.health for ant in myInv.ants) - sum(ant.health for ant in enemyInv.ants)))
+
+##
+# benchmarkCanonicalOrder
+#
+# Description: compares the number of nodes with and without the canonical
+# move order, both for the whole tree of move sequences and for a fixed
+# depth AlphaBetaSearch (which must find the same value either way)
+##
+def benchmarkCanonicalOrder(numStates=20, depth=3):
+    import Search
+    sizes = [0, 0]
+    nodes = [0, 0]
+    times = [0.0, 0.0]
+    for seed in range(numStates):
+        state = randomPlayState(seed)
+        scores = []
+        for canonical in (False, True):
+            sizes[canonical] += _treeSize(state.fastclone(), depth, canonical)
+            search = Search.AlphaBetaSearch(_materialEval, timeLimit=float("inf"), maxDepth=depth,
+                                            canonicalOrder=canonical)
+            search.search(state)
+            nodes[canonical] += search.stats.nodes
+            times[canonical] += search.stats.elapsed
+            scores.append(search.stats.score)
+        if scores[0] != scores[1]:
+            raise AssertionError("state %d: canonical order changed the search value (%s, %s)" %
+                                 (seed, scores[0], scores[1]))
+    print("Canonical move order, %d states, depth %d" % (numStates, depth))
+    print("  move tree:    %9d nodes -> %9d (%.1f%%)" % (sizes[0], sizes[1], 100.0 * sizes[1] / sizes[0]))
+    print("  alpha-beta:   %9d nodes -> %9d (%.1f%%), %.2fs -> %.2fs" %
+          (nodes[0], nodes[1], 100.0 * nodes[1] / nodes[0], times[0], times[1]))
+    print("")
+
+
+##
+# helper for benchmarkRollouts: a random game the slow way, one move at a
+# time with listAllLegalMoves and getNextStateAdversarial, until someone wins
+# or the turn cap is reached
+def _slowRollout(state, rng, turnCap):
+    turns = 0
+    while turns < turnCap and AIPlayerUtils.getWinner(state) is None:
+        move = rng.choice(AIPlayerUtils.listAllLegalMoves(state))
+        if move.moveType == END:
+            turns += 1
+        state = AIPlayerUtils.getNextStateAdversarial(state, move)
+
+##
+# benchmarkRollouts
+#
+# Description: compares random games played with the AIPlayerUtils helpers
+# with the rollouts of MCTS.RolloutSimulator (same turn cap)
+##
+def benchmarkRollouts(numStates=10, rolloutsPerState=10, turnCap=60):
+    import MCTS
+    states = [randomPlayState(seed) for seed in range(numStates)]
+    rng = random.Random(0)
+    slow = timeCalls(_slowRollout, [(state, rng, turnCap) for state in states], rolloutsPerState)
+    simulator = MCTS.RolloutSimulator(turnCap, rng=random.Random(0))
+    fast = timeCalls(simulator.rollout, [(state,) for state in states], rolloutsPerState)
+    numRollouts = numStates * rolloutsPerState
+    print("Rollouts (turn cap %d)" % turnCap)
+    print("  listAllLegalMoves/getNextStateAdversarial: %8.1f rollouts/s" % (numRollouts / slow))
+    print("  RolloutSimulator:                          %8.1f rollouts/s (%.1f turns each)" %
+          (numRollouts / fast, simulator.turns / float(numRollouts)))
+    print("")
+
+
+if __name__ == '__main__':
+    benchmarkReachability()
+    benchmarkPathfinding()
+    benchmarkCanonicalOrder()
+    benchmarkRollouts()
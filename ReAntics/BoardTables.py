@@ -0,0 +1,132 @@
+from Constants import *
+from Ant import UNIT_STATS
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#
+# BoardTables.py
+#
+# Precomputed, immutable neighbor tables for every cell of the board.  These
+# back AIPlayerUtils.listAdjacent and AIPlayerUtils.listAttackable (and the
+# same lookups in CompactState) so those no longer build and bounds check
+# their results on every call.
+#
+# Each table comes in two flavors: keyed by (x, y) coords and holding coords
+# tuples, or indexed by cell number (x * BOARD_LENGTH + y, see
+# CompactState.cellIndex) and holding cell numbers.  The entries are in the
+# same order the original functions produced.
+#
+# If NumPy is installed adjacentIndexArray and attackableIndexArray return the
+# tables for a whole batch of cells at once as index arrays.
+#
+
+NUM_CELLS = BOARD_LENGTH * BOARD_LENGTH
+ALL_COORDS = tuple((x, y) for x in range(BOARD_LENGTH) for y in range(BOARD_LENGTH))
+
+
+def _onBoard(x, y):
+    return 0 <= x < BOARD_LENGTH and 0 <= y < BOARD_LENGTH
+
+#the cells one step away in each cardinal direction
+def _adjacent(x, y):
+    result = []
+    for (dx, dy) in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+        if _onBoard(x + dx, y + dy):
+            result.append((x + dx, y + dy))
+    return tuple(result)
+
+#the cells within a taxicab distance, going left to right then top to bottom
+def _attackable(x, y, dist):
+    result = []
+    for i in range(-dist, dist + 1):
+        yLen = dist - abs(i)
+        for j in range(-yLen, yLen + 1):
+            if (i != 0 or j != 0) and _onBoard(x + i, y + j):
+                result.append((x + i, y + j))
+    return tuple(result)
+
+def _toCells(coordsTuple):
+    return tuple(x * BOARD_LENGTH + y for (x, y) in coordsTuple)
+
+
+#ADJACENT[(x, y)] and ADJACENT_CELLS[cell]
+ADJACENT = { coords : _adjacent(*coords) for coords in ALL_COORDS }
+ADJACENT_CELLS = tuple(_toCells(ADJACENT[coords]) for coords in ALL_COORDS)
+
+#the attack ranges of the ant types; their tables are built up front and
+#any other range is built the first time it is asked for
+ATTACK_RANGES = tuple(sorted(set(stats[RANGE] for stats in UNIT_STATS)))
+_attackableTables = {}
+_attackableCellTables = {}
+
+##
+# attackableTable
+#
+# Parameters:
+#   dist - the attack range
+#
+# Return: a dict mapping each (x, y) to a tuple of the coords in range of it
+##
+def attackableTable(dist):
+    table = _attackableTables.get(dist)
+    if table is None:
+        table = { coords : _attackable(coords[0], coords[1], dist) for coords in ALL_COORDS }
+        _attackableTables[dist] = table
+    return table
+
+##
+# attackableCellTable
+#
+# Parameters:
+#   dist - the attack range
+#
+# Return: a tuple giving, for each cell number, a tuple of the cell numbers in
+#   range of it
+##
+def attackableCellTable(dist):
+    table = _attackableCellTables.get(dist)
+    if table is None:
+        coordsTable = attackableTable(dist)
+        table = tuple(_toCells(coordsTable[coords]) for coords in ALL_COORDS)
+        _attackableCellTables[dist] = table
+    return table
+
+for attackRange in ATTACK_RANGES:
+    attackableCellTable(attackRange)
+
+
+##
+# adjacentIndexArray / attackableIndexArray
+#
+# Description: vectorized lookups for batch use (NumPy is required).  Rows
+# are padded with -1 because cells near the edges have fewer neighbors.
+#
+# Parameters:
+#   cells - a sequence or NumPy array of cell numbers
+#   dist - the attack range (attackableIndexArray only)
+#
+# Return: a 2D NumPy int array with the neighbors of cells[i] in row i
+##
+_indexArrays = {}
+
+def _indexArray(name, cellTable):
+    if numpy is None:
+        raise ImportError("NumPy is required for the vectorized board tables")
+    array = _indexArrays.get(name)
+    if array is None:
+        width = max(len(entry) for entry in cellTable)
+        array = numpy.full((NUM_CELLS, width), -1, dtype=numpy.int16)
+        for cell in range(NUM_CELLS):
+            array[cell, :len(cellTable[cell])] = cellTable[cell]
+        array.setflags(write=False)
+        _indexArrays[name] = array
+    return array
+
+def adjacentIndexArray(cells):
+    return _indexArray('adjacent', ADJACENT_CELLS)[numpy.asarray(cells, dtype=numpy.intp)]
+
+def attackableIndexArray(cells, dist=1):
+    return _indexArray(('attackable', dist), attackableCellTable(dist))[numpy.asarray(cells, dtype=numpy.intp)]
@@ -0,0 +1,654 @@
+from array import array
+from Constants import *
+from Ant import Ant, UNIT_STATS
+from Building import Building
+from Construction import Construction, CONSTR_STATS
+from Inventory import Inventory
+from Location import Location
+from GameState import GameState
+import Zobrist
+import BoardTables
+
+#
+# CompactState.py
+#
+# An alternative, array-backed representation of a GameState intended for
+# search.  Instead of a board of Location objects and inventories of Ant and
+# Construction objects, all of the game information is kept in a handful of
+# flat integer arrays so that cloning a state is a few memory copies and no
+# Python objects are created per ant.
+#
+# Use to_compact() and from_compact() to convert between the two
+# representations.  The conversion is lossless.
+#
+
+##
+# cellIndex / CELL_COORDS
+#
+# Board cells are numbered x * BOARD_LENGTH + y so that the cell index matches
+# the board[x][y] access pattern used by the rest of the game.  CELL_COORDS
+# maps a cell index back to a (shared) coordinate tuple.
+#
+CELL_COORDS = tuple((x, y) for x in range(BOARD_LENGTH) for y in range(BOARD_LENGTH))
+NUM_CELLS = BOARD_LENGTH * BOARD_LENGTH
+
+def cellIndex(coords):
+    return coords[0] * BOARD_LENGTH + coords[1]
+
+
+##
+#CompactState
+#Description: An array-backed game state.  The Ant and Construction data is
+#   stored column-wise: entry i of each ant* array describes the i-th ant.
+#   Ants and constructions of every player share the same arrays; the
+#   per-player inventory order is the array order filtered by owner.
+#
+#Variables:
+#   phase - The current phase of the game.
+#   whoseTurn - The ID of the Player who's turn it currently is.
+#   food - food count for each player (array of 2)
+#   cellAnt - index of the ant in each cell or -1 (array of NUM_CELLS)
+#   cellConstr - index of the construction in each cell or -1
+#   antCell, antType, antOwner, antHealth, antMoved, antCarrying - ant data
+#   constrCell, constrType, constrOwner - construction data.  Constructions
+#       never move so these arrays are shared between clones.
+#   constrHealth - capture health of each construction (0 for grass/food)
+#   zobristKey - 64-bit hash of the state or None (see getZobristKey)
+#   terrainCosts - see GameState.terrainCosts
+##
+class CompactState(object):
+
+    ##
+    #__init__
+    #Description: Creates an empty CompactState.  Use to_compact() to
+    #   build one from a GameState.
+    ##
+    def __init__(self, phase = SETUP_PHASE_1, whoseTurn = PLAYER_ONE):
+        self.board = None
+        self.phase = phase
+        self.whoseTurn = whoseTurn
+        self.food = array('h', [0, 0])
+        self.cellAnt = array('b', [-1]) * NUM_CELLS
+        self.cellConstr = array('b', [-1]) * NUM_CELLS
+        self.antCell = array('b')
+        self.antType = array('b')
+        self.antOwner = array('b')
+        self.antHealth = array('b')
+        self.antMoved = array('b')
+        self.antCarrying = array('b')
+        self.constrCell = array('b')
+        self.constrType = array('b')
+        self.constrOwner = array('b')
+        self.constrHealth = array('b')
+        self.zobristKey = None
+        self.terrainCosts = None
+
+    ##
+    #inventories
+    #Description: Inventory-like views of the state so that code written for
+    #   GameState objects (e.g., everything in AIPlayerUtils) can read a
+    #   CompactState.  Views are created on demand.
+    ##
+    @property
+    def inventories(self):
+        return [CompactInventory(self, PLAYER_ONE),
+                CompactInventory(self, PLAYER_TWO),
+                CompactInventory(self, NEUTRAL)]
+
+    ##
+    #getAntAt
+    #Description: Returns a view of the ant at the given coordinates or None
+    ##
+    def getAntAt(self, coords):
+        index = self.cellAnt[coords[0] * BOARD_LENGTH + coords[1]]
+        if index < 0:
+            return None
+        return CompactAnt(self, index)
+
+    ##
+    #getConstrAt
+    #Description: Returns a view of the construction at the given coordinates
+    #   or None
+    ##
+    def getConstrAt(self, coords):
+        index = self.cellConstr[coords[0] * BOARD_LENGTH + coords[1]]
+        if index < 0:
+            return None
+        return CompactConstr(self, index)
+
+    ##
+    #antsOf / constrsOf
+    #Description: indices of all ants (constructions) owned by a player in
+    #   inventory order
+    ##
+    def antsOf(self, player):
+        owner = self.antOwner
+        return [i for i in range(len(owner)) if owner[i] == player]
+
+    def constrsOf(self, player):
+        owner = self.constrOwner
+        return [i for i in range(len(owner)) if owner[i] == player]
+
+    ##
+    #findConstr
+    #Description: index of the first construction of the given player and type
+    #   or -1 if there is none
+    ##
+    def findConstr(self, player, constrType):
+        owner = self.constrOwner
+        types = self.constrType
+        for i in range(len(owner)):
+            if owner[i] == player and types[i] == constrType:
+                return i
+        return -1
+
+    ##
+    #addAnt
+    #Description: Appends a new ant to the state and returns its index.  If
+    #   the cell is already occupied the existing ant keeps the cell (this
+    #   matches the first-found behavior of AIPlayerUtils.getAntAt).
+    ##
+    def addAnt(self, cell, antType, owner, health = None, hasMoved = False, carrying = False):
+        if health is None:
+            health = UNIT_STATS[antType][HEALTH]
+        index = len(self.antCell)
+        self.antCell.append(cell)
+        self.antType.append(antType)
+        self.antOwner.append(owner)
+        self.antHealth.append(health)
+        self.antMoved.append(1 if hasMoved else 0)
+        self.antCarrying.append(1 if carrying else 0)
+        if self.cellAnt[cell] < 0:
+            self.cellAnt[cell] = index
+        return index
+
+    ##
+    #removeAnt
+    #Description: Deletes the ant at the given index.  Indices of all later
+    #   ants shift down by one.
+    ##
+    def removeAnt(self, index):
+        cellAnt = self.cellAnt
+        antCell = self.antCell
+        if cellAnt[antCell[index]] == index:
+            cellAnt[antCell[index]] = -1
+        del antCell[index]
+        del self.antType[index]
+        del self.antOwner[index]
+        del self.antHealth[index]
+        del self.antMoved[index]
+        del self.antCarrying[index]
+        for i in range(index, len(antCell)):
+            if cellAnt[antCell[i]] == i + 1:
+                cellAnt[antCell[i]] = i
+
+    ##
+    #moveAnt
+    #Description: Moves the ant at the given index to a new cell
+    ##
+    def moveAnt(self, index, cell):
+        oldCell = self.antCell[index]
+        if self.cellAnt[oldCell] == index:
+            self.cellAnt[oldCell] = -1
+        self.antCell[index] = cell
+        if self.cellAnt[cell] < 0:
+            self.cellAnt[cell] = index
+
+    ##
+    #addConstr
+    #Description: Appends a new construction to the state and returns its index
+    ##
+    def addConstr(self, cell, constrType, owner, captureHealth = None):
+        if captureHealth is None:
+            captureHealth = CONSTR_STATS[constrType][CAP_HEALTH] or 0
+        index = len(self.constrCell)
+        self.constrCell.append(cell)
+        self.constrType.append(constrType)
+        self.constrOwner.append(owner)
+        self.constrHealth.append(captureHealth)
+        if self.cellConstr[cell] < 0:
+            self.cellConstr[cell] = index
+        return index
+
+    ##
+    #getZobristKey
+    #Description: see GameState.getZobristKey
+    ##
+    def getZobristKey(self):
+        if self.zobristKey is None:
+            self.zobristKey = Zobrist.computeKey(self)
+        return self.zobristKey
+
+    ##
+    #coordLookup
+    #Description: see GameState.coordLookup
+    ##
+    def coordLookup(self, coords, playerId):
+        return GameState.coordLookup(self, coords, playerId)
+
+    ##
+    #buildTerrainCosts
+    #Description: see GameState.buildTerrainCosts
+    ##
+    def buildTerrainCosts(self):
+        return GameState.buildTerrainCosts(self)
+
+    ##
+    #clone
+    #Description: Returns a deep copy of itself.  The construction layout
+    #   arrays never change after setup and are shared with the copy.
+    ##
+    def clone(self):
+        result = CompactState.__new__(CompactState)
+        result.board = None
+        result.phase = self.phase
+        result.whoseTurn = self.whoseTurn
+        result.food = array('h', self.food)
+        result.cellAnt = array('b', self.cellAnt)
+        result.cellConstr = self.cellConstr
+        result.antCell = array('b', self.antCell)
+        result.antType = array('b', self.antType)
+        result.antOwner = array('b', self.antOwner)
+        result.antHealth = array('b', self.antHealth)
+        result.antMoved = array('b', self.antMoved)
+        result.antCarrying = array('b', self.antCarrying)
+        result.constrCell = self.constrCell
+        result.constrType = self.constrType
+        result.constrOwner = self.constrOwner
+        result.constrHealth = array('b', self.constrHealth)
+        result.zobristKey = self.zobristKey
+        result.terrainCosts = self.terrainCosts
+        return result
+
+    ##
+    #fastclone
+    #Description: A CompactState never has a board so this is the same as clone
+    ##
+    def fastclone(self):
+        return self.clone()
+
+    ##
+    #copyFrom
+    #Description: Overwrites this state with the contents of another
+    #   CompactState (e.g., a copy saved by AIPlayerUtils.applyMove)
+    ##
+    def copyFrom(self, other):
+        self.phase = other.phase
+        self.whoseTurn = other.whoseTurn
+        self.food[:] = other.food
+        self.cellAnt[:] = other.cellAnt
+        self.cellConstr = other.cellConstr
+        self.antCell[:] = other.antCell
+        self.antType[:] = other.antType
+        self.antOwner[:] = other.antOwner
+        self.antHealth[:] = other.antHealth
+        self.antMoved[:] = other.antMoved
+        self.antCarrying[:] = other.antCarrying
+        self.constrCell = other.constrCell
+        self.constrType = other.constrType
+        self.constrOwner = other.constrOwner
+        self.constrHealth[:] = other.constrHealth
+        self.zobristKey = other.zobristKey
+        self.terrainCosts = other.terrainCosts
+
+    ##
+    #nextState
+    #Description: The CompactState version of AIPlayerUtils.getNextState and
+    #   getNextStateAdversarial.  The original state is not modified.
+    #
+    #Parameters:
+    #   move - The move that the agent would take (Move)
+    #   adversarial - apply getNextStateAdversarial semantics (bool)
+    #
+    #Return: A copy of what the state would look like if the move was made
+    ##
+    def nextState(self, move, adversarial = False):
+        if move.moveType == BUILD and move.buildType == TUNNEL:
+            print("Attempted tunnel build in getNextState()")
+            return self
+        result = self.clone()
+        result.applyNextState(move, adversarial)
+        return result
+
+    ##
+    #applyNextState
+    #Description: Applies a move to this state in place using the same rules
+    #   as AIPlayerUtils.getNextState (see the caveats documented there).
+    #
+    #Parameters:
+    #   move - The move that the agent would take (Move)
+    #   adversarial - apply getNextStateAdversarial semantics (bool)
+    ##
+    def applyNextState(self, move, adversarial = False):
+        # getNextState leaves the state alone for a tunnel build
+        if move.moveType == BUILD and move.buildType == TUNNEL:
+            print("Attempted tunnel build in getNextState()")
+            return
+        me = self.whoseTurn
+        cellAnt = self.cellAnt
+        key = self.getZobristKey()
+        oldFood = self.food[me]
+
+        # If enemy ant is on my anthill update capture health
+        hill = self.findConstr(me, ANTHILL)
+        hillCell = self.constrCell[hill]
+        occupant = cellAnt[hillCell]
+        if occupant >= 0 and self.antOwner[occupant] != me:
+            key ^= self._constrKey(hill)
+            self.constrHealth[hill] -= 1
+            key ^= self._constrKey(hill)
+
+        if move.moveType == BUILD:
+            if move.buildType in (WORKER, DRONE, SOLDIER, R_SOLDIER):
+                key ^= self._antKey(self.addAnt(hillCell, move.buildType, me))
+                # getNextState charges 3 food for a soldier
+                if move.buildType == SOLDIER:
+                    self.food[me] -= 3
+                else:
+                    self.food[me] -= UNIT_STATS[move.buildType][COST]
+
+        elif move.moveType == MOVE_ANT:
+            startCell = cellIndex(move.coordList[0])
+            newCell = cellIndex(move.coordList[-1])
+            index = cellAnt[startCell]
+            if index >= 0 and self.antOwner[index] == me:
+                key ^= self._antKey(index)
+                self.moveAnt(index, newCell)
+                # getNextState leaves hasMoved False
+                self.antMoved[index] = 1 if adversarial else 0
+                antType = self.antType[index]
+                # If an ant is carrying food and ends on the anthill or tunnel drop the food
+                constr = self.cellConstr[newCell]
+                if self.antCarrying[index] and constr >= 0 and self.constrOwner[constr] == me:
+                    self.food[me] += 1
+                    self.antCarrying[index] = 0
+                # If an ant doesn't have food and ends on the food grab food
+                if not self.antCarrying[index] and antType == WORKER \
+                        and constr >= 0 and self.constrType[constr] == FOOD:
+                    self.antCarrying[index] = 1
+                key ^= self._antKey(index)
+                # If my ant is close to an enemy ant attack it
+                target = self._firstEnemyInRange(newCell, UNIT_STATS[antType][RANGE], me)
+                if target >= 0:
+                    key ^= self._antKey(target)
+                    self.antHealth[target] -= UNIT_STATS[antType][ATTACK]
+                    if self.antHealth[target] <= 0:
+                        self.removeAnt(target)
+                    else:
+                        key ^= self._antKey(target)
+
+        # The END move flips the turn and readies the player's ants for next time
+        elif move.moveType == END and adversarial:
+            owner = self.antOwner
+            moved = self.antMoved
+            for i in range(len(owner)):
+                if owner[i] == me and moved[i]:
+                    key ^= Zobrist.MOVED_KEYS[self.antCell[i]]
+                    moved[i] = 0
+            self.whoseTurn = 1 - me
+            key ^= Zobrist.TURN_KEYS[me] ^ Zobrist.TURN_KEYS[1 - me]
+
+        if self.food[me] != oldFood:
+            key ^= Zobrist.foodKey(me, oldFood) ^ Zobrist.foodKey(me, self.food[me])
+        self.zobristKey = key
+
+    ##
+    # helper for applyNextState that finds the first enemy ant in range of a
+    # cell in the order used by AIPlayerUtils.listAttackable.  Returns -1 if
+    # there is none.
+    def _firstEnemyInRange(self, cell, dist, me):
+        cellAnt = self.cellAnt
+        for newCell in BoardTables.attackableCellTable(dist)[cell]:
+            target = cellAnt[newCell]
+            if target >= 0 and self.antOwner[target] != me:
+                return target
+        return -1
+
+    ##
+    # Zobrist key contributions of one ant/construction (see Zobrist.py)
+    def _antKey(self, index):
+        return Zobrist.antKey(self.antOwner[index], self.antType[index], self.antCell[index],
+                              self.antHealth[index], self.antMoved[index], self.antCarrying[index])
+
+    def _constrKey(self, index):
+        return Zobrist.CAP_HEALTH_KEYS[self.constrCell[index]][self.constrHealth[index] % Zobrist.CAP_HEALTH_VALUES]
+
+
+##
+#CompactAnt
+#Description: A read/write view of a single ant in a CompactState that
+#   looks like an Ant object.  A view is only valid until an ant with a
+#   lower index is removed from the state.
+##
+class CompactAnt(object):
+    __slots__ = ('state', 'index')
+
+    def __init__(self, state, index):
+        self.state = state
+        self.index = index
+
+    @property
+    def coords(self):
+        return CELL_COORDS[self.state.antCell[self.index]]
+
+    @coords.setter
+    def coords(self, value):
+        self.state.moveAnt(self.index, cellIndex(value))
+
+    @property
+    def type(self):
+        return self.state.antType[self.index]
+
+    @property
+    def player(self):
+        return self.state.antOwner[self.index]
+
+    @property
+    def health(self):
+        return self.state.antHealth[self.index]
+
+    @health.setter
+    def health(self, value):
+        self.state.antHealth[self.index] = value
+
+    @property
+    def hasMoved(self):
+        return self.state.antMoved[self.index] != 0
+
+    @hasMoved.setter
+    def hasMoved(self, value):
+        self.state.antMoved[self.index] = 1 if value else 0
+
+    @property
+    def carrying(self):
+        return self.state.antCarrying[self.index] != 0
+
+    @carrying.setter
+    def carrying(self, value):
+        self.state.antCarrying[self.index] = 1 if value else 0
+
+    def __eq__(self, other):
+        return isinstance(other, CompactAnt) and other.state is self.state and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.state), self.index))
+
+    ##
+    # build a real Ant with the same values
+    def clone(self):
+        rtnAnt = Ant(self.coords, self.type, self.player)
+        rtnAnt.hasMoved = self.hasMoved
+        rtnAnt.carrying = self.carrying
+        rtnAnt.health = self.health
+        return rtnAnt
+
+
+##
+#CompactConstr
+#Description: A view of a single construction in a CompactState that
+#   looks like a Construction or Building object.
+##
+class CompactConstr(object):
+    __slots__ = ('state', 'index')
+
+    def __init__(self, state, index):
+        self.state = state
+        self.index = index
+
+    @property
+    def coords(self):
+        return CELL_COORDS[self.state.constrCell[self.index]]
+
+    @property
+    def type(self):
+        return self.state.constrType[self.index]
+
+    @property
+    def player(self):
+        return self.state.constrOwner[self.index]
+
+    @property
+    def movementCost(self):
+        return CONSTR_STATS[self.type][MOVE_COST]
+
+    @property
+    def captureHealth(self):
+        return self.state.constrHealth[self.index]
+
+    @captureHealth.setter
+    def captureHealth(self, value):
+        self.state.constrHealth[self.index] = value
+
+    def __eq__(self, other):
+        return isinstance(other, CompactConstr) and other.state is self.state and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.state), self.index))
+
+    ##
+    # build a real Building or Construction with the same values
+    def clone(self):
+        if self.player == NEUTRAL:
+            return Construction(self.coords, self.type)
+        return Building(self.coords, self.type, self.player, self.captureHealth)
+
+
+##
+#CompactInventory
+#Description: A view of one player's part of a CompactState that looks like
+#   an Inventory object.  The ants and constrs lists are built on access;
+#   adding or removing entries must be done through the CompactState.
+##
+class CompactInventory(object):
+    __slots__ = ('state', 'player')
+
+    def __init__(self, state, player):
+        self.state = state
+        self.player = player
+
+    @property
+    def ants(self):
+        if self.player == NEUTRAL:
+            return []
+        state = self.state
+        return [CompactAnt(state, i) for i in state.antsOf(self.player)]
+
+    @property
+    def constrs(self):
+        state = self.state
+        return [CompactConstr(state, i) for i in state.constrsOf(self.player)]
+
+    @property
+    def foodCount(self):
+        if self.player == NEUTRAL:
+            return 0
+        return self.state.food[self.player]
+
+    @foodCount.setter
+    def foodCount(self, value):
+        self.state.food[self.player] = value
+
+    def getQueen(self):
+        state = self.state
+        for i in state.antsOf(self.player):
+            if state.antType[i] == QUEEN:
+                return CompactAnt(state, i)
+        return None
+
+    def getAnthill(self):
+        index = self.state.findConstr(self.player, ANTHILL)
+        if index < 0:
+            return None
+        return CompactConstr(self.state, index)
+
+    def getTunnels(self):
+        state = self.state
+        return [CompactConstr(state, i) for i in state.constrsOf(self.player)
+                if state.constrType[i] == TUNNEL]
+
+    def clone(self):
+        return Inventory(self.player, self.ants, self.constrs, self.foodCount)
+
+
+##
+# to_compact
+#
+# Description: builds a CompactState holding the same information as a
+# GameState.  The board of the GameState is not consulted so states
+# generated by GameState.fastclone may be converted.
+#
+# Parameters:
+#   state - the GameState to convert
+#
+# Return: a new CompactState
+##
+def to_compact(state):
+    result = CompactState(state.phase, state.whoseTurn)
+    for inv in state.inventories:
+        if inv.player != NEUTRAL:
+            result.food[inv.player] = inv.foodCount
+        for ant in inv.ants:
+            result.addAnt(cellIndex(ant.coords), ant.type, ant.player, ant.health,
+                          ant.hasMoved, ant.carrying)
+    for inv in state.inventories:
+        for constr in inv.constrs:
+            if inv.player == NEUTRAL:
+                result.addConstr(cellIndex(constr.coords), constr.type, NEUTRAL, 0)
+            else:
+                result.addConstr(cellIndex(constr.coords), constr.type, constr.player,
+                                 constr.captureHealth)
+    result.terrainCosts = state.terrainCosts
+    return result
+
+
+##
+# from_compact
+#
+# Description: rebuilds a GameState (with a board) from a CompactState.
+#
+# Parameters:
+#   compact - the CompactState to convert
+#
+# Return: a new GameState
+##
+def from_compact(compact):
+    board = [[Location((y, x)) for y in range(BOARD_LENGTH)] for x in range(BOARD_LENGTH)]
+    inventories = [Inventory(PLAYER_ONE, [], [], int(compact.food[PLAYER_ONE])),
+                   Inventory(PLAYER_TWO, [], [], int(compact.food[PLAYER_TWO])),
+                   Inventory(NEUTRAL, [], [], 0)]
+    for i in range(len(compact.antCell)):
+        ant = CompactAnt(compact, i).clone()
+        inventories[ant.player].ants.append(ant)
+        loc = board[ant.coords[0]][ant.coords[1]]
+        if loc.ant is None:
+            loc.ant = ant
+    for i in range(len(compact.constrCell)):
+        constr = CompactConstr(compact, i).clone()
+        owner = compact.constrOwner[i]
+        inventories[owner].constrs.append(constr)
+        loc = board[constr.coords[0]][constr.coords[1]]
+        if loc.constr is None:
+            loc.constr = constr
+    result = GameState(board, inventories, compact.phase, compact.whoseTurn)
+    result.terrainCosts = compact.terrainCosts
+    return result
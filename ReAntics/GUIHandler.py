@@ -322,7 +322,7 @@ class GUIHandler:
             self.gameHandler.setInstructionText("Select where to place your enemy's food. 2 remaining.")
         else:
             # enable undo if there are states to undo to
-            if len(self.game.undoStates) > 0:
+            if len(self.game.undoLog) > 0:
                 self.gameHandler.undoButton.enable()
             else:
                 self.gameHandler.undoButton.disable()
@@ -21,6 +21,10 @@ import functools
 from functools import partial
 import copy
 import InfoScraper as Is
+import Zobrist
+import GameRules
+from LegalityOracle import LegalityOracle
+from StateView import StateView
 
 
 class GameData:
@@ -48,7 +52,9 @@ class Game(object):
         self.players = []
         self.state = None
         self.move = None
-        self.undoStates = []
+        # one GameRules journal per move made this turn (human games only)
+        self.undoLog = []
+        self.legalityOracle = None
         self.currentPlayers = []
         self.currentPlayerScores = []
         self.gamesToPlay = []
@@ -745,16 +751,13 @@ class Game(object):
         while not self.gameOver:
             if self.killed:
                 return
-            # create a copy of the state to share with the player
-            theState = self.state.clone()
-
             # I think this is where it should go
+            # (the GUI thread gets a copy, never the state being played on)
             if self.UI is not None:
-                self.UI.showState(theState)
+                self.UI.showState(self.state.fastclone())
 
-            # if the player is player two, flip the board
-            if theState.whoseTurn == PLAYER_TWO:
-                theState.flipBoard()
+            # the state to share with the player (seen from their side of the board)
+            theState = self.getPlayerState()
 
             if self.state.phase == SETUP_PHASE_1 or self.state.phase == SETUP_PHASE_2:
                 currentPlayer = self.currentPlayers[self.state.whoseTurn]
@@ -858,6 +861,13 @@ class Game(object):
                         # change player turn in state
                         self.state.whoseTurn = (self.state.whoseTurn + 1) % 2
 
+                        # from here on the state's hash and coordinate index are kept
+                        # up to date as moves are made and the terrain never changes
+                        if self.state.phase == PLAY_PHASE:
+                            self.state.zobristKey = Zobrist.computeKey(self.state)
+                            self.state.buildIndex()
+                            self.state.terrainCosts = self.state.buildTerrainCosts()
+
                 else:
                     if not type(currentPlayer) is HumanPlayer.HumanPlayer:
                         # cause current player to lose game because AIs aren't allowed to make mistakes.
@@ -907,52 +917,31 @@ class Game(object):
                 if validMove:
                     # check move type
                     if self.move.moveType == MOVE_ANT:
-                        # record state in undo before applying move
+                        # record the changes the move makes so it can be undone
+                        journal = None
                         if self.hasHumanPlayer:
-                            self.undoStates.append(self.state.clone())
-                        startCoord = self.move.coordList[0]
-                        endCoord = self.move.coordList[-1]
-
-                        # take ant from start coord
-                        antToMove = self.state.board[startCoord[0]][startCoord[1]].ant
-
-                        # change ant's coords and hasMoved status
-                        antToMove.coords = (endCoord[0], endCoord[1])
-                        antToMove.hasMoved = True
-
-                        # remove ant from location
-                        self.state.board[startCoord[0]][startCoord[1]].ant = None
+                            journal = []
+                            self.undoLog.append(journal)
 
-                        # put ant at last loc in coordList
-                        self.state.board[endCoord[0]][endCoord[1]].ant = antToMove
+                        # move the ant to the last loc in coordList
+                        antToMove = GameRules.applyMove(self.state, self.move, GameRules.ENGINE_RULES, journal)
 
                         # if AI mode, pause to observe move until next or continue is clicked
                         self.pauseGame()
 
                         # check and take action for attack (workers can not attack)
                         if antToMove.type != WORKER:
-                            self.resolveAttack(antToMove, currentPlayer)
+                            self.resolveAttack(antToMove, currentPlayer, journal)
 
                     elif self.move.moveType == BUILD:
-                        # record state in undo before applying move
+                        # record the changes the move makes so it can be undone
+                        journal = None
                         if self.hasHumanPlayer:
-                            self.undoStates.append(self.state.clone())
-                        coord = self.move.coordList[0]
-                        currentPlayerInv = self.state.inventories[self.state.whoseTurn]
+                            journal = []
+                            self.undoLog.append(journal)
 
-                        # subtract the cost of the item from the player's food count
-                        if self.move.buildType == TUNNEL:
-                            currentPlayerInv.foodCount -= CONSTR_STATS[self.move.buildType][BUILD_COST]
-
-                            tunnel = Building(coord, TUNNEL, self.state.whoseTurn)
-                            self.state.board[coord[0]][coord[1]].constr = tunnel
-                        else:
-                            currentPlayerInv.foodCount -= UNIT_STATS[self.move.buildType][COST]
-
-                            ant = Ant(coord, self.move.buildType, self.state.whoseTurn)
-                            ant.hasMoved = True
-                            self.state.board[coord[0]][coord[1]].ant = ant
-                            self.state.inventories[self.state.whoseTurn].ants.append(ant)
+                        # place the new ant and pay for it
+                        GameRules.applyMove(self.state, self.move, GameRules.ENGINE_RULES, journal)
 
                         # if AI mode, pause to observe move until next or continue is clicked
                         self.pauseGame()
@@ -963,33 +952,11 @@ class Game(object):
 
                     elif self.move.moveType == END:
                         # reset undo moves on each turn change
-                        self.undoStates = []
+                        self.undoLog = []
 
                         # take care of end of turn business for ants and constructions
-                        for ant in self.state.inventories[self.state.whoseTurn].ants:
-                            constrUnderAnt = self.state.board[ant.coords[0]][ant.coords[1]].constr
-                            if constrUnderAnt != None:
-                                # if constr is enemy's and ant hasnt moved, affect capture health of buildings
-                                if type(
-                                        constrUnderAnt) is Building and not constrUnderAnt.player == self.state.whoseTurn:
-                                    constrUnderAnt.captureHealth -= 1
-                                # have all worker ants on food sources gather food
-                                elif constrUnderAnt.type == FOOD and ant.type == WORKER:
-                                    ant.carrying = True
-                                # deposit carried food (only workers carry)
-                                elif (
-                                        constrUnderAnt.type == ANTHILL or constrUnderAnt.type == TUNNEL) and ant.carrying == True:
-                                    self.state.inventories[self.state.whoseTurn].foodCount += 1
-                                    ant.carrying = False
-
-                            # reset hasMoved on all ants of player
-                            ant.hasMoved = False
-
-                        # clear any currently highlighted squares
-                        # self.ui.coordList = []
-
-                        # switch whose turn it is
-                        self.state.whoseTurn = (self.state.whoseTurn + 1) % 2
+                        # (capturing, gathering food) and switch whose turn it is
+                        GameRules.applyMove(self.state, self.move, GameRules.ENGINE_RULES)
 
                         # notify player which AI is acting
                         nextPlayerName = self.currentPlayers[self.state.whoseTurn].author
@@ -997,8 +964,12 @@ class Game(object):
 
                         # if AI mode, pause to observe move until next or continue is clicked
                         self.pauseGame()
-                    elif self.move.moveType == UNDO and len(self.undoStates) > 0:
-                        self.state = self.undoStates.pop()
+                    elif self.move.moveType == UNDO and len(self.undoLog) > 0:
+                        # play the last move's changes back in reverse
+                        GameRules.undo(self.state, self.undoLog.pop())
+
+                    # the state has changed
+                    self.legalityOracle = None
                 else:
                     # human can give None move, AI can't
                     if not type(currentPlayer) is HumanPlayer.HumanPlayer:
@@ -1029,7 +1000,7 @@ class Game(object):
 
     def resolveEndGame(self):
         if self.UI is not None:
-            self.UI.showState(self.state)
+            self.UI.showState(self.state.fastclone())
             # notify the user of the winner
             winnerName = "Copy"
             if self.winner > -1:
@@ -1088,23 +1059,19 @@ class Game(object):
     # Parameters:
     #   attackingAnt - The Ant that has an available attack (Ant)
     #   currentPlayer - The Player whose turn it currently is (Player)
-    ##
-    def resolveAttack(self, attackingAnt, currentPlayer):
-        # check if player wants to attack
-        validAttackCoords = []
-        opponentId = (self.state.whoseTurn + 1) % 2
-        for ant in self.state.inventories[opponentId].ants:
-            if self.isValidAttack(attackingAnt, ant.coords):
-                # keep track of valid attack coords (flipped for player two)
-                validAttackCoords.append(self.state.coordLookup(ant.coords, self.state.whoseTurn))
+    #   journal - list to record the attack's changes in for undo or None
+    ##
+    def resolveAttack(self, attackingAnt, currentPlayer, journal = None):
+        # check if player wants to attack: the enemy ants in range of the
+        # attacker come from the coordinate index (see GameRules.attackTargets)
+        targets = GameRules.attackTargets(self.state, attackingAnt.coords, attackingAnt.type, attackingAnt.player)
+        # keep track of valid attack coords (flipped for player two)
+        validAttackCoords = [self.state.coordLookup(ant.coords, self.state.whoseTurn) for ant in targets]
         if validAttackCoords != []:
-            theState = self.state.clone()
-
             if self.UI is not None:
-                self.UI.showState(theState)
+                self.UI.showState(self.state.fastclone())
 
-            if theState.whoseTurn == PLAYER_TWO:
-                theState.flipBoard()
+            theState = self.getPlayerState()
 
             if isinstance(currentPlayer, HumanPlayer.HumanPlayer):
                 # have to swap ant back for the GUI if its player 2
@@ -1119,16 +1086,8 @@ class Game(object):
                 attackCoord = self.state.coordLookup(
                     currentPlayer.getAttack(theState, attackingAnt.clone(), validAttackCoords), theState.whoseTurn)
 
-            # decrement ants health
-            attackedAnt = self.state.board[attackCoord[0]][attackCoord[1]].ant
-            attackedAnt.health -= UNIT_STATS[attackingAnt.type][ATTACK]
-
-            # check for dead ant
-            if attackedAnt.health <= 0:
-                # remove dead ant from board
-                self.state.board[attackCoord[0]][attackCoord[1]].ant = None
-                # remove dead ant from inventory
-                self.state.inventories[opponentId].ants.remove(attackedAnt)
+            # decrement ants health (and remove it if it dies)
+            GameRules.applyAttack(self.state, attackingAnt, attackCoord, journal)
 
             # if AI mode, pause to observe attack until next or continue is clicked
             self.pauseGame()
@@ -1263,6 +1222,11 @@ class Game(object):
         if type(move.buildType) != type(None) and type(move.buildType) != int:
             return False
 
+        # most moves are legal, so try the quick check first.  Anything it
+        # doesn't accept gets the full checks below (and their error messages)
+        if self.state.phase == PLAY_PHASE and self.getLegalityOracle().accepts(move):
+            return True
+
         # for MOVE_ANT and BUILD type moves
         if move.moveType == MOVE_ANT:
             firstCoord = move.coordList[0]
@@ -1405,6 +1369,33 @@ class Game(object):
             # invalid numeric move type
             return False
 
+    ##
+    # getPlayerState
+    # Description: Returns the state to give the player whose turn it is.
+    #   During play players that accept one get a read-only StateView, which
+    #   costs nothing to make.  Everyone else gets their own copy of the
+    #   state, flipped for player two so both players play from the top of
+    #   the board.
+    ##
+    def getPlayerState(self):
+        currentPlayer = self.currentPlayers[self.state.whoseTurn]
+        if self.state.phase == PLAY_PHASE and currentPlayer.acceptsStateView:
+            return StateView(self.state, self.state.whoseTurn)
+        theState = self.state.clone()
+        if theState.whoseTurn == PLAYER_TWO:
+            theState.flipBoard()
+        return theState
+
+    ##
+    # getLegalityOracle
+    # Description: Returns the LegalityOracle for the current state, making a
+    #   new one if a move has been applied since the last one was made.
+    ##
+    def getLegalityOracle(self):
+        if self.legalityOracle is None or self.legalityOracle.state is not self.state:
+            self.legalityOracle = LegalityOracle(self.state)
+        return self.legalityOracle
+
     ##
     # isValidPlacement
     # Description: Checks that the given placement of Constructions is valid
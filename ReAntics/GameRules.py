@@ -0,0 +1,438 @@
+from Constants import *
+from Ant import Ant, UNIT_STATS
+from Building import Building
+from Construction import CONSTR_STATS
+import Zobrist
+import BoardTables
+
+#
+# GameRules.py
+#
+# The rules for applying a move to a GameState.  The game engine
+# (Game.runGame and Game.resolveAttack) and the AIPlayerUtils search helpers
+# (getNextState, getNextStateAdversarial, getNextStates and applyMove) all go
+# through applyMove below, so there is one implementation to keep correct and
+# to make fast.
+#
+# There are three rule sets:
+#
+#   ENGINE_RULES      - exactly what the game engine does.  A move never
+#                       attacks on its own (the engine asks the player for a
+#                       target and then calls applyAttack), food is picked up
+#                       and dropped off and buildings are captured when the
+#                       turn ENDs, and END passes the turn.
+#   SEARCH_RULES      - getNextState.  Convenient approximations for looking
+#                       ahead within a turn: hasMoved is left alone, END does
+#                       nothing, food is picked up and dropped off as soon as
+#                       a worker gets there, the first enemy in range is
+#                       attacked automatically and the player's anthill loses
+#                       capture health on every move while an enemy is on it.
+#   ADVERSARIAL_RULES - getNextStateAdversarial.  SEARCH_RULES except that
+#                       hasMoved is set and END passes the turn.
+#
+# The move is assumed to be legal (see Game.isValidMove).  The state's
+# inventories, coordinate index, board (if it has one) and Zobrist key are
+# all kept up to date.  States that share records with other states (see
+# GameState.shareclone) are handled by replacing each shared record with a
+# private copy before it is changed.
+#
+# Every change can optionally be recorded in a journal so that undo() can
+# restore the state exactly.
+#
+
+ENGINE_RULES = 0
+SEARCH_RULES = 1
+ADVERSARIAL_RULES = 2
+
+#kinds of entries in an undo journal
+_SET_ATTR = 0     # (_SET_ATTR, object, attribute name, old value)
+_LIST_APPEND = 1  # (_LIST_APPEND, list)
+_LIST_REMOVE = 2  # (_LIST_REMOVE, list, index, removed item)
+_DICT_SET = 3     # (_DICT_SET, dict, key, old value or None if absent)
+
+_ANT_TYPES = (WORKER, DRONE, SOLDIER, R_SOLDIER)
+
+
+##
+# applyMove
+#
+# Description: Applies a move to the given state in place
+#
+# Parameters:
+#   state - the state to modify (GameState)
+#   move - the move to make (Move)
+#   rules - ENGINE_RULES, SEARCH_RULES or ADVERSARIAL_RULES
+#   journal - list to record each change in so that undo can revert them, or
+#       None
+#   context - the state's moveContext if it is already known (the search
+#       rules only)
+#
+# Return: the ant that was moved or built (None for other moves)
+##
+def applyMove(state, move, rules, journal = None, context = None):
+    if journal is not None:
+        journal.append((_SET_ATTR, state, 'zobristKey', state.getZobristKey()))
+        journal.append((_SET_ATTR, state, 'whoseTurn', state.whoseTurn))
+    if rules == ENGINE_RULES:
+        return _applyEngineMove(state, move, journal)
+    return _applySearchMove(state, move, rules == ADVERSARIAL_RULES, journal, context)
+
+##
+# nextState
+#
+# Description: Applies a move to a copy of the given state.  The copy is a
+# shareclone if the state already shares its records (so a search tree that
+# starts from a shareclone stays copy-on-write) and a fastclone otherwise.
+#
+# Parameters:
+#   state - the state to copy (GameState).  It is not modified.
+#   move - the move to make (Move)
+#   rules - ENGINE_RULES, SEARCH_RULES or ADVERSARIAL_RULES
+#
+# Return: the new state
+##
+def nextState(state, move, rules):
+    # computing the key before cloning caches it in the parent as well
+    state.getZobristKey()
+    if state.sharedRecords is not None:
+        child = state.shareclone()
+    else:
+        child = state.fastclone()
+    applyMove(child, move, rules)
+    return child
+
+##
+# applyAttack
+#
+# Description: Makes one ant attack the enemy ant at the given coordinates
+# (which is assumed to be a valid target, see Game.isValidAttack).  The
+# target loses health and is removed from the game if it runs out.
+#
+# Parameters:
+#   state - the state to modify (GameState)
+#   attackingAnt - the attacker (Ant)
+#   attackCoords - where the target is (an x,y coord)
+#   journal - list to record each change in or None
+##
+def applyAttack(state, attackingAnt, attackCoords, journal = None):
+    if journal is not None:
+        journal.append((_SET_ATTR, state, 'zobristKey', state.getZobristKey()))
+    state.zobristKey = _attack(state, attackingAnt.type, tuple(attackCoords),
+                               state.getZobristKey(), journal)
+
+##
+# attackTargets
+#
+# Description: Lists the enemy ants an ant of the given type could attack
+# from the given cell.  Only the cells in range are looked at (through the
+# state's coordinate index) rather than every enemy ant.
+#
+# Parameters:
+#   state - the state (GameState or CompactState)
+#   coords - where the attacker is (an x,y coord)
+#   antType - the attacker's type
+#   player - the attacker's owner
+#
+# Return: a list of Ants in the order they are in their owner's inventory
+##
+def attackTargets(state, coords, antType, player):
+    targets = []
+    for cell in BoardTables.attackableTable(UNIT_STATS[antType][RANGE])[coords]:
+        ant = state.getAntAt(cell)
+        if ant is not None and ant.player != player:
+            targets.append(ant)
+    if len(targets) > 1:
+        targets = [ant for ant in state.inventories[1 - player].ants if ant in targets]
+    return targets
+
+##
+# attackMap
+#
+# Description: Works out, for every cell, which enemy ants an ant of each
+# type standing there could attack.
+#
+# Parameters:
+#   state - the state (GameState or CompactState)
+#   player - the attacking player
+#
+# Return: a list indexed by ant type of dicts mapping coords to the list of
+#   enemy Ants in range (in inventory order).  Cells with nothing in range
+#   are left out.  Types with the same range share the same dict.
+##
+def attackMap(state, player):
+    byRange = {}
+    result = []
+    for stats in UNIT_STATS:
+        attackRange = stats[RANGE]
+        if attackRange not in byRange:
+            cells = {}
+            table = BoardTables.attackableTable(attackRange)
+            #attack ranges are symmetric: the cells an enemy can be
+            #attacked from are the cells in range of it
+            for ant in state.inventories[1 - player].ants:
+                for coords in table[ant.coords]:
+                    if coords in cells:
+                        cells[coords].append(ant)
+                    else:
+                        cells[coords] = [ant]
+            byRange[attackRange] = cells
+        result.append(byRange[attackRange])
+    return result
+
+##
+# undo
+#
+# Description: Reverts the changes recorded in a journal.  Journals must be
+# undone in the reverse order they were recorded.
+#
+# Parameters:
+#   state - the state that was modified
+#   journal - the journal the changes were recorded in
+##
+def undo(state, journal):
+    for i in range(len(journal) - 1, -1, -1):
+        entry = journal[i]
+        if entry[0] == _SET_ATTR:
+            setattr(entry[1], entry[2], entry[3])
+        elif entry[0] == _LIST_APPEND:
+            entry[1].pop()
+        elif entry[0] == _LIST_REMOVE:
+            entry[1].insert(entry[2], entry[3])
+        elif entry[3] is None:  # _DICT_SET of a key that was absent
+            del entry[1][entry[2]]
+        else:
+            entry[1][entry[2]] = entry[3]
+
+##
+# moveContext
+#
+# Description: Returns the facts about the state before the move that the
+# search rules need: (whose turn it is, the index of their anthill in their
+# inventory, whether an enemy ant is on it, their tunnels' coords).  These
+# are the same for every move from a given state so getNextStates computes
+# them once for all the children.  Looking up the anthill also builds the
+# state's coordinate index before anything changes.
+##
+def moveContext(state):
+    me = state.whoseTurn
+    myInv = state.inventories[me]
+    hillIndex = 0
+    tunnelCoords = []
+    for i in range(len(myInv.constrs) - 1, -1, -1):
+        constr = myInv.constrs[i]
+        if constr.type == ANTHILL:
+            hillIndex = i
+        elif constr.type == TUNNEL:
+            tunnelCoords.append(constr.coords)
+    ant = state.getAntAt(myInv.constrs[hillIndex].coords)
+    return (me, hillIndex, ant is not None and ant.player != me, tunnelCoords)
+
+
+##
+# helper that records the old value before changing an attribute
+def _setAttr(journal, obj, name, value):
+    if journal is not None:
+        journal.append((_SET_ATTR, obj, name, getattr(obj, name)))
+    setattr(obj, name, value)
+
+##
+# helper that puts an ant in (or, with ant = None, clears) a cell of the
+# state's coordinate index and of its board if it has one
+def _setIndexedAnt(journal, state, coords, ant):
+    index = state.antIndex
+    if journal is not None:
+        journal.append((_DICT_SET, index, coords, index.get(coords)))
+    if ant is None:
+        del index[coords]
+    else:
+        index[coords] = ant
+    if state._board is not None:
+        _setAttr(journal, state._board[coords[0]][coords[1]], 'ant', ant)
+
+##
+# helper that adds a new ant to the current player's inventory
+def _addAnt(journal, state, ant):
+    ants = state.inventories[ant.player].ants
+    ants.append(ant)
+    if journal is not None:
+        journal.append((_LIST_APPEND, ants))
+    if ant.coords not in state.antIndex:
+        _setIndexedAnt(journal, state, ant.coords, ant)
+
+##
+# helper for the attacks of both rule sets.  Returns the updated key.
+def _attack(state, attackerType, coords, key, journal):
+    target = state.writableAnt(state.getAntAt(coords))
+    key ^= Zobrist.keyOfAnt(target)
+    _setAttr(journal, target, 'health', target.health - UNIT_STATS[attackerType][ATTACK])
+    if target.health <= 0:
+        # the ant dies and is removed from the game
+        enemyAnts = state.inventories[target.player].ants
+        index = enemyAnts.index(target)
+        del enemyAnts[index]
+        if journal is not None:
+            journal.append((_LIST_REMOVE, enemyAnts, index, target))
+        _setIndexedAnt(journal, state, coords, None)
+    else:
+        key ^= Zobrist.keyOfAnt(target)
+    return key
+
+##
+# helper for applyMove with ENGINE_RULES
+def _applyEngineMove(state, move, journal):
+    me = state.whoseTurn
+    myInv = state.inventories[me]
+    key = state.getZobristKey()
+    oldFood = myInv.foodCount
+    # make sure the index exists before anything changes
+    if state.antIndex is None:
+        state.buildIndex()
+    result = None
+
+    if move.moveType == MOVE_ANT:
+        startCoord = tuple(move.coordList[0])
+        endCoord = tuple(move.coordList[-1])
+        ant = state.writableAnt(state.getAntAt(startCoord))
+        key ^= Zobrist.keyOfAnt(ant)
+        if endCoord != startCoord:
+            _setIndexedAnt(journal, state, startCoord, None)
+            _setIndexedAnt(journal, state, endCoord, ant)
+        _setAttr(journal, ant, 'coords', endCoord)
+        _setAttr(journal, ant, 'hasMoved', True)
+        key ^= Zobrist.keyOfAnt(ant)
+        result = ant
+
+    elif move.moveType == BUILD:
+        coord = tuple(move.coordList[0])
+        if move.buildType == TUNNEL:
+            _setAttr(journal, myInv, 'foodCount', myInv.foodCount - CONSTR_STATS[TUNNEL][BUILD_COST])
+            tunnel = Building(coord, TUNNEL, me)
+            myInv.constrs.append(tunnel)
+            if journal is not None:
+                journal.append((_LIST_APPEND, myInv.constrs))
+            if state.constrIndex is not None:
+                if journal is not None:
+                    journal.append((_DICT_SET, state.constrIndex, coord, state.constrIndex.get(coord)))
+                state.constrIndex[coord] = tunnel
+            if state._board is not None:
+                _setAttr(journal, state._board[coord[0]][coord[1]], 'constr', tunnel)
+            key ^= Zobrist.keyOfBuilding(tunnel)
+        else:
+            _setAttr(journal, myInv, 'foodCount', myInv.foodCount - UNIT_STATS[move.buildType][COST])
+            ant = Ant(coord, move.buildType, me)
+            ant.hasMoved = True
+            _addAnt(journal, state, ant)
+            key ^= Zobrist.keyOfAnt(ant)
+            result = ant
+
+    elif move.moveType == END:
+        for ant in list(myInv.ants):
+            ant = state.writableAnt(ant)
+            key ^= Zobrist.keyOfAnt(ant)
+            constrUnderAnt = state.getConstrAt(ant.coords)
+            if constrUnderAnt is not None:
+                # ants on the enemy's anthill or tunnel capture it
+                if type(constrUnderAnt) is Building and constrUnderAnt.player != me:
+                    constrUnderAnt = state.writableConstr(constrUnderAnt)
+                    key ^= Zobrist.keyOfBuilding(constrUnderAnt)
+                    _setAttr(journal, constrUnderAnt, 'captureHealth', constrUnderAnt.captureHealth - 1)
+                    key ^= Zobrist.keyOfBuilding(constrUnderAnt)
+                # workers on food pick it up
+                elif constrUnderAnt.type == FOOD and ant.type == WORKER:
+                    _setAttr(journal, ant, 'carrying', True)
+                # and drop it off at their own anthill or tunnel
+                elif (constrUnderAnt.type == ANTHILL or constrUnderAnt.type == TUNNEL) and ant.carrying:
+                    _setAttr(journal, myInv, 'foodCount', myInv.foodCount + 1)
+                    _setAttr(journal, ant, 'carrying', False)
+            _setAttr(journal, ant, 'hasMoved', False)
+            key ^= Zobrist.keyOfAnt(ant)
+        state.whoseTurn = 1 - me
+        key ^= Zobrist.TURN_KEYS[me] ^ Zobrist.TURN_KEYS[state.whoseTurn]
+
+    if myInv.foodCount != oldFood:
+        key ^= Zobrist.foodKey(me, oldFood) ^ Zobrist.foodKey(me, myInv.foodCount)
+    state.zobristKey = key
+    return result
+
+##
+# helper for applyMove with SEARCH_RULES and ADVERSARIAL_RULES
+def _applySearchMove(state, move, adversarial, journal, context):
+    # variables I will need
+    if context is None:
+        context = moveContext(state)
+    me, hillIndex, hillOccupied, tunnelCoords = context
+    myInv = state.inventories[me]
+    myAntHill = myInv.constrs[hillIndex]
+    # the state's hash is updated incrementally as the state changes
+    key = state.getZobristKey()
+    oldFood = myInv.foodCount
+    result = None
+
+    # If enemy ant is on my anthill or tunnel update capture health
+    if hillOccupied:
+        myAntHill = state.writableConstr(myAntHill)
+        key ^= Zobrist.keyOfBuilding(myAntHill)
+        _setAttr(journal, myAntHill, 'captureHealth', myAntHill.captureHealth - 1)
+        key ^= Zobrist.keyOfBuilding(myAntHill)
+
+    # If an ant is built update list of ants
+    if move.moveType == BUILD:
+        if move.buildType in _ANT_TYPES:
+            ant = Ant(myAntHill.coords, move.buildType, me)
+            _addAnt(journal, state, ant)
+            key ^= Zobrist.keyOfAnt(ant)
+            # Update food count depending on ant built
+            if move.buildType == WORKER:
+                _setAttr(journal, myInv, 'foodCount', myInv.foodCount - 1)
+            elif move.buildType == DRONE or move.buildType == R_SOLDIER:
+                _setAttr(journal, myInv, 'foodCount', myInv.foodCount - 2)
+            elif move.buildType == SOLDIER:
+                _setAttr(journal, myInv, 'foodCount', myInv.foodCount - 3)
+            result = ant
+
+    # If an ant is moved update their coordinates and has moved
+    elif move.moveType == MOVE_ANT:
+        newCoord = tuple(move.coordList[-1])
+        startingCoord = tuple(move.coordList[0])
+        for ant in myInv.ants:
+            if ant.coords == startingCoord:
+                ant = state.writableAnt(ant)
+                key ^= Zobrist.keyOfAnt(ant)
+                if newCoord != startingCoord:
+                    _setIndexedAnt(journal, state, startingCoord, None)
+                    _setIndexedAnt(journal, state, newCoord, ant)
+                _setAttr(journal, ant, 'coords', newCoord)
+                # getNextState leaves hasMoved False (see SEARCH_RULES)
+                _setAttr(journal, ant, 'hasMoved', adversarial)
+                # If an ant is carrying food and ends on the anthill or tunnel drop the food
+                if ant.carrying and (ant.coords == myAntHill.coords or ant.coords in tunnelCoords):
+                    _setAttr(journal, myInv, 'foodCount', myInv.foodCount + 1)
+                    _setAttr(journal, ant, 'carrying', False)
+                # If an ant doesn't have food and ends on the food grab food
+                if not ant.carrying and ant.type == WORKER:
+                    food = state.getConstrAt(ant.coords)
+                    if food is not None and food.type == FOOD:
+                        _setAttr(journal, ant, 'carrying', True)
+                key ^= Zobrist.keyOfAnt(ant)
+                # If my ant is close to an enemy ant attack it (only the first one)
+                for coord in BoardTables.attackableTable(UNIT_STATS[ant.type][RANGE])[ant.coords]:
+                    foundAnt = state.getAntAt(coord)
+                    if foundAnt is not None and foundAnt.player != me:
+                        key = _attack(state, ant.type, coord, key, journal)
+                        break
+                result = ant
+                break
+
+    # The END move flips the turn and readies the player's ants for next time
+    elif move.moveType == END and adversarial:
+        for ant in myInv.ants:
+            if ant.hasMoved:
+                key ^= Zobrist.MOVED_KEYS[ant.coords[0] * BOARD_LENGTH + ant.coords[1]]
+                _setAttr(journal, state.writableAnt(ant), 'hasMoved', False)
+        state.whoseTurn = 1 - me
+        key ^= Zobrist.TURN_KEYS[me] ^ Zobrist.TURN_KEYS[state.whoseTurn]
+
+    if myInv.foodCount != oldFood:
+        key ^= Zobrist.foodKey(me, oldFood) ^ Zobrist.foodKey(me, myInv.foodCount)
+    state.zobristKey = key
+    return result
@@ -4,6 +4,7 @@ from Inventory import Inventory
 from Building import Building
 from Location import *
 from Ant import Ant
+import Zobrist
 
 def addCoords(tuple1, tuple2):
     if len(tuple1) != len(tuple2):
@@ -23,10 +24,24 @@ def subtractCoords(tuple1, tuple2):
 #Description: The current state of the game.
 #
 #Variables:
-#   board - The game Board being used. A 2d array of Location.
+#   board - The game Board being used. A 2d array of Location.  States made
+#       by fastclone and shareclone build it from the inventories the first
+#       time it is read (see buildBoard).
 #   inventories - A tuple containing the Inventory for each player.
 #   phase - The current phase of the game.
 #    whoseTurn - The ID of the Player who's turn it currently is.
+#   zobristKey - 64-bit hash of the state or None if it hasn't been
+#       computed yet (see getZobristKey)
+#   antIndex, constrIndex - dictionaries from coordinates to the Ant
+#       (Construction) there or None if they haven't been built yet (see
+#       getAntAt and getConstrAt)
+#   terrainCosts - the cost of moving onto each cell (terrainCosts[x][y]) as
+#       a tuple of tuples or None if it hasn't been computed.  Grass and food
+#       never move after setup so the table is shared by reference between a
+#       state and all of its clones (see AIPlayerUtils.getTerrainCosts).
+#   sharedRecords - set of Ant/Construction objects this state shares with
+#       other states or None if the state owns all of its records (see
+#       shareclone)
 ##
 class GameState(object):
 
@@ -42,10 +57,169 @@ class GameState(object):
     #   inputTurn - The ID of the Player who's turn it is (int)
     ##
     def __init__(self, inputBoard, inputInventories, inputPhase, inputTurn):
-        self.board = inputBoard
+        self._board = inputBoard
         self.inventories = inputInventories
         self.phase = inputPhase
         self.whoseTurn = inputTurn
+        self.zobristKey = None
+        self.antIndex = None
+        self.constrIndex = None
+        self.terrainCosts = None
+        self.sharedRecords = None
+
+    ##
+    #board
+    #Description: The board is built from the inventories on first access
+    #   and cached until it is invalidated by assigning None to it.  The
+    #   move rules (see GameRules) keep a cached board up to date.
+    ##
+    @property
+    def board(self):
+        if self._board is None:
+            self._board = self.buildBoard()
+        return self._board
+
+    @board.setter
+    def board(self, inputBoard):
+        self._board = inputBoard
+
+    ##
+    #buildBoard
+    #Description: Returns a new board whose Locations refer to the Ants and
+    #   Constructions in the inventories.  If two objects claim the same cell
+    #   the first one in inventory order wins.
+    ##
+    def buildBoard(self):
+        board = [[Location((y, x)) for y in range(BOARD_LENGTH)] for x in range(BOARD_LENGTH)]
+        for inv in self.inventories:
+            for constr in inv.constrs:
+                loc = board[constr.coords[0]][constr.coords[1]]
+                if loc.constr is None:
+                    loc.constr = constr
+            for ant in inv.ants:
+                loc = board[ant.coords[0]][ant.coords[1]]
+                if loc.ant is None:
+                    loc.ant = ant
+        return board
+
+    ##
+    #buildIndex
+    #Description: (Re)builds the coordinate-to-occupant index from the
+    #   inventories.  If two objects claim the same cell the first one in
+    #   inventory order wins.
+    ##
+    def buildIndex(self):
+        antIndex = {}
+        constrIndex = {}
+        for inv in self.inventories:
+            for ant in inv.ants:
+                if ant.coords not in antIndex:
+                    antIndex[ant.coords] = ant
+            for constr in inv.constrs:
+                if constr.coords not in constrIndex:
+                    constrIndex[constr.coords] = constr
+        self.antIndex = antIndex
+        self.constrIndex = constrIndex
+
+    ##
+    #getAntAt
+    #Description: Returns the ant at the given coordinates or None.  The index
+    #   is built on first use in the play phase and is then kept up to date
+    #   by getNextState, applyMove and the game engine.  The setup phases
+    #   place pieces straight into the inventories, so there the inventories
+    #   are searched instead.
+    #
+    #   Agents may also move or remove ants themselves (in their own
+    #   simulators, for example), which the index doesn't see.  So an ant
+    #   found in the index is only returned if it is still there and still
+    #   in its inventory, and when the index has nothing (or something stale)
+    #   the inventories are searched.  If they disagree with the index it is
+    #   rebuilt.
+    ##
+    def getAntAt(self, coords):
+        if self.antIndex is None:
+            if self.phase != PLAY_PHASE:
+                return self._findAt("ants", coords)
+            self.buildIndex()
+        ant = self.antIndex.get(coords)
+        if ant is not None and ant.coords == coords and ant in self.inventories[ant.player].ants:
+            return ant
+        return self._checkIndex(ant, "ants", coords)
+
+    ##
+    #getConstrAt
+    #Description: Returns the construction at the given coordinates or None.
+    #   Checked against the inventories the same way as getAntAt.
+    ##
+    def getConstrAt(self, coords):
+        if self.constrIndex is None:
+            if self.phase != PLAY_PHASE:
+                return self._findAt("constrs", coords)
+            self.buildIndex()
+        constr = self.constrIndex.get(coords)
+        if constr is not None and constr.coords == coords \
+                and constr in self.inventories[getattr(constr, "player", NEUTRAL)].constrs:
+            return constr
+        return self._checkIndex(constr, "constrs", coords)
+
+    ##
+    #_checkIndex
+    #Description: Searches the inventories for what is at the given
+    #   coordinates and rebuilds the index if it held something else
+    #
+    #Parameters:
+    #   indexed - what the index has at the coordinates (or None)
+    #   listName - which inventory lists to search ("ants" or "constrs")
+    #   coords - the coordinates
+    #
+    #Return: the first object at the coordinates in inventory order or None
+    ##
+    def _checkIndex(self, indexed, listName, coords):
+        found = self._findAt(listName, coords)
+        if found is not indexed:
+            self.buildIndex()
+        return found
+
+    ##
+    #_findAt
+    #Description: Returns the first ant or construction (listName is "ants"
+    #   or "constrs") at the given coordinates in inventory order or None
+    ##
+    def _findAt(self, listName, coords):
+        for inv in self.inventories:
+            for obj in getattr(inv, listName):
+                if obj.coords == coords:
+                    return obj
+        return None
+
+    ##
+    #buildTerrainCosts
+    #Description: Computes the terrain cost table (see terrainCosts) from the
+    #   constructions in the inventories.  Cells without a construction cost 1.
+    #
+    #Return: a tuple of BOARD_LENGTH tuples of BOARD_LENGTH ints
+    ##
+    def buildTerrainCosts(self):
+        costs = [[None] * BOARD_LENGTH for x in range(BOARD_LENGTH)]
+        for inv in self.inventories:
+            for constr in inv.constrs:
+                if constr.coords is not None and costs[constr.coords[0]][constr.coords[1]] is None:
+                    costs[constr.coords[0]][constr.coords[1]] = constr.movementCost
+        return tuple(tuple(1 if cost is None else cost for cost in col) for col in costs)
+
+    ##
+    #getZobristKey
+    #Description: Returns a 64-bit hash of the state suitable for a
+    #   transposition table.  The key is computed from scratch the first time
+    #   it is requested.  After that getNextState, getNextStateAdversarial and
+    #   the game engine update it incrementally as moves are made.
+    #
+    #Return: The key (int)
+    ##
+    def getZobristKey(self):
+        if self.zobristKey is None:
+            self.zobristKey = Zobrist.computeKey(self)
+        return self.zobristKey
 
     ##
     #coordLookup
@@ -69,6 +243,7 @@ class GameState(object):
     #
     ##
     def flipBoard(self):
+        self.unshare()
         for col in self.board:
             col.reverse()
             
@@ -79,6 +254,13 @@ class GameState(object):
                 ant.coords = self.coordLookup(ant.coords, PLAYER_TWO)
             for constr in inv.constrs:
                 constr.coords = self.coordLookup(constr.coords, PLAYER_TWO)
+        # every coordinate changed so a known key and index must be recomputed
+        if self.zobristKey is not None:
+            self.zobristKey = Zobrist.computeKey(self)
+        if self.antIndex is not None:
+            self.buildIndex()
+        if self.terrainCosts is not None:
+            self.terrainCosts = tuple(tuple(reversed(col)) for col in reversed(self.terrainCosts))
       
     ##
     #clearConstrs
@@ -89,6 +271,7 @@ class GameState(object):
         for col in self.board:
             for loc in col:
                 loc.constr = None
+        self.zobristKey = None
 
     ##
     # getBlankState
@@ -143,6 +326,119 @@ class GameState(object):
         return state
 
 
+    ##
+    #shareclone
+    #
+    #Description: Returns a copy-on-write copy of itself *without* a board
+    # (one is built from the inventories if it is read).
+    # The copy gets its own inventory lists but shares the Ant and
+    # Construction objects in them with this state, so a search tree built
+    # from shareclones only allocates the records each move actually changes.
+    # After this call both states treat the shared records as read only: use
+    # writableAnt and writableConstr to get a private copy before changing
+    # one.  getNextState and getNextStateAdversarial do this automatically
+    # and return shareclones of states that are already copy-on-write.
+    #
+    # CAVEAT: this state becomes copy-on-write as well (its sharedRecords is
+    # set), not just the copy.  From then on:
+    #   - an Ant or Construction changed directly (ant.health -= 1, say) in
+    #     this state or in any of its shareclones changes in all of them.
+    #     Go through writableAnt/writableConstr, or call unshare() on a state
+    #     before changing it by hand.
+    #   - getNextState and getNextStateAdversarial on this state, its
+    #     shareclones and everything derived from them return shareclones
+    #     rather than independent fastclones, so the same applies to their
+    #     results.
+    # Only the records are shared: the inventory lists, food counts, whose
+    # turn it is, the index and the board are each state's own.
+    #
+    #Return: a GameState object _almost_ identical to the original
+    ##
+    def shareclone(self):
+        return self.shareclones(1)[0]
+
+    ##
+    #shareclones
+    #Description: Returns a list of count shareclones of this state.  The set
+    #   of shared records is only computed once so this is cheaper than
+    #   calling shareclone repeatedly (e.g. when expanding every child of a
+    #   search node).
+    ##
+    def shareclones(self, count):
+        shared = []
+        for inv in self.inventories:
+            shared += inv.ants
+            shared += inv.constrs
+        self.sharedRecords = frozenset(shared)
+
+        result = []
+        for i in range(count):
+            newInventories = [Inventory(inv.player, list(inv.ants), list(inv.constrs), inv.foodCount)
+                              for inv in self.inventories]
+            newState = GameState(None, newInventories, self.phase, self.whoseTurn)
+            newState.zobristKey = self.zobristKey
+            newState.terrainCosts = self.terrainCosts
+            newState.sharedRecords = self.sharedRecords
+            if self.antIndex is not None:
+                newState.antIndex = dict(self.antIndex)
+                newState.constrIndex = dict(self.constrIndex)
+            result.append(newState)
+        return result
+
+    ##
+    #writableAnt
+    #Description: Returns a version of the given ant (which must be in this
+    #   state) that may be modified without affecting any other state.  Shared
+    #   ants are replaced by a private clone in the inventory, board and index.
+    ##
+    def writableAnt(self, ant):
+        if self.sharedRecords is None or ant not in self.sharedRecords:
+            return ant
+        newAnt = ant.clone()
+        self._replaceRecord(self.inventories[ant.player].ants, ant, newAnt, self.antIndex)
+        if self._board is not None:
+            self._board[ant.coords[0]][ant.coords[1]].ant = newAnt
+        return newAnt
+
+    ##
+    #writableConstr
+    #Description: Returns a version of the given construction (which must be in
+    #   this state) that may be modified without affecting any other state
+    ##
+    def writableConstr(self, constr):
+        if self.sharedRecords is None or constr not in self.sharedRecords:
+            return constr
+        newConstr = constr.clone()
+        player = constr.player if type(constr) is Building else NEUTRAL
+        self._replaceRecord(self.inventories[player].constrs, constr, newConstr, self.constrIndex)
+        if self._board is not None:
+            self._board[constr.coords[0]][constr.coords[1]].constr = newConstr
+        return newConstr
+
+    #helper for writableAnt and writableConstr
+    def _replaceRecord(self, records, old, new, index):
+        for i in range(len(records)):
+            if records[i] is old:
+                records[i] = new
+                break
+        if index is not None and index.get(old.coords) is old:
+            index[old.coords] = new
+
+    ##
+    #unshare
+    #Description: Gives this state private copies of all of its shared
+    #   records so they can be modified directly again
+    ##
+    def unshare(self):
+        if self.sharedRecords is None:
+            return
+        for inv in self.inventories:
+            for ant in list(inv.ants):
+                self.writableAnt(ant)
+            for constr in list(inv.constrs):
+                self.writableConstr(constr)
+        self.sharedRecords = None
+
     ##
     #clone
     #Description: Returns a deep copy of itself
@@ -178,15 +474,20 @@ class GameState(object):
         newInventories = [Inventory(PLAYER_ONE, ants1, cons1, food1),
                           Inventory(PLAYER_TWO, ants2, cons2, food2),
                           Inventory(NEUTRAL, [], cons3, 0)]
-        return GameState(newBoard, newInventories, self.phase, self.whoseTurn)
+        newState = GameState(newBoard, newInventories, self.phase, self.whoseTurn)
+        newState.zobristKey = self.zobristKey
+        newState.terrainCosts = self.terrainCosts
+        if self.antIndex is not None:
+            newState.buildIndex()
+        return newState
 
 
     ##
     #fastclone
     #
-    #Description: Returns a deep copy of itself *without* a board (which is set
-    # to None).  Omitting the board makes the clone run much faster and, if
-    # necessary, the board can be reconstructed from the inventories.
+    #Description: Returns a deep copy of itself *without* a board.  Omitting
+    # the board makes the clone run much faster and, if it is ever read, the
+    # board is reconstructed from the inventories (see buildBoard).
     #
     #Return: a GameState object _almost_ identical to the original
     ##
@@ -227,5 +528,10 @@ class GameState(object):
         newInventories = [ Inventory(PLAYER_ONE, ants1, cons1, food1),
                            Inventory(PLAYER_TWO, ants2, cons2, food2),
                            Inventory(NEUTRAL, [], cons3, 0) ]
-        
-        return GameState(newBoard, newInventories, self.phase, self.whoseTurn)
+
+        newState = GameState(newBoard, newInventories, self.phase, self.whoseTurn)
+        newState.zobristKey = self.zobristKey
+        newState.terrainCosts = self.terrainCosts
+        if self.antIndex is not None:
+            newState.buildIndex()
+        return newState
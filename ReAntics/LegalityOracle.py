@@ -0,0 +1,106 @@
+from Constants import *
+from Ant import UNIT_STATS
+import BoardTables
+import AIPlayerUtils
+
+##
+#LegalityOracle
+#Description: A quick legality check for the MOVE_ANT and BUILD moves of the
+#   player whose turn it is, used by Game.isValidMove to accept legal moves
+#   without walking the board.  It answers for one state (the engine makes a
+#   new one after every move it applies).  What each ant can do and where the
+#   player can build are worked out the first time they are needed and then
+#   reused for every move checked against the same state.
+#
+#   The oracle only ever accepts moves the full checks in Game.isValidMove
+#   would accept.  A move it doesn't accept still goes through those checks,
+#   which decide whether it's really illegal and report why.
+#
+#Variables:
+#   state - the GameState being checked against (must have its coordinate
+#       index, which the engine keeps during the play phase)
+##
+class LegalityOracle(object):
+
+    ##
+    #__init__
+    #Description: Creates a new LegalityOracle for the given state
+    ##
+    def __init__(self, state):
+        self.state = state
+        self.costs = AIPlayerUtils.getTerrainCosts(state)
+        #coords -> (movement points, ignores grass, is a queen) for the
+        #current player's unmoved ants, None for any other coords
+        self._antStats = {}
+        #the current player's anthills that are free to build on
+        self._buildCoords = None
+
+    ##
+    #antStats
+    #Description: Returns (movement points, ignores grass, is a queen) for
+    #   the current player's unmoved ant at the given coords, or None if
+    #   there isn't one
+    ##
+    def antStats(self, coords):
+        if coords in self._antStats:
+            return self._antStats[coords]
+        ant = self.state.getAntAt(coords)
+        result = None
+        if ant is not None and ant.player == self.state.whoseTurn and not ant.hasMoved:
+            result = (UNIT_STATS[ant.type][MOVEMENT], UNIT_STATS[ant.type][IGNORES_GRASS], ant.type == QUEEN)
+        self._antStats[coords] = result
+        return result
+
+    ##
+    #buildCoords
+    #Description: Returns the set of the current player's anthills that have
+    #   no ant on them
+    ##
+    def buildCoords(self):
+        if self._buildCoords is None:
+            state = self.state
+            self._buildCoords = set(constr.coords for constr in state.inventories[state.whoseTurn].constrs
+                                    if constr.type == ANTHILL and state.getAntAt(constr.coords) is None)
+        return self._buildCoords
+
+    ##
+    #accepts
+    #Description: Checks a well formed MOVE_ANT or BUILD move (see the type
+    #   checks at the top of Game.isValidMove).  The path of a MOVE_ANT is
+    #   checked one step at a time and the check stops at the first problem.
+    #
+    #Return: True if the move is legal, False if the full checks are needed
+    ##
+    def accepts(self, move):
+        coordList = move.coordList
+        if move.moveType == MOVE_ANT:
+            stats = self.antStats(coordList[0])
+            if stats is None:
+                return False
+            movePoints, ignoresGrass, isQueen = stats
+            if isQueen and (coordList[0][1] == BOARD_LENGTH // 2 - 1 or coordList[0][1] == BOARD_LENGTH // 2):
+                return False
+            antIndex = self.state.antIndex
+            costs = self.costs
+            previousCoord = coordList[0]
+            for i in range(1, len(coordList)):
+                coord = coordList[i]
+                #the next cell must be an empty neighbor of the last one
+                if coord not in BoardTables.ADJACENT[previousCoord] or coord in antIndex:
+                    return False
+                if isQueen and (coord[1] == BOARD_LENGTH // 2 - 1 or coord[1] == BOARD_LENGTH // 2):
+                    return False
+                movePoints -= 1 if ignoresGrass else costs[coord[0]][coord[1]]
+                if movePoints < 0:
+                    return False
+                previousCoord = coord
+            return True
+
+        elif move.moveType == BUILD:
+            if len(coordList) != 1 or coordList[0] not in self.buildCoords():
+                return False
+            if move.buildType not in (WORKER, DRONE, SOLDIER, R_SOLDIER):
+                return False
+            return self.state.inventories[self.state.whoseTurn].foodCount >= UNIT_STATS[move.buildType][COST]
+
+        return False
@@ -0,0 +1,459 @@
+import math
+import random
+import time
+from Constants import *
+from Ant import UNIT_STATS
+from CompactState import CompactState, to_compact, CELL_COORDS
+import AIPlayerUtils
+import BoardTables
+import StateCodec
+from WorkerPool import WorkerPool
+
+#
+# MCTS.py
+#
+# Monte Carlo tree search (UCT) for AIPlayers:
+#
+#       self.mcts = MonteCarloSearch(timeLimit = 0.5)
+#       ...
+#       return self.mcts.search(currentState)
+#
+# The tree is made of the moves of listAllLegalMoves, with one path per
+# destination, and the getNextStateAdversarial rules (applied and undone in place on one private
+# copy of the root, as in Search.py).  Each iteration picks a path down the
+# tree with UCB1, adds one new node and scores it with a random game played
+# to the end by a RolloutSimulator.
+#
+# Random play through getNextState and listAllLegalMoves (which finds every
+# path of every ant) is far too slow for thousands of games per move, so the
+# RolloutSimulator plays whole turns at a time on a CompactState instead:
+# every ant takes a short random walk, a random ant is sometimes built and
+# the turn ENDs, all of it applied directly to the state's arrays with the
+# game engine's rules.  getWinner is checked before every turn.  A rollout
+# that goes on for more than turnCap turns is stopped and scored by the
+# evaluation function (if there is one) or as a draw.
+#
+# With processes > 1 the search is root parallel: each worker process of a
+# WorkerPool grows a tree of its own from the root (shipped to it with
+# StateCodec) and the visits of the root's moves are added up.  The workers
+# are started by the first search and kept until close(), which a player
+# should call from registerWin.
+#
+
+DEFAULT_TIME_LIMIT = 1.0
+DEFAULT_TURN_CAP = 60
+#the exploration constant of UCB1
+DEFAULT_EXPLORATION = math.sqrt(2)
+
+#rollouts don't build once a player has this many ants (as AI/Random.py)
+_MAX_ROLLOUT_ANTS = 3
+#the chance that a rollout builds when it can
+_BUILD_CHANCE = 0.5
+#the chance that a walking ant takes another step
+_STEP_CHANCE = 0.75
+#how much sooner than the time limit the workers of a parallel search stop,
+#to leave time to send the results back and add them up
+_MERGE_MARGIN = 0.05
+
+_BUILD_TYPES = (WORKER, DRONE, SOLDIER, R_SOLDIER)
+
+
+##
+#MCTSStats
+#Description: What a search did
+#
+#Variables:
+#   rollouts - the number of random games played
+#   rolloutTurns - the number of turns those games took
+#   treeSize - the number of nodes in the tree (all the workers' trees)
+#   elapsed - the time the search took in seconds
+#   droppedTrees - the number of workers whose trees were left out because
+#       they didn't answer by the time limit
+##
+class MCTSStats(object):
+
+    def __init__(self):
+        self.rollouts = 0
+        self.rolloutTurns = 0
+        self.treeSize = 0
+        self.elapsed = 0.0
+        self.droppedTrees = 0
+
+    ##
+    #rolloutsPerSecond
+    #Description: How fast the search went
+    ##
+    def rolloutsPerSecond(self):
+        if self.elapsed <= 0:
+            return 0.0
+        return self.rollouts / self.elapsed
+
+    def __str__(self):
+        turns = self.rolloutTurns / float(self.rollouts) if self.rollouts else 0.0
+        return "%d rollouts in %.3fs (%.0f rollouts/s), %.1f turns per rollout, %d nodes" % (
+            self.rollouts, self.elapsed, self.rolloutsPerSecond(), turns, self.treeSize)
+
+
+##
+#RolloutSimulator
+#Description: Plays random games quickly (see the top of this file)
+#
+#Variables:
+#   turnCap - the most turns a rollout plays
+#   evaluate - scores a rollout that reaches the turn cap, or None to call
+#       it a draw.  evaluate(state, playerId) gets the CompactState and
+#       returns the chance (0 to 1) that the given player wins.
+#   rng - the random.Random the moves are drawn from
+#   turns - the number of turns played by all rollouts so far
+##
+class RolloutSimulator(object):
+
+    ##
+    #__init__
+    #Description: Creates a new RolloutSimulator
+    ##
+    def __init__(self, turnCap = DEFAULT_TURN_CAP, evaluate = None, rng = None):
+        self.turnCap = turnCap
+        self.evaluate = evaluate
+        self.rng = rng if rng is not None else random.Random()
+        self.turns = 0
+        #the last terrain cost table used and its flat (by cell) version
+        self._costs = (None, None)
+
+    ##
+    #rollout
+    #Description: Plays a random game from the given state
+    #
+    #Parameters:
+    #   state - where to start (GameState, StateView or CompactState).  It
+    #       is not modified.
+    #
+    #Return: the chance that each player won, as a two item list indexed by
+    #   player id (1 and 0 for a win, 0.5 each for a draw)
+    ##
+    def rollout(self, state):
+        costs = AIPlayerUtils.getTerrainCosts(state)
+        if self._costs[0] is not costs:
+            self._costs = (costs, [cost for col in costs for cost in col])
+        if isinstance(state, CompactState):
+            sim = state.clone()
+        else:
+            sim = to_compact(state)
+
+        #only a turn that kills, builds, captures or brings back food can end
+        #the game, so getWinner is only asked after those
+        changed = True
+        for turn in range(self.turnCap):
+            winner = AIPlayerUtils.getWinner(sim) if changed else None
+            if winner is not None:
+                self.turns += turn
+                #getWinner answers for the player whose turn it is
+                if winner == 1:
+                    return [1.0, 0.0] if sim.whoseTurn == PLAYER_ONE else [0.0, 1.0]
+                return [0.0, 1.0] if sim.whoseTurn == PLAYER_ONE else [1.0, 0.0]
+            changed = self._playTurn(sim)
+
+        self.turns += self.turnCap
+        if self.evaluate is None:
+            return [0.5, 0.5]
+        value = self.evaluate(sim, PLAYER_ONE)
+        return [value, 1.0 - value]
+
+    ##
+    #_playTurn
+    #Description: Plays the rest of the current player's turn with the game
+    #   engine's rules: every ant that hasn't moved walks and attacks the
+    #   first enemy in range, maybe an ant is built, and the turn ENDs (food
+    #   is picked up and dropped off and buildings are captured).  The state
+    #   is changed directly, without Move objects, and its Zobrist key is not
+    #   kept up to date.
+    #
+    #Return: whether anything happened that could end the game
+    ##
+    def _playTurn(self, sim):
+        rng = self.rng
+        me = sim.whoseTurn
+        owner = sim.antOwner
+        moved = sim.antMoved
+        cellAnt = sim.cellAnt
+        changed = False
+        cells = [sim.antCell[i] for i in range(len(owner)) if owner[i] == me and not moved[i]]
+        rng.shuffle(cells)
+        for cell in cells:
+            #ants are found by cell because a kill renumbers them
+            index = cellAnt[cell]
+            antType = sim.antType[index]
+            newCell = self._randomWalk(sim, cell, antType)
+            if newCell != cell:
+                sim.moveAnt(index, newCell)
+            moved[index] = 1
+            attack = UNIT_STATS[antType][ATTACK]
+            if attack > 0:
+                for targetCell in BoardTables.attackableCellTable(UNIT_STATS[antType][RANGE])[newCell]:
+                    target = cellAnt[targetCell]
+                    if target >= 0 and owner[target] != me:
+                        sim.antHealth[target] -= attack
+                        if sim.antHealth[target] <= 0:
+                            sim.removeAnt(target)
+                            changed = True
+                        break
+
+        food = sim.food[me]
+        if food > 0 and rng.random() < _BUILD_CHANCE and owner.count(me) < _MAX_ROLLOUT_ANTS:
+            hillCell = sim.constrCell[sim.findConstr(me, ANTHILL)]
+            buildType = rng.choice(_BUILD_TYPES)
+            if cellAnt[hillCell] < 0 and UNIT_STATS[buildType][COST] <= food:
+                sim.addAnt(hillCell, buildType, me, hasMoved = True)
+                sim.food[me] -= UNIT_STATS[buildType][COST]
+                changed = True
+
+        cellConstr = sim.cellConstr
+        for i in range(len(owner)):
+            if owner[i] != me:
+                continue
+            constr = cellConstr[sim.antCell[i]]
+            if constr >= 0:
+                constrType = sim.constrType[constr]
+                if constrType == ANTHILL or constrType == TUNNEL:
+                    if sim.constrOwner[constr] != me:
+                        sim.constrHealth[constr] -= 1
+                        changed = True
+                    elif sim.antCarrying[i]:
+                        sim.food[me] += 1
+                        sim.antCarrying[i] = 0
+                        changed = True
+                elif constrType == FOOD and sim.antType[i] == WORKER:
+                    sim.antCarrying[i] = 1
+            moved[i] = 0
+        sim.whoseTurn = 1 - me
+        sim.zobristKey = None
+        return changed
+
+    ##
+    #_randomWalk
+    #Description: Walks an ant from the given cell one random step at a time
+    #   through empty cells until it stops at random or runs out of movement
+    #
+    #Return: the cell the ant ends on
+    ##
+    def _randomWalk(self, sim, cell, antType):
+        rng = self.rng
+        cellAnt = sim.cellAnt
+        flatCosts = self._costs[1]
+        points = UNIT_STATS[antType][MOVEMENT]
+        ignoresGrass = UNIT_STATS[antType][IGNORES_GRASS]
+        isQueen = antType == QUEEN
+        current = cell
+        while points > 0 and rng.random() < _STEP_CHANCE:
+            options = []
+            for newCell in BoardTables.ADJACENT_CELLS[current]:
+                cost = 1 if ignoresGrass else flatCosts[newCell]
+                if cost > points or cellAnt[newCell] >= 0:
+                    continue
+                #the queen stays out of the middle rows
+                if isQueen and (newCell % BOARD_LENGTH == BOARD_LENGTH // 2 - 1 or newCell % BOARD_LENGTH == BOARD_LENGTH // 2):
+                    continue
+                options.append((newCell, cost))
+            if len(options) == 0:
+                break
+            current, cost = options[rng.randrange(len(options))]
+            points -= cost
+        return current
+
+
+##
+#helper class for the nodes of the search tree
+class _Node(object):
+    __slots__ = ('move', 'parent', 'player', 'children', 'untried', 'visits', 'wins')
+
+    def __init__(self, move, parent, player):
+        self.move = move
+        self.parent = parent
+        #the player who made the move, whose wins the node counts
+        self.player = player
+        self.children = []
+        #the moves without a child yet (None until the node is expanded)
+        self.untried = None
+        self.visits = 0
+        self.wins = 0.0
+
+
+##
+#MonteCarloSearch
+#Description: UCT search with fast random rollouts (see the top of this file)
+#
+#Variables:
+#   timeLimit - the most time a search may take, in seconds
+#   exploration - the exploration constant of UCB1
+#   turnCap - the most turns a rollout plays
+#   evaluate - scores the rollouts that reach the turn cap (see
+#       RolloutSimulator).  With processes > 1 it has to be picklable (a
+#       function defined at the top level of a module).
+#   processes - the number of worker processes (1 searches in this process)
+#   stats - the MCTSStats of the last search
+##
+class MonteCarloSearch(object):
+
+    ##
+    #__init__
+    #Description: Creates a new MonteCarloSearch
+    #
+    #Parameters:
+    #   timeLimit, exploration, turnCap, evaluate, processes - see above
+    #   seed - seed for the rollouts' random numbers (None for a random one)
+    ##
+    def __init__(self, timeLimit = DEFAULT_TIME_LIMIT, exploration = DEFAULT_EXPLORATION,
+                 turnCap = DEFAULT_TURN_CAP, evaluate = None, processes = 1, seed = None):
+        self.timeLimit = timeLimit
+        self.exploration = exploration
+        self.turnCap = turnCap
+        self.evaluate = evaluate
+        self.processes = processes
+        self.stats = MCTSStats()
+        self._rng = random.Random(seed)
+        self._pool = WorkerPool(processes)
+
+    ##
+    #search
+    #Description: Finds the best move for the player whose turn it is
+    #
+    #Parameters:
+    #   currentState - the state to search from (GameState, StateView or
+    #       CompactState).  It is not modified.
+    #   timeLimit - seconds allowed for this search (defaults to
+    #       self.timeLimit)
+    #
+    #Return: the move that was visited the most.  If the root wasn't expanded
+    #   (the game is already over there) the first legal move is returned.
+    ##
+    def search(self, currentState, timeLimit = None):
+        if timeLimit is None:
+            timeLimit = self.timeLimit
+        start = time.perf_counter()
+        if self.processes > 1:
+            bestMove, self.stats = self._searchParallel(currentState, timeLimit)
+        else:
+            root, self.stats = _grow(currentState.fastclone(), start + timeLimit, self.exploration,
+                                     RolloutSimulator(self.turnCap, self.evaluate, self._rng))
+            bestMove = None
+            if len(root.children) > 0:
+                bestMove = max(root.children, key = lambda child: child.visits).move
+        if bestMove is None:
+            bestMove = AIPlayerUtils.listAllLegalMoves(currentState, False)[0]
+        self.stats.elapsed = time.perf_counter() - start
+        return bestMove
+
+    ##
+    #_searchParallel
+    #Description: Grows a tree in each worker process and adds up the visits
+    #   of the root's moves
+    #
+    #Return: (the move visited the most or None if no worker expanded the
+    #   root, the MCTSStats)
+    ##
+    def _searchParallel(self, currentState, timeLimit):
+        #the workers are given a wall clock deadline because they can't
+        #share the performance counter
+        deadline = time.time() + timeLimit
+        encoded = StateCodec.encode(currentState.fastclone())
+        jobs = [(encoded, deadline - _MERGE_MARGIN, self.exploration, self.turnCap, self.evaluate,
+                 self._rng.getrandbits(32))
+                for i in range(self.processes)]
+
+        stats = MCTSStats()
+        #the total visits of each of the root's moves, by encoding
+        visits = {}
+        for answer in self._pool.run(_searchWorker, jobs, deadline):
+            if answer is None:
+                stats.droppedTrees += 1
+                continue
+            children, workerStats = answer
+            for encodedMove, childVisits in children:
+                visits[encodedMove] = visits.get(encodedMove, 0) + childVisits
+            stats.rollouts += workerStats.rollouts
+            stats.rolloutTurns += workerStats.rolloutTurns
+            stats.treeSize += workerStats.treeSize
+        if len(visits) == 0:
+            return None, stats
+        return StateCodec.decode(max(visits, key = visits.get)), stats
+
+    ##
+    #close
+    #Description: Stops the worker processes (if any were started).  The
+    #   next parallel search starts them again.
+    ##
+    def close(self):
+        self._pool.close()
+
+
+##
+# _grow
+#
+# Description: Grows a UCT tree from a state until the deadline
+#
+# Parameters:
+#   state - a private copy of the root state, which is changed and restored
+#   deadline - when to stop (a time.perf_counter() time)
+#   exploration - the exploration constant of UCB1
+#   simulator - the RolloutSimulator to score new nodes with
+#
+# Return: (the root node, the MCTSStats)
+##
+def _grow(state, deadline, exploration, simulator):
+    stats = MCTSStats()
+    root = _Node(None, None, 1 - state.whoseTurn)
+    stats.treeSize = 1
+    tokens = []
+    #at least one iteration so there is a move to play
+    while stats.rollouts == 0 or time.perf_counter() < deadline:
+        node = root
+        #select: follow UCB1 down through the fully expanded nodes
+        while node.untried is not None and len(node.untried) == 0 and len(node.children) > 0:
+            logVisits = math.log(node.visits)
+            bestScore = -1.0
+            for child in node.children:
+                score = child.wins / child.visits + exploration * math.sqrt(logVisits / child.visits)
+                if score > bestScore:
+                    bestScore = score
+                    node = child
+            tokens.append(AIPlayerUtils.applyMove(state, node.move))
+
+        #expand: add one of the node's moves, unless the game is over there
+        winner = AIPlayerUtils.getWinner(state)
+        if winner is None:
+            if node.untried is None:
+                node.untried = AIPlayerUtils.listAllLegalMoves(state, False)
+                simulator.rng.shuffle(node.untried)
+            if len(node.untried) > 0:
+                child = _Node(node.untried.pop(), node, state.whoseTurn)
+                node.children.append(child)
+                stats.treeSize += 1
+                tokens.append(AIPlayerUtils.applyMove(state, child.move))
+                node = child
+
+        #simulate
+        turns = simulator.turns
+        result = simulator.rollout(state)
+        stats.rollouts += 1
+        stats.rolloutTurns += simulator.turns - turns
+
+        #backpropagate
+        while node is not None:
+            node.visits += 1
+            node.wins += result[node.player]
+            node = node.parent
+        while len(tokens) > 0:
+            AIPlayerUtils.undoMove(state, tokens.pop())
+    return root, stats
+
+##
+# helper for MonteCarloSearch._searchParallel that runs in the worker
+# processes, until the (time.time()) deadline.  Returns the encoded moves of
+# the root's children with their visits, and the worker's MCTSStats.
+def _searchWorker(job):
+    encoded, wallDeadline, exploration, turnCap, evaluate, seed = job
+    deadline = time.perf_counter() + (wallDeadline - time.time())
+    state = StateCodec.decode(encoded)
+    root, stats = _grow(state, deadline, exploration,
+                        RolloutSimulator(turnCap, evaluate, random.Random(seed)))
+    return [(StateCodec.encode(child.move), child.visits) for child in root.children], stats
@@ -0,0 +1,229 @@
+import time
+import multiprocessing
+from Constants import *
+import AIPlayerUtils
+import StateCodec
+from Search import AlphaBetaSearch, SearchStats, WIN_SCORE, DEFAULT_TIME_LIMIT, DEFAULT_MAX_DEPTH
+from TranspositionTable import TranspositionTable, DEFAULT_SIZE_MB
+from WorkerPool import WorkerPool
+
+#
+# ParallelSearch.py
+#
+# Root-parallel alpha-beta search, so a search-based AIPlayer can use every
+# core instead of thinking on one core inside the game thread:
+#
+#       def __init__(self, inputPlayerId):
+#           super(AIPlayer, self).__init__(inputPlayerId, "Parallel")
+#           self.search = ParallelSearch(evaluate, timeLimit = 0.5)
+#
+#       def getMove(self, currentState):
+#           return self.search.search(currentState)
+#
+#       def registerWin(self, hasWon):
+#           self.search.close()
+#
+# The worker processes are started by the first search and kept until
+# close() (see WorkerPool.py).  Each worker makes its AlphaBetaSearch, with
+# its own copy of the evaluation function and its own transposition table,
+# once when it starts, so whatever the evaluator and the table have learned
+# carries over from one move to the next.
+#
+# For every search the root's moves are dealt out among the workers, and the
+# state and moves are sent to them encoded with StateCodec.  Each worker
+# searches its share of the moves by iterative deepening until a little
+# before the time limit and sends back the best move and score of every
+# iteration it finished.  The scores of different workers are compared at
+# the deepest iteration all of them finished.  Workers that haven't answered
+# by the time limit are left out (stats.droppedShares counts them).  If
+# none of them answered, the move played is the best one ply deep, searched
+# for here after the time limit (one evaluation per move).
+#
+# The evaluation function (see Search.AlphaBetaSearch) is sent to the
+# workers, so it has to be picklable: a function defined at the top level of
+# a module or an instance of a class defined at the top level of a module.
+#
+
+#how much sooner than the time limit the workers stop, to leave time to send
+#the results back and merge them
+_MERGE_MARGIN = 0.05
+
+
+##
+#ParallelSearchStats
+#Description: The SearchStats of a ParallelSearch, added up over the workers
+#   (depth is the depth the workers' results were compared at)
+#
+#Variables:
+#   droppedShares - the number of workers whose share of the root's moves
+#       was left out because they didn't answer by the time limit
+##
+class ParallelSearchStats(SearchStats):
+
+    def __init__(self):
+        super(ParallelSearchStats, self).__init__()
+        self.droppedShares = 0
+
+    def __str__(self):
+        return "%s, %d shares dropped" % (super(ParallelSearchStats, self).__str__(), self.droppedShares)
+
+
+##
+#ParallelSearch
+#Description: Root-parallel iterative-deepening alpha-beta search across a
+#   persistent pool of worker processes (see the top of this file)
+#
+#Variables:
+#   processes - the number of worker processes
+#   timeLimit - the most time a search may take, in seconds
+#   stats - the ParallelSearchStats of the last search
+##
+class ParallelSearch(object):
+
+    ##
+    #__init__
+    #Description: Creates a new ParallelSearch.  Its workers are started by
+    #   the first search.
+    #
+    #Parameters:
+    #   evaluate - the evaluation function, evaluate(state, playerId) (see
+    #       Search.AlphaBetaSearch)
+    #   processes - the number of worker processes (defaults to the number
+    #       of cores)
+    #   timeLimit - seconds allowed per search
+    #   maxDepth - the deepest iteration to search
+    #   tableSizeMB - the size of each worker's transposition table (0 for
+    #       none)
+    #   canonicalOrder - whether the workers search the canonical move
+    #       orders only (see AIPlayerUtils.canonicalMoves)
+    ##
+    def __init__(self, evaluate, processes = None, timeLimit = DEFAULT_TIME_LIMIT, maxDepth = DEFAULT_MAX_DEPTH,
+                 tableSizeMB = DEFAULT_SIZE_MB, canonicalOrder = False):
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        self.processes = processes
+        self.timeLimit = timeLimit
+        self.stats = ParallelSearchStats()
+        self._maxDepth = maxDepth
+        self._pool = WorkerPool(processes, _initWorker, (evaluate, maxDepth, tableSizeMB, canonicalOrder))
+        #searches one ply deep if no worker answers in time
+        self._fallback = AlphaBetaSearch(evaluate, maxDepth = 1)
+
+    ##
+    #search
+    #Description: Finds the best move for the player whose turn it is
+    #
+    #Parameters:
+    #   currentState - the state to search from (GameState, StateView or
+    #       CompactState).  It is not modified.
+    #   timeLimit - seconds allowed for this search (defaults to
+    #       self.timeLimit)
+    #
+    #Return: the best Move found
+    ##
+    def search(self, currentState, timeLimit = None):
+        if timeLimit is None:
+            timeLimit = self.timeLimit
+        start = time.perf_counter()
+        #the workers are given a wall clock deadline because they can't
+        #share the performance counter
+        deadline = time.time() + timeLimit
+        self.stats = ParallelSearchStats()
+
+        state = currentState.fastclone()
+        moves = AIPlayerUtils.listAllLegalMoves(state, False)
+        if len(moves) == 1:
+            return moves[0]
+
+        encodedState = StateCodec.encode(state)
+        shares = [list(range(i, len(moves), self.processes)) for i in range(min(self.processes, len(moves)))]
+        answers = self._pool.run(_searchShare,
+                                 [(encodedState, [StateCodec.encode(moves[i]) for i in share], deadline - _MERGE_MARGIN)
+                                  for share in shares],
+                                 deadline)
+
+        #the iterations each worker finished, with the moves numbered as in
+        #moves
+        results = []
+        for share, answer in zip(shares, answers):
+            if answer is None:
+                self.stats.droppedShares += 1
+                continue
+            iterations, workerStats = answer
+            results.append([(depth, share[index], score) for depth, index, score in iterations])
+            self.stats.nodes += workerStats.nodes
+            self.stats.expanded += workerStats.expanded
+            self.stats.movesGenerated += workerStats.movesGenerated
+            self.stats.tableCutoffs += workerStats.tableCutoffs
+
+        results = [iterations for iterations in results if len(iterations) > 0]
+        if len(results) > 0:
+            depth = self._commonDepth(results)
+            bestScore = -float("inf")
+            for iterations in results:
+                iteration = iterations[min(depth, len(iterations)) - 1]
+                if iteration[2] > bestScore:
+                    bestScore = iteration[2]
+                    bestMove = moves[iteration[1]]
+            self.stats.depth = depth
+            self.stats.score = bestScore
+        else:
+            #no worker finished an iteration in time
+            bestMove = self._fallback.search(state, float("inf"), moves)
+            fallbackStats = self._fallback.stats
+            self.stats.nodes += fallbackStats.nodes
+            self.stats.expanded += fallbackStats.expanded
+            self.stats.movesGenerated += fallbackStats.movesGenerated
+            self.stats.depth = fallbackStats.depth
+            self.stats.score = fallbackStats.score
+        self.stats.elapsed = time.perf_counter() - start
+        return bestMove
+
+    ##
+    #_commonDepth
+    #Description: The deepest iteration every worker finished.  A worker
+    #   whose last iteration found a forced win or loss stopped there because
+    #   searching deeper can't change it, so it doesn't hold the others back.
+    ##
+    def _commonDepth(self, results):
+        depth = None
+        for iterations in results:
+            if abs(iterations[-1][2]) < WIN_SCORE - self._maxDepth:
+                if depth is None or len(iterations) < depth:
+                    depth = len(iterations)
+        if depth is None:
+            depth = max(len(iterations) for iterations in results)
+        return depth
+
+    ##
+    #close
+    #Description: Stops the worker processes.  The next search starts them
+    #   again.
+    ##
+    def close(self):
+        self._pool.close()
+
+
+#the AlphaBetaSearch of a worker process (see _initWorker)
+_workerSearch = None
+
+##
+# helper run once in each worker process when it starts: makes the
+# AlphaBetaSearch it will use for every search
+def _initWorker(evaluate, maxDepth, tableSizeMB, canonicalOrder):
+    global _workerSearch
+    table = TranspositionTable(tableSizeMB) if tableSizeMB > 0 else None
+    _workerSearch = AlphaBetaSearch(evaluate, maxDepth = maxDepth, table = table, canonicalOrder = canonicalOrder)
+
+##
+# helper that runs in a worker process: searches some of the root's moves
+# until the (time.time()) deadline.  Returns (depth, index of the best move
+# in the share, score) for each finished iteration and the SearchStats.
+def _searchShare(job):
+    encodedState, encodedMoves, deadline = job
+    state = StateCodec.decode(encodedState)
+    moves = [StateCodec.decode(encodedMove) for encodedMove in encodedMoves]
+    _workerSearch.search(state, max(0.0, deadline - time.time()), moves)
+    stats = _workerSearch.stats
+    iterations = [(depth, moves.index(move), score) for depth, move, score in stats.iterations]
+    return iterations, stats
@@ -6,9 +6,14 @@
 #
 #Variables:
 #   playerId - The id of the player.
+#   acceptsStateView - If True the game gives the player a read-only view of
+#       the game state (see StateView.py) instead of a copy of it.  Set it in
+#       players that don't change the state they are given.
 ##
 class Player(object):
 
+    acceptsStateView = False
+
     ##
     #__init__
     #Description: Creates a new Player
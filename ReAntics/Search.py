@@ -0,0 +1,363 @@
+import time
+from Constants import *
+import AIPlayerUtils
+import TranspositionTable as TT
+
+#
+# Search.py
+#
+# A game tree search that any AIPlayer can use to pick its moves by
+# supplying only an evaluation function:
+#
+#       def __init__(self, inputPlayerId):
+#           super(AIPlayer, self).__init__(inputPlayerId, "Searcher")
+#           self.search = AlphaBetaSearch(self.evaluate, timeLimit = 0.5)
+#
+#       def getMove(self, currentState):
+#           return self.search.search(currentState)
+#
+# The search is an iterative-deepening alpha-beta over the moves of
+# listAllLegalMoves (with one path per destination) and the
+# getNextStateAdversarial rules (it uses applyMove and undoMove, which follow
+# the same rules, on one private copy of the state instead of making a new
+# state per node).  Every move is a
+# ply, so a player's turn is several plies deep and END hands the move to
+# the other player; the search maximizes for the player it is searching for
+# and minimizes for their opponent.
+#
+# With a TranspositionTable (see TranspositionTable.py) positions reached
+# again by another order of the same moves are looked up instead of being
+# searched again, and the best move stored for a position is tried first.
+#
+# With canonicalOrder the orders of a turn's ant moves that only repeat
+# another order are skipped (see AIPlayerUtils.canonicalMoves).
+#
+# Each iteration searches one ply deeper than the last until the time limit
+# or the maximum depth is reached.  The time limit is hard: an iteration
+# that runs out of time is abandoned, and the move of the deepest iteration
+# that finished is played (or the move an unfinished iteration preferred,
+# if it had already found a better one than that).
+#
+
+#the value of a won position.  Wins found sooner score higher (and losses
+#found later score higher) so the search takes the fastest win.
+WIN_SCORE = 1000000.0
+
+DEFAULT_TIME_LIMIT = 1.0
+DEFAULT_MAX_DEPTH = 64
+
+#how many nodes are visited between checks of the clock
+_CLOCK_INTERVAL = 64
+
+
+##
+#SearchStats
+#Description: What a search did, for tuning agents and comparing heuristics
+#
+#Variables:
+#   nodes - the number of positions visited
+#   expanded - the number of positions whose moves were generated
+#   movesGenerated - the number of moves those positions had
+#   depth - the depth of the deepest iteration that finished
+#   elapsed - the time the search took in seconds
+#   score - the value of the chosen move to the player searching (None if
+#       there was nothing to search: one legal move or no time)
+#   tableCutoffs - the number of positions settled by the transposition
+#       table instead of being searched
+#   iterations - (depth, best move, score) for each iteration that finished
+##
+class SearchStats(object):
+
+    def __init__(self):
+        self.nodes = 0
+        self.expanded = 0
+        self.movesGenerated = 0
+        self.depth = 0
+        self.elapsed = 0.0
+        self.score = None
+        self.tableCutoffs = 0
+        self.iterations = []
+
+    ##
+    #nodesPerSecond
+    #Description: How fast the search went
+    ##
+    def nodesPerSecond(self):
+        if self.elapsed <= 0:
+            return 0.0
+        return self.nodes / self.elapsed
+
+    ##
+    #branchingFactor
+    #Description: The average number of legal moves of the positions that
+    #   were expanded
+    ##
+    def branchingFactor(self):
+        if self.expanded == 0:
+            return 0.0
+        return self.movesGenerated / float(self.expanded)
+
+    def __str__(self):
+        return "depth %d, %d nodes in %.3fs (%.0f nodes/s), branching factor %.1f" % (
+            self.depth, self.nodes, self.elapsed, self.nodesPerSecond(), self.branchingFactor())
+
+
+##
+#helper exception that unwinds the search when the time limit is reached
+class _OutOfTime(Exception):
+    pass
+
+
+##
+#AlphaBetaSearch
+#Description: Iterative-deepening alpha-beta search with a pluggable
+#   evaluation function and a time limit (see the top of this file)
+#
+#Variables:
+#   evaluate - the evaluation function, evaluate(state, playerId).  It
+#       returns how good a position is for the given player as a number,
+#       higher being better, and must neither change nor keep the state.
+#       Positions that are won or lost (see AIPlayerUtils.getWinner) are
+#       scored by the search itself.
+#   timeLimit - the most time a search may take, in seconds
+#   maxDepth - the deepest iteration to search
+#   table - the TranspositionTable the search remembers positions in, or
+#       None.  Keeping it from one search to the next lets each search start
+#       from what the last one found.
+#   canonicalOrder - whether to skip the orders of a turn's ant moves that
+#       only repeat another order (see AIPlayerUtils.canonicalMoves).  The
+#       value of the search is the same either way.
+#   stats - the SearchStats of the last search
+##
+class AlphaBetaSearch(object):
+
+    ##
+    #__init__
+    #Description: Creates a new AlphaBetaSearch
+    #
+    #Parameters:
+    #   evaluate - the evaluation function (see above)
+    #   timeLimit - seconds allowed per search
+    #   maxDepth - the deepest iteration to search
+    #   table - a TranspositionTable, or None to search without one
+    #   canonicalOrder - whether to search the canonical move orders only
+    ##
+    def __init__(self, evaluate, timeLimit = DEFAULT_TIME_LIMIT, maxDepth = DEFAULT_MAX_DEPTH, table = None,
+                 canonicalOrder = False):
+        self.evaluate = evaluate
+        self.timeLimit = timeLimit
+        self.maxDepth = maxDepth
+        self.table = table
+        self.canonicalOrder = canonicalOrder
+        self.stats = SearchStats()
+        #the player being searched for and when the current search must stop
+        self._me = None
+        self._deadline = None
+
+    ##
+    #search
+    #Description: Finds the best move for the player whose turn it is
+    #
+    #Parameters:
+    #   currentState - the state to search from (GameState, StateView or
+    #       CompactState).  It is not modified.
+    #   timeLimit - seconds allowed for this search (defaults to
+    #       self.timeLimit)
+    #   rootMoves - the moves to choose between (defaults to all the legal
+    #       moves).  These are searched even if there is only one.
+    #
+    #Return: the best Move found.  Raises ValueError if rootMoves is empty.
+    ##
+    def search(self, currentState, timeLimit = None, rootMoves = None):
+        if timeLimit is None:
+            timeLimit = self.timeLimit
+        start = time.perf_counter()
+        self._deadline = start + timeLimit
+        self._me = currentState.whoseTurn
+        self.stats = SearchStats()
+        if self.table is not None:
+            self.table.newSearch()
+
+        state = currentState.fastclone()
+        if rootMoves is None:
+            moves = AIPlayerUtils.listAllLegalMoves(state, False)
+        else:
+            moves = list(rootMoves)
+            if len(moves) == 0:
+                raise ValueError("no moves to search: rootMoves is empty")
+        bestMove = moves[0]
+        if len(moves) > 1 or rootMoves is not None:
+            try:
+                for depth in range(1, self.maxDepth + 1):
+                    #the best move so far is searched first, so anything this
+                    #iteration prefers to it is better even if the iteration
+                    #doesn't finish
+                    moves.remove(bestMove)
+                    moves.insert(0, bestMove)
+                    bestMove = self._searchRoot(state, moves, depth)
+                    self.stats.depth = depth
+                    self.stats.iterations.append((depth, bestMove, self.stats.score))
+                    if abs(self.stats.score) >= WIN_SCORE - self.maxDepth:
+                        break
+            except _OutOfTime as partial:
+                if partial.args:
+                    bestMove = partial.args[0]
+
+        self.stats.elapsed = time.perf_counter() - start
+        return bestMove
+
+    ##
+    #_searchRoot
+    #Description: Searches each of the root's moves to the given depth
+    #
+    #Return: the best move.  If time runs out the _OutOfTime raised carries
+    #   the best move found so far, if it beat the first one.
+    ##
+    def _searchRoot(self, state, moves, depth):
+        self.stats.nodes += 1
+        self.stats.expanded += 1
+        self.stats.movesGenerated += len(moves)
+        bestMove = None
+        bestValue = -float("inf")
+        for move in moves:
+            constraint = None
+            if self.canonicalOrder:
+                constraint = AIPlayerUtils.moveOrderConstraint(state, move)
+            token = AIPlayerUtils.applyMove(state, move)
+            try:
+                value = self._alphaBeta(state, depth - 1, 1, bestValue, float("inf"), constraint)
+            except _OutOfTime:
+                if bestMove is not None and bestMove is not moves[0]:
+                    raise _OutOfTime(bestMove)
+                raise
+            AIPlayerUtils.undoMove(state, token)
+            if value > bestValue:
+                bestValue = value
+                bestMove = move
+        self.stats.score = bestValue
+        return bestMove
+
+    ##
+    #_alphaBeta
+    #Description: The value of a state to the player being searched for
+    #
+    #Parameters:
+    #   state - the state (which is restored before returning)
+    #   depth - the number of plies left to search
+    #   ply - how many plies the state is from the root
+    #   alpha, beta - the window of values that still matter
+    #   constraint - the moveOrderConstraint of the move that led to the
+    #       state, if the search is in canonical order
+    ##
+    def _alphaBeta(self, state, depth, ply, alpha, beta, constraint = None):
+        stats = self.stats
+        stats.nodes += 1
+        if stats.nodes % _CLOCK_INTERVAL == 0 and time.perf_counter() >= self._deadline:
+            raise _OutOfTime()
+
+        winner = AIPlayerUtils.getWinner(state)
+        if winner is not None:
+            #getWinner answers for the player whose turn it is
+            if (winner == 1) == (state.whoseTurn == self._me):
+                return WIN_SCORE - ply
+            return ply - WIN_SCORE
+        if depth == 0:
+            return self.evaluate(state, self._me)
+
+        table = self.table
+        tableMove = None
+        if table is not None:
+            key = state.getZobristKey()
+            if constraint is not None:
+                #the moves searched from the state depend on the constraint
+                key ^= hash(constraint) & _KEY_MASK
+            entry = table.probe(key)
+            if entry is not None:
+                tableMove = entry[TT.MOVE]
+                if entry[TT.DEPTH] >= depth:
+                    value = _fromTable(entry[TT.VALUE], ply)
+                    if TT.cutsOff(entry[TT.BOUND], value, alpha, beta):
+                        stats.tableCutoffs += 1
+                        return value
+
+        moves = AIPlayerUtils.listAllLegalMoves(state, False)
+        if self.canonicalOrder:
+            moves = AIPlayerUtils.canonicalMoves(state, moves, constraint)
+        stats.expanded += 1
+        stats.movesGenerated += len(moves)
+        if tableMove is not None:
+            _moveToFront(moves, tableMove)
+
+        originalAlpha = alpha
+        originalBeta = beta
+        bestMove = None
+        if state.whoseTurn == self._me:
+            for move in moves:
+                childConstraint = None
+                if self.canonicalOrder:
+                    childConstraint = AIPlayerUtils.moveOrderConstraint(state, move)
+                token = AIPlayerUtils.applyMove(state, move)
+                value = self._alphaBeta(state, depth - 1, ply + 1, alpha, beta, childConstraint)
+                AIPlayerUtils.undoMove(state, token)
+                if value > alpha:
+                    alpha = value
+                    bestMove = move
+                    if alpha >= beta:
+                        break
+            result = alpha
+        else:
+            for move in moves:
+                childConstraint = None
+                if self.canonicalOrder:
+                    childConstraint = AIPlayerUtils.moveOrderConstraint(state, move)
+                token = AIPlayerUtils.applyMove(state, move)
+                value = self._alphaBeta(state, depth - 1, ply + 1, alpha, beta, childConstraint)
+                AIPlayerUtils.undoMove(state, token)
+                if value < beta:
+                    beta = value
+                    bestMove = move
+                    if alpha >= beta:
+                        break
+            result = beta
+
+        if table is not None:
+            table.store(key, depth, TT.boundOf(result, originalAlpha, originalBeta),
+                        _toTable(result, ply), bestMove)
+        return result
+
+
+_KEY_MASK = (1 << 64) - 1
+
+#values at least this far from zero are wins or losses
+_WIN_THRESHOLD = WIN_SCORE - 100000
+
+##
+#helpers that convert win and loss scores between the search, where they
+#count plies from the root, and the transposition table, where they count
+#plies from the state they are stored for (a position can be reached at
+#different plies)
+def _toTable(value, ply):
+    if value >= _WIN_THRESHOLD:
+        return value + ply
+    if value <= -_WIN_THRESHOLD:
+        return value - ply
+    return value
+
+def _fromTable(value, ply):
+    if value >= _WIN_THRESHOLD:
+        return value - ply
+    if value <= -_WIN_THRESHOLD:
+        return value + ply
+    return value
+
+##
+#helper that moves the move equal to the given one (a move from the
+#transposition table, made for another copy of the state) to the front
+def _moveToFront(moves, move):
+    for i in range(len(moves)):
+        other = moves[i]
+        if other.moveType == move.moveType and other.coordList == move.coordList \
+                and other.buildType == move.buildType:
+            if i > 0:
+                moves.insert(0, moves.pop(i))
+            return
@@ -0,0 +1,234 @@
+import struct
+from Constants import *
+from Ant import Ant
+from Building import Building
+from Construction import Construction
+from Inventory import Inventory
+from GameState import GameState
+from Move import Move
+from CompactState import CELL_COORDS, cellIndex
+
+#
+# StateCodec.py
+#
+# A compact, fixed-layout binary encoding of GameState and Move objects for
+# shipping them between processes, storing them in replay files or placing
+# them in shared memory.  A typical mid-game state encodes to well under
+# 200 bytes.
+#
+# Layout (little endian):
+#
+#   state  - header (see _STATE_HEADER) followed by one 3 byte record per ant
+#            (player one's ants, then player two's) and one 3 byte record per
+#            construction (player one's, player two's, then the neutral ones)
+#   ant    - cell, type | hasMoved << 3 | carrying << 4, health
+#   constr - cell, type, captureHealth (0 for grass and food)
+#   move   - header (see _MOVE_HEADER) followed by one cell byte per coordinate
+#
+# Cells are numbered x * BOARD_LENGTH + y (see CompactState.cellIndex) and
+# NO_CELL stands for coords of None.  Types are stored as signed bytes
+# because construction types are negative.
+#
+# The decoders only use struct.unpack_from so they read straight out of a
+# bytes, bytearray, mmap or memoryview without copying it.
+#
+
+STATE_TAG = b'S'
+MOVE_TAG = b'M'
+NO_CELL = 255
+NO_COORDS = 255
+NO_BUILD_TYPE = -128
+
+# tag, phase, whoseTurn, flags, player one food, player two food, zobrist key,
+# number of ants (p1, p2) and constructions (p1, p2, neutral)
+_STATE_HEADER = struct.Struct('<cBBBhhQBBBBB')
+# tag, moveType, buildType (NO_BUILD_TYPE for None), number of coordinates
+# (NO_COORDS for None)
+_MOVE_HEADER = struct.Struct('<cbbB')
+_ANT_RECORD = struct.Struct('<BBb')
+_CONSTR_RECORD = struct.Struct('<Bbb')
+RECORD_SIZE = 3
+
+#flags
+_HAS_KEY = 1
+
+_MOVED_BIT = 1 << 3
+_CARRYING_BIT = 1 << 4
+_TYPE_MASK = 7
+
+
+##
+# encodedSize
+#
+# Return: the number of bytes encode() will produce for the given GameState
+#   (or CompactState) or Move
+##
+def encodedSize(obj):
+    if isinstance(obj, Move):
+        if obj.coordList is None:
+            return _MOVE_HEADER.size
+        return _MOVE_HEADER.size + len(obj.coordList)
+    numRecords = 0
+    for inv in obj.inventories:
+        numRecords += len(inv.ants) + len(inv.constrs)
+    return _STATE_HEADER.size + numRecords * RECORD_SIZE
+
+##
+# encode
+#
+# Parameters:
+#   obj - a GameState (or CompactState) or a Move
+#
+# Return: the encoding (bytes)
+##
+def encode(obj):
+    buffer = bytearray(encodedSize(obj))
+    encodeInto(obj, buffer, 0)
+    return bytes(buffer)
+
+##
+# encodeInto
+#
+# Description: writes the encoding of a state or move into an existing
+# writable buffer (e.g. a bytearray or a shared memory block).
+#
+# Parameters:
+#   obj - a GameState (or CompactState) or a Move
+#   buffer - the buffer to write to
+#   offset - where in the buffer to start writing
+#
+# Return: the offset just past the encoding
+##
+def encodeInto(obj, buffer, offset=0):
+    if isinstance(obj, Move):
+        return _encodeMove(obj, buffer, offset)
+    return _encodeState(obj, buffer, offset)
+
+##
+# decode
+#
+# Parameters:
+#   buffer - bytes-like object holding an encoding
+#   offset - where the encoding starts
+#
+# Return: the decoded GameState (without a board) or Move
+##
+def decode(buffer, offset=0):
+    return decodeFrom(buffer, offset)[0]
+
+##
+# decodeFrom
+#
+# Description: Like decode but also reports where the encoding ends so a
+# stream of encodings (such as a replay file) can be read back in order.
+#
+# Return: a tuple (decoded object, offset just past the encoding)
+##
+def decodeFrom(buffer, offset=0):
+    tag = bytes(buffer[offset:offset + 1])
+    if tag == STATE_TAG:
+        return _decodeState(buffer, offset)
+    elif tag == MOVE_TAG:
+        return _decodeMove(buffer, offset)
+    raise ValueError("not a GameState or Move encoding: tag %r at offset %d" % (tag, offset))
+
+
+def _cellOf(coords):
+    if coords is None:
+        return NO_CELL
+    return cellIndex(coords)
+
+def _coordsOf(cell):
+    if cell == NO_CELL:
+        return None
+    return CELL_COORDS[cell]
+
+def _encodeState(state, buffer, offset):
+    inventories = state.inventories
+    key = state.zobristKey
+    _STATE_HEADER.pack_into(buffer, offset, STATE_TAG, state.phase, state.whoseTurn,
+                            _HAS_KEY if key is not None else 0,
+                            inventories[PLAYER_ONE].foodCount, inventories[PLAYER_TWO].foodCount,
+                            key if key is not None else 0,
+                            len(inventories[PLAYER_ONE].ants), len(inventories[PLAYER_TWO].ants),
+                            len(inventories[PLAYER_ONE].constrs), len(inventories[PLAYER_TWO].constrs),
+                            len(inventories[NEUTRAL].constrs))
+    offset += _STATE_HEADER.size
+    pack = _ANT_RECORD.pack_into
+    for player in (PLAYER_ONE, PLAYER_TWO):
+        for ant in inventories[player].ants:
+            bits = ant.type
+            if ant.hasMoved:
+                bits |= _MOVED_BIT
+            if ant.carrying:
+                bits |= _CARRYING_BIT
+            pack(buffer, offset, _cellOf(ant.coords), bits, ant.health)
+            offset += RECORD_SIZE
+    pack = _CONSTR_RECORD.pack_into
+    for player in (PLAYER_ONE, PLAYER_TWO):
+        for constr in inventories[player].constrs:
+            pack(buffer, offset, _cellOf(constr.coords), constr.type, constr.captureHealth)
+            offset += RECORD_SIZE
+    for constr in inventories[NEUTRAL].constrs:
+        pack(buffer, offset, _cellOf(constr.coords), constr.type, 0)
+        offset += RECORD_SIZE
+    return offset
+
+def _decodeState(buffer, offset):
+    (tag, phase, whoseTurn, flags, food1, food2, key,
+     numAnts1, numAnts2, numCons1, numCons2, numCons3) = _STATE_HEADER.unpack_from(buffer, offset)
+    offset += _STATE_HEADER.size
+    unpack = _ANT_RECORD.unpack_from
+
+    ants = ([], [])
+    for player, count in ((PLAYER_ONE, numAnts1), (PLAYER_TWO, numAnts2)):
+        for i in range(count):
+            cell, bits, health = unpack(buffer, offset)
+            offset += RECORD_SIZE
+            ant = Ant(_coordsOf(cell), bits & _TYPE_MASK, player)
+            ant.hasMoved = bool(bits & _MOVED_BIT)
+            ant.carrying = bool(bits & _CARRYING_BIT)
+            ant.health = health
+            ants[player].append(ant)
+
+    unpack = _CONSTR_RECORD.unpack_from
+    constrs = ([], [], [])
+    for player, count in ((PLAYER_ONE, numCons1), (PLAYER_TWO, numCons2), (NEUTRAL, numCons3)):
+        for i in range(count):
+            cell, constrType, captureHealth = unpack(buffer, offset)
+            offset += RECORD_SIZE
+            if player == NEUTRAL:
+                constrs[player].append(Construction(_coordsOf(cell), constrType))
+            else:
+                constrs[player].append(Building(_coordsOf(cell), constrType, player, captureHealth))
+
+    inventories = [Inventory(PLAYER_ONE, ants[PLAYER_ONE], constrs[PLAYER_ONE], food1),
+                   Inventory(PLAYER_TWO, ants[PLAYER_TWO], constrs[PLAYER_TWO], food2),
+                   Inventory(NEUTRAL, [], constrs[NEUTRAL], 0)]
+    state = GameState(None, inventories, phase, whoseTurn)
+    if flags & _HAS_KEY:
+        state.zobristKey = key
+    return state, offset
+
+def _encodeMove(move, buffer, offset):
+    buildType = move.buildType if move.buildType is not None else NO_BUILD_TYPE
+    if move.coordList is None:
+        _MOVE_HEADER.pack_into(buffer, offset, MOVE_TAG, move.moveType, buildType, NO_COORDS)
+        return offset + _MOVE_HEADER.size
+    _MOVE_HEADER.pack_into(buffer, offset, MOVE_TAG, move.moveType, buildType, len(move.coordList))
+    offset += _MOVE_HEADER.size
+    for coords in move.coordList:
+        buffer[offset] = _cellOf(coords)
+        offset += 1
+    return offset
+
+def _decodeMove(buffer, offset):
+    tag, moveType, buildType, numCoords = _MOVE_HEADER.unpack_from(buffer, offset)
+    offset += _MOVE_HEADER.size
+    coordList = None
+    if numCoords != NO_COORDS:
+        coordList = [_coordsOf(cell) for cell in struct.unpack_from('<%dB' % numCoords, buffer, offset)]
+        offset += numCoords
+    if buildType == NO_BUILD_TYPE:
+        buildType = None
+    return Move(moveType, coordList, buildType), offset
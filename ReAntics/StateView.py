@@ -0,0 +1,313 @@
+from Constants import *
+from Ant import Ant
+from Building import Building
+from Construction import Construction
+from Inventory import Inventory
+from Location import Location
+from GameState import GameState
+import Zobrist
+
+#
+# StateView.py
+#
+# Read-only views of a GameState as seen by one of the players.  The game
+# engine gives these to players that set acceptsStateView (see Player.py)
+# instead of cloning the whole state (and flipping it for player two) before
+# every move.  Making a view costs nothing: coordinates are translated to the
+# player's perspective as they are read, and the board and the wrappers for
+# the ants and constructions are only made if they are asked for.
+#
+# A view looks like a GameState (and its ants, constructions, inventories
+# and locations look like Ants, Buildings, Constructions, Inventories and
+# Locations) to AIPlayerUtils and to the rest of an agent, with three
+# differences:
+#
+#   - Nothing can be changed.  Assigning to an attribute raises an
+#     AttributeError and the ant and construction lists are tuples.
+#   - The view is live: it always shows the game's current state, so keep
+#     materialize() (or clone()) of it if you need to remember a position.
+#   - type(x) is Building doesn't hold for the wrappers (isinstance does).
+#
+# Everything is seen in the same order as in a clone(), which is not the
+# engine's inventory order (see _boardOrder), so an agent makes the same
+# choices from a view as from a clone.
+#
+# getNextState and friends work on a view directly: they copy it with
+# fastclone, which gives a real GameState.
+#
+
+_READ_ONLY = "%s is a read-only view of the game, use materialize() to get a copy that can be changed"
+
+
+#translates coords between the engine's and the player's perspective (the
+#translation is its own inverse)
+def _flip(coords):
+    if coords is None:
+        return None
+    return (BOARD_LENGTH - 1 - coords[0], BOARD_LENGTH - 1 - coords[1])
+
+
+##
+#StateView
+#Description: A read-only, perspective-aware view of a GameState
+#
+#Variables:
+#   playerId - whose perspective the view shows.  Player two sees the board
+#       flipped, exactly as GameState.flipBoard would show it.
+##
+class StateView(object):
+
+    ##
+    #__init__
+    #Description: Creates a view of the given state
+    #
+    #Parameters:
+    #   state - the GameState to view
+    #   playerId - whose perspective to show it from
+    ##
+    def __init__(self, state, playerId):
+        object.__setattr__(self, '_state', state)
+        object.__setattr__(self, 'playerId', playerId)
+        object.__setattr__(self, '_flipped', playerId == PLAYER_TWO)
+        #wrappers made so far, by the object they wrap
+        object.__setattr__(self, '_views', {})
+        object.__setattr__(self, '_key', (None, None))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(_READ_ONLY % "StateView")
+
+    @property
+    def phase(self):
+        return self._state.phase
+
+    @property
+    def whoseTurn(self):
+        return self._state.whoseTurn
+
+    @property
+    def inventories(self):
+        return tuple(self.view(inv) for inv in self._state.inventories)
+
+    @property
+    def board(self):
+        board = self._state.board
+        if self._flipped:
+            return tuple(tuple(self.view(loc) for loc in reversed(col)) for col in reversed(board))
+        return tuple(tuple(self.view(loc) for loc in col) for col in board)
+
+    @property
+    def terrainCosts(self):
+        costs = self._state.terrainCosts
+        if costs is None or not self._flipped:
+            return costs
+        return _flippedCosts(costs)
+
+    @property
+    def zobristKey(self):
+        return self.getZobristKey()
+
+    #a view never shares records (see GameState.shareclone)
+    sharedRecords = None
+
+    ##
+    #view
+    #Description: Returns the read-only wrapper for one of the state's Ants,
+    #   Constructions, Inventories or Locations.  The same wrapper is
+    #   returned each time so wrappers can be compared with 'is'.
+    ##
+    def view(self, obj):
+        if obj is None:
+            return None
+        wrapper = self._views.get(id(obj))
+        if wrapper is None:
+            if isinstance(obj, Ant):
+                wrapper = AntView(obj, self)
+            elif isinstance(obj, Building):
+                wrapper = BuildingView(obj, self)
+            elif isinstance(obj, Construction):
+                wrapper = ConstructionView(obj, self)
+            elif isinstance(obj, Inventory):
+                wrapper = InventoryView(obj, self)
+            else:
+                wrapper = LocationView(obj, self)
+            #the wrapped object is kept with its wrapper so its id stays unique
+            self._views[id(obj)] = wrapper
+        return wrapper
+
+    ##
+    #translate
+    #Description: Converts coords between the engine's perspective and the
+    #   view's (the conversion is the same in both directions)
+    ##
+    def translate(self, coords):
+        if self._flipped:
+            return _flip(coords)
+        return coords
+
+    def getAntAt(self, coords):
+        return self.view(self._state.getAntAt(self.translate(coords)))
+
+    def getConstrAt(self, coords):
+        return self.view(self._state.getConstrAt(self.translate(coords)))
+
+    def buildTerrainCosts(self):
+        costs = self._state.buildTerrainCosts()
+        return _flippedCosts(costs) if self._flipped else costs
+
+    ##
+    #getZobristKey
+    #Description: The key of the state as the player sees it (the same key
+    #   a flipped clone would have)
+    ##
+    def getZobristKey(self):
+        stateKey = self._state.getZobristKey()
+        if not self._flipped:
+            return stateKey
+        if self._key[0] != stateKey:
+            object.__setattr__(self, '_key', (stateKey, Zobrist.computeKey(self)))
+        return self._key[1]
+
+    def coordLookup(self, coords, playerId):
+        return GameState.coordLookup(self, coords, playerId)
+
+    ##
+    #materialize
+    #Description: Returns a GameState of the player's own, identical to
+    #   what the engine used to hand players (a clone, flipped for player
+    #   two)
+    ##
+    def materialize(self):
+        state = self._state.clone()
+        if self._flipped:
+            state.flipBoard()
+        return state
+
+    def clone(self):
+        return self.materialize()
+
+    ##
+    #fastclone
+    #Description: Returns a GameState copy of the view without a board (see
+    #   GameState.fastclone).  The inventories keep the view's order (the
+    #   order of a clone).
+    ##
+    def fastclone(self):
+        inventories = [inv.clone() for inv in self.inventories]
+        state = GameState(None, inventories, self.phase, self.whoseTurn)
+        state.zobristKey = self.getZobristKey()
+        state.terrainCosts = self.terrainCosts
+        return state
+
+    def shareclone(self):
+        return self.fastclone()
+
+    def shareclones(self, count):
+        state = self.fastclone()
+        #the children's indexes are copied from this one (see getNextStates)
+        state.buildIndex()
+        return state.shareclones(count)
+
+    def flipBoard(self):
+        raise AttributeError(_READ_ONLY % "StateView")
+
+    def clearConstrs(self):
+        raise AttributeError(_READ_ONLY % "StateView")
+
+#the last terrain table flipped, which is shared by all the states of a game
+_lastFlip = (None, None)
+
+def _flippedCosts(costs):
+    global _lastFlip
+    if _lastFlip[0] is not costs:
+        _lastFlip = (costs, tuple(tuple(reversed(col)) for col in reversed(costs)))
+    return _lastFlip[1]
+
+
+##
+# helper that puts ants or buildings in the order GameState.clone() does:
+# clone() collects them from the board column by column, so they are sorted
+# by their (engine) coordinates rather than kept in inventory order.  The
+# order matters because it is the order AIPlayerUtils lists moves in, and an
+# agent that picks one at random has to pick the same one it did with a
+# clone.
+def _boardOrder(objects):
+    return sorted(objects, key=lambda obj: (obj.coords[0], obj.coords[1]))
+
+
+#
+# The wrappers.  Each subclasses the class it wraps so isinstance checks and
+# the inherited methods (clone, getQueen, ...) work, and reads every
+# attribute from the wrapped object.
+#
+
+class _View(object):
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(_READ_ONLY % type(self).__name__)
+
+    def _init(self, obj, stateView):
+        object.__setattr__(self, '_obj', obj)
+        object.__setattr__(self, '_stateView', stateView)
+
+
+class AntView(_View, Ant):
+    def __init__(self, ant, stateView):
+        self._init(ant, stateView)
+
+    coords = property(lambda self: self._stateView.translate(self._obj.coords))
+    type = property(lambda self: self._obj.type)
+    player = property(lambda self: self._obj.player)
+    health = property(lambda self: self._obj.health)
+    hasMoved = property(lambda self: self._obj.hasMoved)
+    carrying = property(lambda self: self._obj.carrying)
+
+
+class ConstructionView(_View, Construction):
+    def __init__(self, constr, stateView):
+        self._init(constr, stateView)
+
+    coords = property(lambda self: self._stateView.translate(self._obj.coords))
+    type = property(lambda self: self._obj.type)
+    movementCost = property(lambda self: self._obj.movementCost)
+
+
+class BuildingView(_View, Building):
+    def __init__(self, building, stateView):
+        self._init(building, stateView)
+
+    coords = property(lambda self: self._stateView.translate(self._obj.coords))
+    type = property(lambda self: self._obj.type)
+    movementCost = property(lambda self: self._obj.movementCost)
+    player = property(lambda self: self._obj.player)
+    captureHealth = property(lambda self: self._obj.captureHealth)
+
+
+class InventoryView(_View, Inventory):
+    def __init__(self, inventory, stateView):
+        self._init(inventory, stateView)
+
+    player = property(lambda self: self._obj.player)
+    foodCount = property(lambda self: self._obj.foodCount)
+    #in the order clone() puts them in (see _boardOrder)
+    ants = property(lambda self: tuple(self._stateView.view(ant) for ant in _boardOrder(self._obj.ants)))
+
+    @property
+    def constrs(self):
+        constrs = self._obj.constrs
+        if self._obj.player != NEUTRAL:
+            constrs = _boardOrder(constrs)
+        return tuple(self._stateView.view(constr) for constr in constrs)
+
+    def clone(self):
+        return Inventory(self.player, [ant.clone() for ant in self.ants],
+                         [constr.clone() for constr in self.constrs], self.foodCount)
+
+
+class LocationView(_View, Location):
+    def __init__(self, location, stateView):
+        self._init(location, stateView)
+
+    coords = property(lambda self: self._obj.coords)
+    ant = property(lambda self: self._stateView.view(self._obj.ant))
+    constr = property(lambda self: self._stateView.view(self._obj.constr))
@@ -0,0 +1,177 @@
+from Constants import *
+
+#
+# TranspositionTable.py
+#
+# A fixed-size cache of search results keyed on the Zobrist key of a state
+# (GameState.getZobristKey).  Within a turn the same position is reached by
+# moving the same ants in different orders, and a search that remembers
+# what it found out about a position the first time doesn't have to search
+# it again.  See Search.AlphaBetaSearch for how a search uses it:
+#
+#       entry = table.probe(state.getZobristKey())
+#       if entry is not None and entry[DEPTH] >= depth and \
+#               cutsOff(entry[BOUND], entry[VALUE], alpha, beta):
+#           return entry[VALUE]
+#       ...search the state, trying entry[MOVE] first...
+#       table.store(state.getZobristKey(), depth, boundOf(value, alpha, beta), value, bestMove)
+#
+# The table holds a fixed number of buckets of two entries each.  The first
+# entry of a bucket is depth-preferred: it is only replaced by a result that
+# was searched at least as deep, or if it is left over from an earlier search.
+# The second is always replaced.  Deep results, which are the expensive ones,
+# survive while shallow ones still find a place.
+#
+# Values are stored as given, so a table should only be used for searches
+# for one player (its values are that player's) that use the same
+# evaluation function.
+#
+
+#the kinds of bound a stored value is
+EXACT = 0        # the state's value
+LOWER_BOUND = 1  # the state is worth at least the value (the search failed high)
+UPPER_BOUND = 2  # the state is worth at most the value (the search failed low)
+
+#the fields of an entry
+KEY = 0
+DEPTH = 1
+BOUND = 2
+VALUE = 3
+MOVE = 4
+GENERATION = 5
+
+DEFAULT_SIZE_MB = 16
+
+#roughly how much memory an entry takes: its slot, the entry tuple, its key
+#and value and the Move it keeps alive
+ENTRY_BYTES = 256
+
+
+##
+# boundOf
+#
+# Description: Returns the kind of bound a fail-hard alpha-beta result is
+#
+# Parameters:
+#   value - the value the search of the state returned
+#   alpha, beta - the window the state was searched with
+##
+def boundOf(value, alpha, beta):
+    if value <= alpha:
+        return UPPER_BOUND
+    if value >= beta:
+        return LOWER_BOUND
+    return EXACT
+
+##
+# cutsOff
+#
+# Description: Returns whether a stored value settles a search of the state
+# with the given window
+##
+def cutsOff(bound, value, alpha, beta):
+    if bound == EXACT:
+        return True
+    if bound == LOWER_BOUND:
+        return value >= beta
+    return value <= alpha
+
+
+##
+#TranspositionTable
+#Description: A fixed-size table of search results (see the top of this file)
+#
+#Variables:
+#   buckets - the number of buckets
+#   generation - the number of the current search (see newSearch)
+#   probes, hits, stores - counts of table use since the table was made
+##
+class TranspositionTable(object):
+
+    ##
+    #__init__
+    #Description: Creates an empty TranspositionTable
+    #
+    #Parameters:
+    #   sizeMB - roughly how much memory the table may use, in megabytes
+    ##
+    def __init__(self, sizeMB = DEFAULT_SIZE_MB):
+        self.buckets = max(1, int(sizeMB * 1024 * 1024) // (2 * ENTRY_BYTES))
+        #the entries of bucket i are at 2 * i (depth-preferred) and 2 * i + 1
+        #(always replace)
+        self._entries = [None] * (2 * self.buckets)
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    ##
+    #probe
+    #Description: Looks up a state
+    #
+    #Parameters:
+    #   key - the state's Zobrist key
+    #
+    #Return: the entry for the state, a tuple of the fields above, or None
+    ##
+    def probe(self, key):
+        self.probes += 1
+        index = 2 * (key % self.buckets)
+        entry = self._entries[index]
+        if entry is None or entry[KEY] != key:
+            entry = self._entries[index + 1]
+            if entry is None or entry[KEY] != key:
+                return None
+        self.hits += 1
+        return entry
+
+    ##
+    #store
+    #Description: Records what a search found out about a state
+    #
+    #Parameters:
+    #   key - the state's Zobrist key
+    #   depth - how deep the state was searched
+    #   bound - EXACT, LOWER_BOUND or UPPER_BOUND
+    #   value - the value the search returned
+    #   move - the best move found (a Move) or None.  If it is None the move
+    #       already stored for the state, if any, is kept.
+    ##
+    def store(self, key, depth, bound, value, move):
+        self.stores += 1
+        entries = self._entries
+        index = 2 * (key % self.buckets)
+        deep = entries[index]
+        if move is None:
+            for old in (deep, entries[index + 1]):
+                if old is not None and old[KEY] == key:
+                    move = old[MOVE]
+                    break
+        entry = (key, depth, bound, value, move, self.generation)
+        if deep is None or deep[KEY] == key or depth >= deep[DEPTH] or deep[GENERATION] != self.generation:
+            entries[index] = entry
+            #don't leave an older result for the state in the other entry
+            other = entries[index + 1]
+            if other is not None and other[KEY] == key:
+                entries[index + 1] = None
+        else:
+            entries[index + 1] = entry
+
+    ##
+    #newSearch
+    #Description: Marks the start of a new search.  The entries of earlier
+    #   searches can still be probed but no longer keep their place against
+    #   shallower results.
+    ##
+    def newSearch(self):
+        self.generation += 1
+
+    ##
+    #clear
+    #Description: Empties the table
+    ##
+    def clear(self):
+        self._entries = [None] * (2 * self.buckets)
+
+    def __len__(self):
+        return len(self._entries) - self._entries.count(None)
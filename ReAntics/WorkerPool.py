@@ -0,0 +1,132 @@
+import time
+import multiprocessing
+
+#
+# WorkerPool.py
+#
+# The worker processes of the searches that spread their work over the
+# cores (MCTS.MonteCarloSearch and ParallelSearch.ParallelSearch):
+#
+#       self.pool = WorkerPool(processes, initializer, initargs)
+#       ...
+#       results = self.pool.run(function, jobs, deadline)
+#       ...
+#       self.pool.close()
+#
+# The processes are only started by the first run, not when the pool is
+# made.  The game makes every AIPlayer twice when it loads them (see
+# Game.loadAIs) and most of them never play, so a pool started up front
+# would leave twice as many idle processes as players.  Once started the
+# processes stay up, keeping whatever the initializer set up in them, until
+# close() (which a player should call from registerWin, at the end of the
+# game).  A run after close() starts them again.
+#
+# Every run has a deadline.  The jobs that haven't finished by then are
+# given up on (their results are None) but they still hold their
+# processes, so the next run first waits a moment for them and restarts the
+# processes if they are still busy.  Either way a run gets every process to
+# itself.
+#
+
+#how long a run waits for the jobs that missed the last run's deadline
+#before it restarts the processes, in seconds
+SETTLE_TIME = 0.1
+
+
+##
+#WorkerPool
+#Description: A lazily started pool of worker processes that runs a batch
+#   of jobs against a deadline (see the top of this file)
+#
+#Variables:
+#   processes - the number of worker processes
+#   restarts - the number of times the processes were restarted because
+#       jobs that missed a deadline were still running
+##
+class WorkerPool(object):
+
+    ##
+    #__init__
+    #Description: Creates a new WorkerPool.  No processes are started yet.
+    #
+    #Parameters:
+    #   processes - the number of worker processes
+    #   initializer - a function each process calls once when it starts, or
+    #       None.  It and its arguments have to be picklable.
+    #   initargs - the arguments of initializer
+    ##
+    def __init__(self, processes, initializer = None, initargs = ()):
+        self.processes = processes
+        self.restarts = 0
+        self._initializer = initializer
+        self._initargs = initargs
+        self._pool = None
+        #the jobs of earlier runs that missed their deadline
+        self._late = []
+
+    ##
+    #run
+    #Description: Runs function(job) in the worker processes for every job
+    #
+    #Parameters:
+    #   function - a function defined at the top level of a module
+    #   jobs - the arguments of each call (each has to be picklable)
+    #   deadline - when to stop waiting for results (a time.time() time)
+    #
+    #Return: the result of each job, in order, or None for the jobs that
+    #   hadn't finished by the deadline.  An exception raised by a job is
+    #   raised again here.
+    ##
+    def run(self, function, jobs, deadline):
+        self._settle()
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.processes, self._initializer, self._initargs)
+        pending = [self._pool.apply_async(function, (job,)) for job in jobs]
+        results = []
+        for result in pending:
+            try:
+                results.append(result.get(max(0.0, deadline - time.time())))
+            except multiprocessing.TimeoutError:
+                results.append(None)
+                self._late.append(result)
+        return results
+
+    ##
+    #_settle
+    #Description: Waits for the late jobs of earlier runs, and restarts the
+    #   processes if they don't finish in SETTLE_TIME
+    ##
+    def _settle(self):
+        if len(self._late) == 0:
+            return
+        settleBy = time.time() + SETTLE_TIME
+        for result in self._late:
+            result.wait(max(0.0, settleBy - time.time()))
+        if not all(result.ready() for result in self._late):
+            self._stop()
+            self.restarts += 1
+        self._late = []
+
+    ##
+    #close
+    #Description: Stops the worker processes (if they were started)
+    ##
+    def close(self):
+        if self._pool is not None:
+            if len(self._late) > 0:
+                #don't wait for jobs nobody wants the results of
+                self._stop()
+            else:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
+        self._late = []
+
+    ##
+    #_stop
+    #Description: Kills the worker processes
+    ##
+    def _stop(self):
+        self._pool.terminate()
+        self._pool.join()
+        self._pool = None
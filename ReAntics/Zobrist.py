@@ -0,0 +1,114 @@
+import random
+from Constants import *
+
+#
+# Zobrist.py
+#
+# 64-bit Zobrist keys for game states.  A state's key is the XOR of one
+# random number for every feature of the state (each ant, each building's
+# capture health, each player's food count, whose turn it is and the game
+# phase).  When a move changes a feature, XORing out the old feature key and
+# XORing in the new one updates the state's key in O(changes).
+#
+# Ant attributes are keyed by the cell the ant occupies (there can only be one
+# ant per cell) so two ants swapping, for example, their health values
+# produces a different key.
+#
+
+NUM_CELLS = BOARD_LENGTH * BOARD_LENGTH
+
+#table sizes for the numeric features (values wrap around these)
+HEALTH_VALUES = 16
+CAP_HEALTH_VALUES = 8
+FOOD_VALUES = 64
+
+#a fixed seed so keys are identical across runs and processes
+_rng = random.Random(1234567)
+
+def _randomKeys(count):
+    return [_rng.getrandbits(64) for i in range(count)]
+
+#ANT_KEYS[player][antType][cell]
+ANT_KEYS = [[_randomKeys(NUM_CELLS) for antType in range(5)] for player in range(2)]
+#HEALTH_KEYS[cell][health]
+HEALTH_KEYS = [_randomKeys(HEALTH_VALUES) for cell in range(NUM_CELLS)]
+#MOVED_KEYS[cell] and CARRYING_KEYS[cell]
+MOVED_KEYS = _randomKeys(NUM_CELLS)
+CARRYING_KEYS = _randomKeys(NUM_CELLS)
+#CAP_HEALTH_KEYS[cell][captureHealth]
+CAP_HEALTH_KEYS = [_randomKeys(CAP_HEALTH_VALUES) for cell in range(NUM_CELLS)]
+#FOOD_KEYS[player][foodCount]
+FOOD_KEYS = [_randomKeys(FOOD_VALUES) for player in range(2)]
+#TURN_KEYS[whoseTurn] and PHASE_KEYS[phase]
+TURN_KEYS = _randomKeys(2)
+PHASE_KEYS = _randomKeys(4)
+
+
+##
+# antKey
+#
+# Parameters:
+#   player, antType, cell, health, hasMoved, carrying - the ant's attributes
+#       (cell is x * BOARD_LENGTH + y)
+#
+# Return: the key contribution of one ant
+##
+def antKey(player, antType, cell, health, hasMoved, carrying):
+    key = ANT_KEYS[player][antType][cell] ^ HEALTH_KEYS[cell][health % HEALTH_VALUES]
+    if hasMoved:
+        key ^= MOVED_KEYS[cell]
+    if carrying:
+        key ^= CARRYING_KEYS[cell]
+    return key
+
+##
+# keyOfAnt
+#
+# Return: the key contribution of an Ant object
+##
+def keyOfAnt(ant):
+    coords = ant.coords
+    return antKey(ant.player, ant.type, coords[0] * BOARD_LENGTH + coords[1],
+                  ant.health, ant.hasMoved, ant.carrying)
+
+##
+# keyOfBuilding
+#
+# Return: the key contribution of a Building's capture health
+##
+def keyOfBuilding(building):
+    coords = building.coords
+    return CAP_HEALTH_KEYS[coords[0] * BOARD_LENGTH + coords[1]][building.captureHealth % CAP_HEALTH_VALUES]
+
+##
+# foodKey
+#
+# Return: the key contribution of a player's food count
+##
+def foodKey(player, foodCount):
+    return FOOD_KEYS[player][foodCount % FOOD_VALUES]
+
+
+##
+# computeKey
+#
+# Description: computes the key of a state from scratch.  Only the
+# inventories are used so this works on any state AIPlayerUtils accepts.
+#
+# Parameters:
+#   state - the state to hash
+#
+# Return: the 64-bit key (int)
+##
+def computeKey(state):
+    key = TURN_KEYS[state.whoseTurn] ^ PHASE_KEYS[state.phase]
+    for inv in state.inventories:
+        if inv.player == NEUTRAL:
+            continue
+        key ^= foodKey(inv.player, inv.foodCount)
+        for ant in inv.ants:
+            key ^= keyOfAnt(ant)
+        for constr in inv.constrs:
+            if constr.coords is not None:
+                key ^= keyOfBuilding(constr)
+    return key
@@ -0,0 +1,24 @@
+import os
+import sys
+import pytest
+
+GAME_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#the game's modules import each other by name from the ReAntics directory
+sys.path.insert(0, GAME_DIR)
+
+
+##
+# game
+#
+# A Game with the AIs loaded and no GUI (see recordGames.loadGame) and a
+# dictionary from each AI's author to its class.  The game needs the
+# ReAntics directory as its working directory while it runs.
+##
+@pytest.fixture(scope="session")
+def game():
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(GAME_DIR)
+        patch.setattr(sys, "argv", ["Game.py"])
+        import recordGames
+        yield recordGames.loadGame()
@@ -0,0 +1,281 @@
+from Constants import *
+from Ant import *
+from Construction import *
+from Move import *
+
+#
+# legacyNextState.py
+#
+# getNextState and getNextStateAdversarial as they were in AIPlayerUtils
+# before the move rules moved into GameRules, together with the helpers they
+# called, copied unchanged.  test_GameRules.py compares the search rule sets
+# with them.  Don't fix anything here: the point is to keep the old behavior.
+#
+
+##
+# legalCoord
+#
+# determines whether a given coordinate is legal or not
+#
+#Parameters:
+#   coord        - an x,y coordinate
+#
+# Return: true (legal) or false (illegal)
+def legalCoord(coord):
+
+    #make sure we have a tuple or list with two elements in it
+    try:
+        if len(coord) != 2:
+            return False
+    except TypeError:
+        print("ERROR:  parameter to legalCoord was not a tuple or list")
+        return False
+
+    x = coord[0]
+    y = coord[1]
+    return ( (x >= 0) and (x <= 9) and (y >= 0) and (y <= 9))
+
+
+##
+# getAntList()
+#
+# builds a list of all ants that meet a given specification
+#
+# Parameters:
+#     currentState - a GameState or Node
+#     pid   - all ants must belong to this player id.  Pass None to
+#             indicate any player
+#     types - a tuple of all the ant types wanted (see Constants.py)
+#
+def getAntList(currentState,
+               pid = None,
+               types = (QUEEN, WORKER, DRONE, SOLDIER, R_SOLDIER)):
+
+    #start with a list of all ants that belong to the indicated player(s)
+    allAnts = []
+    for inv in currentState.inventories:
+        if (pid == None) or (pid == inv.player):
+            allAnts += inv.ants
+
+    #fill the result with ants that are of the right type
+    result = []
+    for ant in allAnts:
+        if ant.type in types:
+            result.append(ant)
+
+    return result
+
+
+##
+# getConstrList()
+#
+# builds a list of all constructs that meet a given specification.
+#
+# Caveat:  if you pass a GameState for the first parameter, food and grass will
+# not be returned.
+#
+# Parameters:
+#     currentState - a GameState or Node
+#     pid   - all ants must belong to this player id.  Pass None to
+#             indicate any player including unowned constructs like grass/food
+#     types - a tuple of all the constr types wanted (see Constants.py)
+#
+def getConstrList(currentState,
+                  pid = None,
+                  types = (ANTHILL, TUNNEL, GRASS, FOOD)):
+
+    #start with a list of all constrs that belong to the indicated player(s)
+    allConstrs = []
+    for inv in currentState.inventories:
+        if (pid == None) or (pid == inv.player):
+            allConstrs += inv.constrs
+
+    #fill the result with constrs that are of the right type
+    result = []
+    for constr in allConstrs:
+        if constr.type in types:
+            result.append(constr)
+
+    return result
+
+
+##
+# getAntAt
+#
+# determines which ant is at a given coordinate
+#
+# Parameters:
+#    state  - a valid GameState object
+#    coords - a valid coordinate (code does not check for invalid!)
+#
+# Return:  the ant at the coordinate or None if there is none
+def getAntAt(state, coords) -> Ant:
+    #get a list of all constructs
+    allAnts = getAntList(state)
+
+    #search for one at the given coord
+    for ant in allAnts:
+        if ant.coords == coords:
+            return ant
+
+    return None  #not found
+
+
+##
+# listAttackable
+#
+# lists the attackable coordinates from a start coordinate and attack range
+# coordinates from a taxicab square around start
+#
+# coord - the coordinate of the attacking ant
+# dist - the attack range of the attacking ant
+def listAttackable(coord, dist = 1):
+    res = []
+
+    # goes L-R across board, offset by 1 for range()
+    for i in range(-dist, dist + 1):
+        # get allowed y variance given x variance
+        # offset by 1 for range()
+        yLen = dist - abs(i)
+        for j in range(-yLen, yLen + 1):
+            newCord = (coord[0] + i, coord[1] + j)
+            if legalCoord(newCord) and newCord != coord:
+                res.append(newCord)
+
+    return res
+
+
+##
+# Return: a reference to the inventory of the player whose turn it is
+def getCurrPlayerInventory(currentState):
+    #Get my inventory
+    resultInv = None
+    for inv in currentState.inventories:
+        if inv.player == currentState.whoseTurn:
+            resultInv = inv
+            break
+        
+    return resultInv
+
+
+##
+# getNextState
+#
+# Author:  Jordan Goldey (Class of 2017)
+#
+# Description: Creates a copy of the given state and modifies the inventories in
+# it to reflect what they would look like after a given move.  For efficiency,
+# only the inventories are modified and the board is set to None.  The original
+# (given) state is not modified.
+#
+# CAVEAT: To facilitate longer term analysis without having to take enemy moves
+# into consideration, MOVE_ANT commands do not cause the hasMoved property of
+# the ant to change to True.  Furthermore the END move type is ignored.
+#
+# Parameters:
+#   currentState - A clone of the current state (GameState)
+#   move - The move that the agent would take (Move)
+#
+# Return: A clone of what the state would look like if the move was made
+##
+def getNextState(currentState, move):
+    # variables I will need
+    myGameState = currentState.fastclone()
+    myInv = getCurrPlayerInventory(myGameState)
+    me = myGameState.whoseTurn
+    myAnts = myInv.ants
+    myTunnels = myInv.getTunnels()
+    myAntHill = myInv.getAnthill()
+
+    # If enemy ant is on my anthill or tunnel update capture health
+    ant = getAntAt(myGameState, myAntHill.coords)
+    if ant is not None:
+        if ant.player != me:
+            myAntHill.captureHealth -= 1
+
+    # If an ant is built update list of ants
+    antTypes = [WORKER, DRONE, SOLDIER, R_SOLDIER]
+    if move.moveType == BUILD:
+        if move.buildType in antTypes:
+            ant = Ant(myInv.getAnthill().coords, move.buildType, me)
+            myInv.ants.append(ant)
+            # Update food count depending on ant built
+            if move.buildType == WORKER:
+                myInv.foodCount -= 1
+            elif move.buildType == DRONE or move.buildType == R_SOLDIER:
+                myInv.foodCount -= 2
+            elif move.buildType == SOLDIER:
+                myInv.foodCount -= 3
+        # ants are no longer allowed to build tunnels, so this is an error
+        elif move.buildType == TUNNEL:
+            print("Attempted tunnel build in getNextState()")
+            return currentState
+
+    # If an ant is moved update their coordinates and has moved
+    elif move.moveType == MOVE_ANT:
+        newCoord = move.coordList[-1]
+        startingCoord = move.coordList[0]
+        for ant in myAnts:
+            if ant.coords == startingCoord:
+                ant.coords = newCoord
+                # TODO: should this be set true? Design decision
+                ant.hasMoved = False
+                # If an ant is carrying food and ends on the anthill or tunnel drop the food
+                if ant.carrying and ant.coords == myInv.getAnthill().coords:
+                    myInv.foodCount += 1
+                    ant.carrying = False
+                for tunnels in myTunnels:
+                    if ant.carrying and (ant.coords == tunnels.coords):
+                        myInv.foodCount += 1
+                        ant.carrying = False
+                # If an ant doesn't have food and ends on the food grab food
+                if not ant.carrying and ant.type == WORKER:
+                    foods = getConstrList(myGameState, 2, [FOOD])
+                    for food in foods:
+                        if food.coords == ant.coords:
+                            ant.carrying = True
+                # If my ant is close to an enemy ant attack it
+                attackable = listAttackable(ant.coords, UNIT_STATS[ant.type][RANGE])
+                for coord in attackable:
+                    foundAnt = getAntAt(myGameState, coord)
+                    if foundAnt is not None:  # If ant is adjacent my ant
+                        if foundAnt.player != me:  # if the ant is not me
+                            foundAnt.health = foundAnt.health - UNIT_STATS[ant.type][ATTACK]  # attack
+                            # If an enemy is attacked and looses all its health remove it from the other players
+                            # inventory
+                            if foundAnt.health <= 0:
+                                myGameState.inventories[1 - me].ants.remove(foundAnt)
+                            # If attacked an ant already don't attack any more
+                            break
+    return myGameState
+
+
+##
+# getNextStateAdversarial
+#
+# Description: This is the same as getNextState (above) except that it properly
+# updates the hasMoved property on ants and the END move is processed correctly.
+#
+# Parameters:
+#   currentState - A clone of the current state (GameState)
+#   move - The move that the agent would take (Move)
+#
+# Return: A clone of what the state would look like if the move was made
+##
+def getNextStateAdversarial(currentState, move):
+    # variables I will need
+    nextState = getNextState(currentState, move)
+    myInv = getCurrPlayerInventory(nextState)
+    myAnts = myInv.ants
+
+    # If an ant is moved update their coordinates and has moved
+    if move.moveType == MOVE_ANT:
+        startingCoord = move.coordList[0]
+        for ant in myAnts:
+            if ant.coords == startingCoord:
+                ant.hasMoved = True
+    elif move.moveType == END:
+        for ant in myAnts:
+            ant.hasMoved = False
+        nextState.whoseTurn = 1 - currentState.whoseTurn
+    return nextState
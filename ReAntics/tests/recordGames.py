@@ -0,0 +1,236 @@
+import os
+import sys
+import json
+import random
+
+#
+# recordGames.py
+#
+# Plays AI vs AI games through Game.runGame with no GUI and records, for
+# every move of the play phase, the move, the attack that followed it (if
+# any) and a snapshot of the engine's state after them (see snapshot; the
+# constructions are left out of it while they stay the same, which is most
+# of the time).  test_GameRules.py replays the recordings through GameRules
+# and compares the states.
+#
+# The recordings in data/recordedGames.json were made with the engine as it
+# was before the move rules moved into GameRules, so they pin the kernel to
+# the rules the engine had always played by.  To record new ones (from a
+# checkout of whichever engine they should come from):
+#
+#       python tests/recordGames.py [path to its ReAntics directory]
+#
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RECORDING_FILE = os.path.join(HERE, "data", "recordedGames.json")
+
+#the games to record: (player one, player two, random seed)
+MATCHES = [("Booger", "Simple Food Gatherer", 0),
+           ("Simple Food Gatherer", "Booger", 1),
+           ("Random", "Booger", 2),
+           ("Random", "Simple Food Gatherer", 3),
+           ("Random", "Random", 4),
+           ("Natural Selection", "Booger", 5)]
+
+#games still going after this many moves are cut short (Random against
+#Random can wander for a long time)
+MAX_MOVES = 1500
+
+
+##
+# snapshot
+#
+# Description: Returns what a state looks like in a form that can be saved as
+# JSON and compared: whose turn it is, each player's food and the ants and
+# constructions, sorted so the order of the inventories doesn't matter.
+# Constructions are read off the board (where the engine has always put
+# every construction) and ants off the inventories.
+#
+# Parameters:
+#   state - a GameState
+#
+# Return: a dictionary
+##
+def snapshot(state):
+    ants = []
+    for inv in state.inventories:
+        for ant in inv.ants:
+            ants.append([ant.player, ant.type, ant.coords[0], ant.coords[1], ant.health,
+                         int(ant.hasMoved), int(ant.carrying)])
+    constrs = []
+    for column in state.board:
+        for loc in column:
+            constr = loc.constr
+            if constr is not None:
+                player = getattr(constr, "player", None)
+                constrs.append([len(state.inventories) - 1 if player is None else player, constr.type,
+                                constr.coords[0], constr.coords[1], getattr(constr, "captureHealth", None)])
+    return {"whoseTurn": state.whoseTurn,
+            "food": [state.inventories[0].foodCount, state.inventories[1].foodCount],
+            "ants": sorted(ants),
+            "constrs": sorted(constrs)}
+
+##
+# helper that converts coords of a move or attack into JSON
+def _coordList(coords):
+    return [[coord[0], coord[1]] for coord in coords]
+
+##
+# recordGame
+#
+# Description: Plays one game and records it
+#
+# Parameters:
+#   game - a Game with the AIs loaded and no UI
+#   p1, p2 - the players
+#   seed - seeds the random module before the game
+#
+# Return: a dictionary with the players, the state the play phase started
+# from (its inventories in order, see snapshot) and the recorded steps
+##
+def recordGame(game, p1, p2, seed):
+    import Game
+
+    recording = {"players": [p1.author, p2.author], "seed": seed, "start": None, "steps": []}
+    pending = {}
+
+    def wrapGetMove(player):
+        getMove = player.getMove
+        def recordMove(currentState):
+            if recording["start"] is None:
+                recording["start"] = _startOf(game.state)
+            move = getMove(currentState)
+            #the engine converts player two's coords in place, so the move
+            #is written down once it has been made
+            pending["move"] = move
+            pending["attack"] = None
+            return move
+        return recordMove
+
+    def wrapGetAttack(player):
+        getAttack = player.getAttack
+        def recordAttack(currentState, attackingAnt, enemyLocations):
+            coords = getAttack(currentState, attackingAnt, enemyLocations)
+            pending["attack"] = game.state.coordLookup(coords, game.state.whoseTurn)
+            return coords
+        return recordAttack
+
+    hasWon = game.hasWon
+    def recordStep(playerId):
+        #called after every pass of the game loop
+        move = pending.pop("move", None)
+        if move is not None and playerId == 0:
+            attack = pending["attack"]
+            state = snapshot(game.state)
+            if state["constrs"] == pending.get("constrs"):
+                state["constrs"] = None
+            else:
+                pending["constrs"] = state["constrs"]
+            recording["steps"].append({
+                "move": [move.moveType, None if move.coordList is None else _coordList(move.coordList),
+                         move.buildType],
+                "attack": None if attack is None else [attack[0], attack[1]],
+                "state": state})
+            if len(recording["steps"]) >= MAX_MOVES:
+                game.gameOver = True
+        return hasWon(playerId)
+
+    for player in (p1, p2):
+        player.getMove = wrapGetMove(player)
+        player.getAttack = wrapGetAttack(player)
+    game.hasWon = recordStep
+    try:
+        random.seed(seed)
+        game.setup(Game.GameData(p1, p2), 0)
+        game.runGame()
+    finally:
+        for player in (p1, p2):
+            del player.getMove
+            del player.getAttack
+        game.hasWon = hasWon
+    return recording
+
+##
+# recordMatch
+#
+# Description: Records one of MATCHES with new players
+#
+# Parameters:
+#   game, aiClasses - see loadGame
+#   match - the index of the match in MATCHES
+#
+# Return: see recordGame
+##
+def recordMatch(game, aiClasses, match):
+    from Constants import PLAYER_ONE, PLAYER_TWO
+
+    name1, name2, seed = MATCHES[match]
+    #some agents (Natural Selection) draw from the random module when they
+    #are made, so the seed goes in first
+    random.seed(seed)
+    return recordGame(game, aiClasses[name1](PLAYER_ONE), aiClasses[name2](PLAYER_TWO), seed)
+
+##
+# helper that records the state the play phase starts from, keeping the
+# inventories in order so the test can rebuild it
+def _startOf(state):
+    inventories = []
+    for inv in state.inventories:
+        inventories.append({
+            "food": inv.foodCount,
+            "ants": [[ant.type, ant.coords[0], ant.coords[1], ant.health, int(ant.hasMoved), int(ant.carrying)]
+                     for ant in inv.ants],
+            "constrs": [[constr.type, constr.coords[0], constr.coords[1], getattr(constr, "captureHealth", None)]
+                        for constr in inv.constrs]})
+    return {"whoseTurn": state.whoseTurn, "inventories": inventories}
+
+
+##
+# helper that stands in for the GUI
+class _NoUI(object):
+    paused = False
+
+    def __getattr__(self, name):
+        return _NoUI()
+
+    def __call__(self, *args, **kwargs):
+        return None
+
+
+##
+# loadGame
+#
+# Description: Makes a Game with the AIs loaded and no GUI.  Has to be called
+# from the ReAntics directory (the game loads the AIs from ./AI) with no
+# command line options in sys.argv (the game reads them).
+#
+# Return: the Game and a dictionary from each AI's author to its class
+##
+def loadGame():
+    import Game
+
+    game = Game.Game(testing=True)
+    game.UI = _NoUI()
+    game.currentPlayerScores = [["", 0, 0], ["", 0, 0]]
+    #each game gets new players, so an AI can play itself
+    aiClasses = dict((player[0].author, type(player[0])) for player in game.players)
+    return game, aiClasses
+
+
+def main(gameDir):
+    os.chdir(gameDir)
+    sys.path.insert(0, gameDir)
+    sys.argv = ["Game.py"]
+
+    game, aiClasses = loadGame()
+    recordings = []
+    for match in range(len(MATCHES)):
+        recordings.append(recordMatch(game, aiClasses, match))
+        print("%s vs %s: %d moves" % (MATCHES[match][0], MATCHES[match][1], len(recordings[-1]["steps"])))
+
+    with open(RECORDING_FILE, "w") as recordingFile:
+        json.dump(recordings, recordingFile, separators=(",", ":"))
+
+
+if __name__ == "__main__":
+    main(os.path.abspath(sys.argv[1]) if len(sys.argv) > 1 else os.path.dirname(HERE))
@@ -0,0 +1,91 @@
+import random
+from Constants import *
+from Benchmark import randomSetupState
+
+#
+# stateHelpers.py
+#
+# Helpers shared by the tests: descriptions of states and moves that can be
+# compared with ==, and random setup phase states to go with
+# Benchmark.randomPlayState.
+#
+
+
+##
+# stateSignature
+#
+# Description: Returns everything a state holds (phase, whose turn it is and
+# each inventory's food, ants and constructions, in inventory order) as
+# nested tuples.  Works on GameStates, CompactStates and StateViews.
+#
+# Parameters:
+#   state - the state to describe
+#
+# Return: a tuple
+##
+def stateSignature(state):
+    signature = [state.phase, state.whoseTurn]
+    for inv in state.inventories:
+        if inv.player == NEUTRAL:
+            #grass and food have no owner or capture health
+            constrs = tuple((tuple(constr.coords), constr.type) for constr in inv.constrs)
+        else:
+            constrs = tuple((tuple(constr.coords), constr.type, constr.player, constr.captureHealth)
+                            for constr in inv.constrs)
+        signature.append((inv.player, inv.foodCount,
+                          tuple((tuple(ant.coords), ant.type, ant.player, ant.health,
+                                 bool(ant.hasMoved), bool(ant.carrying)) for ant in inv.ants),
+                          constrs))
+    return tuple(signature)
+
+##
+# boardSignature
+#
+# Description: Returns the coordinates of the ant and the construction on
+# each cell of a state's board (None for empty cells)
+##
+def boardSignature(state):
+    return tuple(tuple((None if loc.ant is None else tuple(loc.ant.coords),
+                        None if loc.constr is None else tuple(loc.constr.coords))
+                       for loc in column) for column in state.board)
+
+##
+# moveSignature
+#
+# Description: Returns a move as a tuple: (moveType, coordList, buildType)
+##
+def moveSignature(move):
+    coordList = None if move.coordList is None else tuple(tuple(coords) for coords in move.coordList)
+    return (move.moveType, coordList, move.buildType)
+
+##
+# randomSetupPhaseState
+#
+# Description: Returns a state part way through the setup phases: in
+# SETUP_PHASE_1 some of the anthills, tunnels and grass have been placed and
+# in SETUP_PHASE_2 some of the food.  There are no ants yet.
+#
+# Parameters:
+#   seed - seed for the random number generator
+#
+# Return: a GameState (with a board)
+##
+def randomSetupPhaseState(seed):
+    rng = random.Random(seed)
+    state = randomSetupState(rng)
+    state.phase = rng.choice((SETUP_PHASE_1, SETUP_PHASE_2))
+    state.whoseTurn = rng.choice((PLAYER_ONE, PLAYER_TWO))
+    for inv in state.inventories:
+        inv.ants = []
+        inv.foodCount = 0
+    #the neutral inventory holds the grass first and then the 4 food
+    neutral = state.inventories[NEUTRAL]
+    if state.phase == SETUP_PHASE_1:
+        neutral.constrs = neutral.constrs[:rng.randint(0, len(neutral.constrs) - 4)]
+        for inv in state.inventories[:2]:
+            if rng.random() < 0.3:
+                inv.constrs = inv.constrs[:rng.randint(0, 1)]
+    else:
+        neutral.constrs = neutral.constrs[:rng.randint(len(neutral.constrs) - 4, len(neutral.constrs))]
+    state.board = state.buildBoard()
+    return state
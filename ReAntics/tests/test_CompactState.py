@@ -0,0 +1,50 @@
+import pytest
+from Constants import *
+import Zobrist
+from CompactState import to_compact, from_compact
+from Benchmark import randomPlayState
+from stateHelpers import stateSignature, boardSignature, randomSetupPhaseState
+
+#
+# test_CompactState.py
+#
+# Checks that converting a GameState to a CompactState and back loses
+# nothing, in the setup phases and in the play phase.
+#
+
+SEEDS = range(100)
+
+
+##
+# helper that checks one state survives the round trip
+def _checkRoundTrip(state):
+    compact = to_compact(state)
+    assert stateSignature(compact) == stateSignature(state)
+    assert Zobrist.computeKey(compact) == Zobrist.computeKey(state)
+
+    restored = from_compact(compact)
+    assert stateSignature(restored) == stateSignature(state)
+    #from_compact builds its board from its own inventories
+    assert boardSignature(restored) == boardSignature(state)
+    for inv in restored.inventories:
+        for ant in inv.ants:
+            assert restored.board[ant.coords[0]][ant.coords[1]].ant is ant
+        for constr in inv.constrs:
+            assert restored.board[constr.coords[0]][constr.coords[1]].constr is constr
+    #and from_compact's result converts back to the same CompactState
+    assert stateSignature(to_compact(restored)) == stateSignature(compact)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_roundTripSetupPhase(seed):
+    _checkRoundTrip(randomSetupPhaseState(seed))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_roundTripPlayPhase(seed):
+    _checkRoundTrip(randomPlayState(seed))
+
+
+def test_roundTripBlankState():
+    from GameState import GameState
+    _checkRoundTrip(GameState.getBlankState())
@@ -0,0 +1,29 @@
+import json
+import pytest
+from recordGames import MATCHES, RECORDING_FILE, recordMatch
+
+#
+# test_Game.py
+#
+# Plays the matches recorded in data/recordedGames.json (see recordGames.py)
+# again through Game.runGame and checks that every move, every attack and
+# the state after each of them are the same as when they were recorded.  The
+# recordings were made with the engine as it was before any of the speedups,
+# so this catches anything that changes the games the bundled agents play:
+# the state they are given, the order they see things in or the rules.
+#
+
+with open(RECORDING_FILE) as recordingFile:
+    RECORDINGS = json.load(recordingFile)
+
+
+@pytest.mark.parametrize("match", range(len(MATCHES)),
+                         ids=["%s-vs-%s" % (name1, name2) for name1, name2, seed in MATCHES])
+def test_recordedMatchPlaysTheSame(game, match):
+    recording = recordMatch(game[0], game[1], match)
+    expected = RECORDINGS[match]
+    assert recording["players"] == expected["players"] and recording["seed"] == expected["seed"]
+    assert recording["start"] == expected["start"]
+    for step in range(min(len(recording["steps"]), len(expected["steps"]))):
+        assert recording["steps"][step] == expected["steps"][step], "step %d" % step
+    assert len(recording["steps"]) == len(expected["steps"])
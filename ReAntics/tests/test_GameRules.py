@@ -0,0 +1,186 @@
+import json
+import random
+import pytest
+from Constants import *
+from GameState import GameState
+from Inventory import Inventory
+from Ant import Ant
+from Building import Building
+from Construction import Construction
+from Move import Move
+import GameRules
+import Zobrist
+import AIPlayerUtils
+import legacyNextState
+from Benchmark import randomPlayState
+from recordGames import RECORDING_FILE, snapshot
+from stateHelpers import stateSignature, boardSignature
+
+#
+# test_GameRules.py
+#
+# Replays games recorded from Game.runGame (see recordGames.py) through
+# GameRules with the engine's rules and checks that every move leaves the
+# state the engine was in.  The incrementally updated Zobrist key and
+# coordinate index are also checked against ones computed from scratch.
+#
+# The search rules (getNextState and getNextStateAdversarial) are compared
+# with the implementations they replaced (see legacyNextState.py) on every
+# legal move of random play states.  Undoing the engine's moves and attacks
+# from their journals (how Game.runGame undoes a human's moves) is checked
+# to restore the state exactly.
+#
+
+with open(RECORDING_FILE) as recordingFile:
+    RECORDINGS = json.load(recordingFile)
+
+#the seeds of the random play states (see Benchmark.randomPlayState)
+SEEDS = range(100)
+
+
+##
+# helper that rebuilds the state a recorded game's play phase started from
+def _startState(start):
+    inventories = []
+    for player in range(len(start["inventories"])):
+        record = start["inventories"][player]
+        ants = []
+        for antType, x, y, health, hasMoved, carrying in record["ants"]:
+            ant = Ant((x, y), antType, player)
+            ant.health = health
+            ant.hasMoved = bool(hasMoved)
+            ant.carrying = bool(carrying)
+            ants.append(ant)
+        constrs = []
+        for constrType, x, y, captureHealth in record["constrs"]:
+            if player == NEUTRAL:
+                constrs.append(Construction((x, y), constrType))
+            else:
+                constrs.append(Building((x, y), constrType, player, captureHealth))
+        inventories.append(Inventory(player, ants, constrs, record["food"]))
+    state = GameState(None, inventories, PLAY_PHASE, start["whoseTurn"])
+    state.buildIndex()
+    return state
+
+
+@pytest.mark.parametrize("recording", RECORDINGS,
+                         ids=["%s-vs-%s" % tuple(recording["players"]) for recording in RECORDINGS])
+def test_engineRulesReplayRecordedGame(recording):
+    state = _startState(recording["start"])
+    constrs = None
+    for ply in range(len(recording["steps"])):
+        step = recording["steps"][ply]
+        moveType, coordList, buildType = step["move"]
+        if coordList is not None:
+            coordList = [tuple(coords) for coords in coordList]
+        move = Move(moveType, coordList, buildType)
+
+        ant = GameRules.applyMove(state, move, GameRules.ENGINE_RULES)
+        if step["attack"] is not None:
+            GameRules.applyAttack(state, ant, tuple(step["attack"]))
+
+        #the constructions are only recorded when they change
+        expected = dict(step["state"])
+        if expected["constrs"] is None:
+            expected["constrs"] = constrs
+        constrs = expected["constrs"]
+        assert snapshot(state) == expected, "move %d (%s)" % (ply, move)
+        assert state.zobristKey == Zobrist.computeKey(state), "move %d (%s): stale Zobrist key" % (ply, move)
+        antIndex = state.antIndex
+        constrIndex = state.constrIndex
+        state.buildIndex()
+        assert antIndex == state.antIndex and constrIndex == state.constrIndex, \
+            "move %d (%s): stale coordinate index" % (ply, move)
+
+
+##
+# helper that describes everything undo has to restore: the inventories, the
+# Zobrist key, the coordinate index and the board
+def _undoSnapshot(state):
+    return (stateSignature(state), state.zobristKey, dict(state.antIndex), dict(state.constrIndex),
+            boardSignature(state))
+
+
+##
+# helper that tells whether the ant a move moves can attack where it ends up
+def _attacksAfter(state, move):
+    if move.moveType != MOVE_ANT:
+        return False
+    ant = state.getAntAt(move.coordList[0])
+    return ant.type != WORKER and len(GameRules.attackTargets(state, move.coordList[-1], ant.type, ant.player)) > 0
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_undoEngineMovesAndAttacks(seed):
+    #plays random moves the way Game.runGame does for a human player: each
+    #MOVE_ANT or BUILD (and the attack after it) is recorded in a journal,
+    #UNDO plays the last journal back and END forgets them
+    rng = random.Random(seed)
+    state = randomPlayState(seed)
+    state.getZobristKey()
+    state.buildIndex()
+    state.board = state.buildBoard()
+    journals = []
+    snapshots = []
+    for step in range(60):
+        if AIPlayerUtils.getWinner(state) is not None:
+            break
+        if len(journals) > 0 and rng.random() < 0.35:
+            GameRules.undo(state, journals.pop())
+            assert _undoSnapshot(state) == snapshots.pop(), "step %d" % step
+            continue
+        moves = AIPlayerUtils.listAllLegalMoves(state)
+        attacks = [move for move in moves if _attacksAfter(state, move)]
+        move = rng.choice(attacks if len(attacks) > 0 and rng.random() < 0.7 else moves)
+        if move.moveType == END:
+            GameRules.applyMove(state, move, GameRules.ENGINE_RULES)
+            journals = []
+            snapshots = []
+            continue
+        snapshots.append(_undoSnapshot(state))
+        journal = []
+        journals.append(journal)
+        ant = GameRules.applyMove(state, move, GameRules.ENGINE_RULES, journal)
+        if move.moveType == MOVE_ANT and ant.type != WORKER:
+            targets = GameRules.attackTargets(state, ant.coords, ant.type, ant.player)
+            if len(targets) > 0:
+                GameRules.applyAttack(state, ant, rng.choice(targets).coords, journal)
+        assert state.zobristKey == Zobrist.computeKey(state), "step %d" % step
+    while len(journals) > 0:
+        GameRules.undo(state, journals.pop())
+        assert _undoSnapshot(state) == snapshots.pop()
+    #and the restored index is the one the inventories give
+    antIndex = dict(state.antIndex)
+    constrIndex = dict(state.constrIndex)
+    state.buildIndex()
+    assert antIndex == state.antIndex and constrIndex == state.constrIndex
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_searchRulesMatchOldGetNextState(seed):
+    state = randomPlayState(seed)
+    before = stateSignature(state)
+    for move in AIPlayerUtils.listAllLegalMoves(state):
+        expected = legacyNextState.getNextState(state, move)
+        assert stateSignature(AIPlayerUtils.getNextState(state, move)) == stateSignature(expected), str(move)
+    assert stateSignature(state) == before
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_adversarialRulesMatchOldGetNextStateAdversarial(seed):
+    state = randomPlayState(seed)
+    before = stateSignature(state)
+    for move in AIPlayerUtils.listAllLegalMoves(state):
+        result = AIPlayerUtils.getNextStateAdversarial(state, move)
+        expected = legacyNextState.getNextStateAdversarial(state, move)
+        if move.moveType == MOVE_ANT and len(move.coordList) > 1:
+            #the one intended difference: the old version looked for the ant
+            #at the start of its path after moving it, so only ants that
+            #stayed put were marked as having moved
+            endCoord = move.coordList[-1]
+            assert result.getAntAt(endCoord).hasMoved, str(move)
+            oldAnt = legacyNextState.getAntAt(expected, endCoord)
+            assert not oldAnt.hasMoved, str(move)
+            oldAnt.hasMoved = True
+        assert stateSignature(result) == stateSignature(expected), str(move)
+    assert stateSignature(state) == before
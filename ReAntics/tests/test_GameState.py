@@ -0,0 +1,173 @@
+import random
+import pytest
+from Constants import *
+import AIPlayerUtils
+from Benchmark import randomPlayState
+from Move import Move
+from stateHelpers import stateSignature, moveSignature
+
+#
+# test_GameState.py
+#
+# Checks the coordinate lookups of GameState (getAntAt and getConstrAt)
+# against a search of the inventories, including on states an agent has
+# changed by hand rather than through the move rules.  Also checks that
+# shareclones stay isolated from each other when they are changed the way
+# shareclone documents, and pins down what happens when they aren't.
+#
+
+SEEDS = range(40)
+CELLS = [(x, y) for x in range(BOARD_LENGTH) for y in range(BOARD_LENGTH)]
+
+
+##
+# helpers: what is at the coordinates according to the inventories (the
+# first one in inventory order)
+def _antAt(state, coords):
+    for inv in state.inventories:
+        for ant in inv.ants:
+            if ant.coords == coords:
+                return ant
+    return None
+
+def _constrAt(state, coords):
+    for inv in state.inventories:
+        for constr in inv.constrs:
+            if constr.coords == coords:
+                return constr
+    return None
+
+##
+# helper that checks every cell of a state, and the moves listed from it,
+# against a copy of the state with a newly built index
+def _checkLookups(state):
+    for coords in CELLS:
+        assert state.getAntAt(coords) is _antAt(state, coords), coords
+        assert state.getConstrAt(coords) is _constrAt(state, coords), coords
+        assert AIPlayerUtils.getAntAt(state, list(coords)) is _antAt(state, coords), coords
+    fresh = state.fastclone()
+    fresh.antIndex = None
+    fresh.constrIndex = None
+    assert [moveSignature(move) for move in AIPlayerUtils.listAllLegalMoves(state)] == \
+        [moveSignature(move) for move in AIPlayerUtils.listAllLegalMoves(fresh)]
+
+
+@pytest.mark.parametrize("clone", ["clone", "fastclone"])
+@pytest.mark.parametrize("seed", SEEDS)
+def test_lookupsAfterMovingAnAntByHand(seed, clone):
+    rng = random.Random(seed)
+    state = getattr(randomPlayState(seed), clone)()
+    #make sure the clone has an index to go stale
+    state.getAntAt((0, 0))
+    ant = rng.choice(state.inventories[state.whoseTurn].ants)
+    oldCoords = ant.coords
+    ant.coords = rng.choice([coords for coords in CELLS if _antAt(state, coords) is None])
+    assert state.getAntAt(ant.coords) is ant
+    assert state.getAntAt(oldCoords) is None
+    _checkLookups(state)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_lookupsAfterRemovingAnAntByHand(seed):
+    rng = random.Random(seed)
+    state = randomPlayState(seed).fastclone()
+    state.getAntAt((0, 0))
+    ants = state.inventories[1 - state.whoseTurn].ants
+    ant = ants.pop(rng.randrange(len(ants)))
+    assert state.getAntAt(ant.coords) is None
+    _checkLookups(state)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_lookupsAfterRemovingFoodByHand(seed):
+    rng = random.Random(seed)
+    state = randomPlayState(seed).fastclone()
+    state.getConstrAt((0, 0))
+    neutral = state.inventories[NEUTRAL].constrs
+    food = rng.choice([constr for constr in neutral if constr.type == FOOD])
+    neutral.remove(food)
+    assert state.getConstrAt(food.coords) is None
+    _checkLookups(state)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_lookupsAlongRandomGame(seed):
+    #the move rules keep the index up to date themselves
+    rng = random.Random(seed)
+    state = randomPlayState(seed, 0)
+    for ply in range(60):
+        if AIPlayerUtils.getWinner(state) is not None:
+            break
+        state = AIPlayerUtils.getNextStateAdversarial(state, rng.choice(AIPlayerUtils.listAllLegalMoves(state)))
+        for coords in CELLS:
+            assert state.antIndex.get(coords) is _antAt(state, coords), (ply, coords)
+    _checkLookups(state)
+
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_shareclonesAreIsolatedThroughTheRules(seed):
+    #a search tree of shareclones matches the same tree of fastclones, so
+    #making a child never changes its parent, its siblings or anything else
+    #in the tree
+    rng = random.Random(seed)
+    plain = randomPlayState(seed).fastclone()
+    shared = plain.fastclone().shareclone()
+    tree = [(plain, shared)]
+    frontier = tree
+    for depth in range(3):
+        nextFrontier = []
+        for plainNode, sharedNode in frontier:
+            moves = AIPlayerUtils.listAllLegalMoves(plainNode)
+            for move in rng.sample(moves, min(4, len(moves))):
+                plainChild = AIPlayerUtils.getNextStateAdversarial(plainNode, move)
+                sharedChild = AIPlayerUtils.getNextStateAdversarial(sharedNode, move)
+                #descendants of a shareclone are shareclones too
+                assert sharedChild.sharedRecords is not None
+                nextFrontier.append((plainChild, sharedChild))
+        tree += nextFrontier
+        frontier = nextFrontier
+        for plainNode, sharedNode in tree:
+            assert stateSignature(sharedNode) == stateSignature(plainNode)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_shareclonesAreIsolatedThroughWritableRecords(seed):
+    rng = random.Random(seed)
+    parent = randomPlayState(seed).fastclone()
+    children = parent.shareclones(3)
+    before = stateSignature(parent)
+
+    child = children[0]
+    ant = child.writableAnt(rng.choice(child.inventories[PLAYER_ONE].ants))
+    ant.health += 1
+    hill = child.writableConstr(child.inventories[PLAYER_TWO].getAnthill())
+    hill.captureHealth -= 1
+    child.inventories[PLAYER_ONE].foodCount += 1
+
+    assert stateSignature(child) != before
+    assert stateSignature(parent) == before
+    for sibling in children[1:]:
+        assert stateSignature(sibling) == before
+
+
+def test_shareclonesShareRecordsWrittenDirectly():
+    #the documented caveat: taking a shareclone makes the parent
+    #copy-on-write too, so writing to a record directly changes it in every
+    #state that shares it
+    parent = randomPlayState(3).fastclone()
+    assert parent.sharedRecords is None
+    child = parent.shareclone()
+    assert parent.sharedRecords is not None
+    parent.inventories[PLAYER_ONE].ants[0].health += 1
+    assert stateSignature(child) == stateSignature(parent)
+    assert AIPlayerUtils.getNextState(parent, Move(END)).sharedRecords is not None
+
+    #unshare gives a state its own records again
+    parent = randomPlayState(3).fastclone()
+    child = parent.shareclone()
+    before = stateSignature(child)
+    parent.unshare()
+    parent.inventories[PLAYER_ONE].ants[0].health += 1
+    assert stateSignature(child) == before
+    assert stateSignature(parent) != before
@@ -0,0 +1,97 @@
+import random
+import pytest
+from Constants import *
+from Move import Move
+import AIPlayerUtils
+from Benchmark import randomPlayState
+
+#
+# test_LegalityOracle.py
+#
+# Checks that Game.isValidMove decides and reports every move the same way
+# with the LegalityOracle's quick check in front of the full checks as with
+# the full checks alone: legal moves, illegal ones and malformed ones, down
+# to the error messages printed.
+#
+
+SEEDS = range(150)
+
+#moves tried per state
+MOVES_PER_STATE = 60
+
+
+##
+# helper that stands in for the oracle and never accepts anything, so every
+# move goes through the full checks
+class _NeverAccepts(object):
+
+    def __init__(self, state):
+        self.state = state
+
+    def accepts(self, move):
+        return False
+
+
+##
+# helper that makes a random move to check: a legal one, a random path
+# (mostly starting at an ant), a random build or something malformed
+def _randomMove(state, legalMoves, rng):
+    kind = rng.random()
+    if kind < 0.3:
+        move = rng.choice(legalMoves)
+        coordList = None if move.coordList is None else list(move.coordList)
+        return Move(move.moveType, coordList, move.buildType)
+    if kind < 0.7:
+        if rng.random() < 0.7:
+            path = [rng.choice(state.inventories[rng.randint(0, 1)].ants).coords]
+        else:
+            path = [(rng.randint(-1, BOARD_LENGTH), rng.randint(-1, BOARD_LENGTH))]
+        for i in range(rng.randint(0, 4)):
+            step = rng.choice([(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (0, 0)])
+            path.append((path[-1][0] + step[0], path[-1][1] + step[1]))
+        return Move(MOVE_ANT, path, None)
+    if kind < 0.9:
+        if rng.random() < 0.7:
+            coords = rng.choice([constr.coords for inv in state.inventories for constr in inv.constrs])
+        else:
+            coords = (rng.randint(0, BOARD_LENGTH - 1), rng.randint(0, BOARD_LENGTH - 1))
+        coordList = [coords] if rng.random() < 0.9 else [coords, coords]
+        return Move(BUILD, coordList, rng.choice([None, QUEEN, WORKER, DRONE, SOLDIER, R_SOLDIER, -1, TUNNEL]))
+    return rng.choice([None,
+                       Move(MOVE_ANT, [[1, 2]], None),
+                       Move(MOVE_ANT, [(1, 2.0)], None),
+                       Move(MOVE_ANT, [(1, 2, 3)], None),
+                       Move(MOVE_ANT, [], None),
+                       Move(MOVE_ANT, (1, 2), None),
+                       Move(BUILD, [(1, 2)], "worker"),
+                       Move("move", [(1, 2)], None),
+                       Move(END, None, None)])
+
+##
+# helper that checks a move and returns the decision and what was printed
+def _check(game, move, capsys, oracle):
+    game.legalityOracle = oracle
+    capsys.readouterr()
+    result = game.isValidMove(move)
+    return result, capsys.readouterr().out
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_oracleChangesNoDecisionOrMessage(game, capsys, seed):
+    game, aiClasses = game
+    rng = random.Random(seed)
+    state = randomPlayState(seed)
+    if AIPlayerUtils.getWinner(state) is not None:
+        pytest.skip("the game is over")
+    game.state = state
+    #AI players have their errors printed
+    game.currentPlayers = [aiClasses["Random"](PLAYER_ONE), aiClasses["Random"](PLAYER_TWO)]
+    legalMoves = AIPlayerUtils.listAllLegalMoves(state)
+
+    for i in range(MOVES_PER_STATE):
+        move = _randomMove(state, legalMoves, rng)
+        #None makes isValidMove build a fresh oracle for the state
+        expected = _check(game, move, capsys, _NeverAccepts(state))
+        assert _check(game, move, capsys, None) == expected, str(move)
+    for move in legalMoves:
+        assert _check(game, move, capsys, None) == (True, ""), str(move)
@@ -0,0 +1,96 @@
+import pytest
+from Constants import *
+import AIPlayerUtils
+from Search import AlphaBetaSearch, WIN_SCORE
+from Benchmark import randomPlayState
+from stateHelpers import stateSignature, moveSignature
+
+#
+# test_Search.py
+#
+# Checks AlphaBetaSearch at a fixed depth: it returns one of the legal moves,
+# leaves the state it is given alone and finds the value a plain minimax
+# search over the same moves finds.
+#
+
+SEEDS = range(25)
+DEPTH = 2
+
+
+##
+# helper evaluation: food, ants and queen health
+def _evaluate(state, playerId):
+    score = 0.0
+    for inv in state.inventories[:2]:
+        sign = 1 if inv.player == playerId else -1
+        score += sign * (inv.foodCount + len(inv.ants))
+        queen = inv.getQueen()
+        if queen is not None:
+            score += sign * queen.health / 10.0
+    return score
+
+##
+# helper: the value of a state to the player me by minimax with no pruning,
+# scoring wins and losses the way the search does
+def _minimax(state, depth, ply, me):
+    winner = AIPlayerUtils.getWinner(state)
+    if winner is not None:
+        if (winner == 1) == (state.whoseTurn == me):
+            return WIN_SCORE - ply
+        return ply - WIN_SCORE
+    if depth == 0:
+        return _evaluate(state, me)
+    values = [_minimax(AIPlayerUtils.getNextStateAdversarial(state, move), depth - 1, ply + 1, me)
+              for move in AIPlayerUtils.listAllLegalMoves(state, False)]
+    return max(values) if state.whoseTurn == me else min(values)
+
+##
+# helper that skips the states a game has already been won in
+def _playState(seed):
+    state = randomPlayState(seed)
+    if AIPlayerUtils.getWinner(state) is not None:
+        pytest.skip("the game is over")
+    return state
+
+
+@pytest.mark.parametrize("canonicalOrder", [False, True], ids=["allOrders", "canonical"])
+@pytest.mark.parametrize("seed", SEEDS)
+def test_fixedDepthSearch(seed, canonicalOrder):
+    state = _playState(seed)
+    before = stateSignature(state)
+    search = AlphaBetaSearch(_evaluate, timeLimit=float("inf"), maxDepth=DEPTH, canonicalOrder=canonicalOrder)
+    move = search.search(state)
+
+    legalMoves = AIPlayerUtils.listAllLegalMoves(state, False)
+    assert moveSignature(move) in [moveSignature(legal) for legal in legalMoves]
+    assert stateSignature(state) == before
+    if len(legalMoves) == 1:
+        #nothing to choose between, so nothing is searched
+        assert search.stats.depth == 0
+        return
+    me = state.whoseTurn
+    expected = max(_minimax(AIPlayerUtils.getNextStateAdversarial(state, legal), DEPTH - 1, 1, me)
+                   for legal in legalMoves)
+    assert search.stats.score == pytest.approx(expected)
+    assert _minimax(AIPlayerUtils.getNextStateAdversarial(state, move), DEPTH - 1, 1, me) == \
+        pytest.approx(expected)
+    #a won game ends the deepening early
+    if abs(expected) < WIN_SCORE - DEPTH:
+        assert search.stats.depth == DEPTH
+
+@pytest.mark.parametrize("seed", SEEDS[:5])
+def test_searchChoosesBetweenRootMoves(seed):
+    state = _playState(seed)
+    rootMoves = AIPlayerUtils.listAllLegalMoves(state, False)[-3:]
+    search = AlphaBetaSearch(_evaluate, timeLimit=float("inf"), maxDepth=DEPTH)
+    move = search.search(state, rootMoves=rootMoves)
+    assert any(move is rootMove for rootMove in rootMoves)
+    #a single root move is still searched
+    assert search.search(state, rootMoves=rootMoves[:1]) is rootMoves[0]
+    assert search.stats.depth == DEPTH
+
+
+def test_emptyRootMovesRaises():
+    search = AlphaBetaSearch(_evaluate, maxDepth=DEPTH)
+    with pytest.raises(ValueError):
+        search.search(_playState(0), rootMoves=[])
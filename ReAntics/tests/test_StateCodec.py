@@ -0,0 +1,76 @@
+import pytest
+from Constants import *
+from Move import Move
+import AIPlayerUtils
+import StateCodec
+from CompactState import to_compact
+from Benchmark import randomPlayState
+from stateHelpers import stateSignature, moveSignature, randomSetupPhaseState
+
+#
+# test_StateCodec.py
+#
+# Checks that states and moves survive being encoded and decoded, whether
+# they are decoded from bytes, a bytearray or a memoryview, and when several
+# are packed into one buffer.
+#
+
+SEEDS = range(100)
+
+#what the tests decode from
+BUFFER_TYPES = [bytes, bytearray, memoryview]
+
+
+@pytest.mark.parametrize("bufferType", BUFFER_TYPES, ids=lambda bufferType: bufferType.__name__)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_stateRoundTrip(seed, bufferType):
+    state = randomPlayState(seed)
+    #the key is only encoded if the state has computed it
+    if seed % 2 == 0:
+        state.getZobristKey()
+    encoded = StateCodec.encode(state)
+    assert len(encoded) == StateCodec.encodedSize(state)
+
+    decoded = StateCodec.decode(bufferType(encoded))
+    assert stateSignature(decoded) == stateSignature(state)
+    assert decoded.zobristKey == state.zobristKey
+    #and the encoding of the same state as a CompactState
+    decoded = StateCodec.decode(bufferType(StateCodec.encode(to_compact(state))))
+    assert stateSignature(decoded) == stateSignature(state)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_setupPhaseStateRoundTrip(seed):
+    state = randomSetupPhaseState(seed)
+    decoded = StateCodec.decode(memoryview(StateCodec.encode(state)))
+    assert stateSignature(decoded) == stateSignature(state)
+
+
+@pytest.mark.parametrize("bufferType", BUFFER_TYPES, ids=lambda bufferType: bufferType.__name__)
+@pytest.mark.parametrize("seed", SEEDS[:20])
+def test_moveRoundTrip(seed, bufferType):
+    moves = AIPlayerUtils.listAllLegalMoves(randomPlayState(seed)) + [Move(END)]
+    for move in moves:
+        encoded = StateCodec.encode(move)
+        assert len(encoded) == StateCodec.encodedSize(move)
+        assert moveSignature(StateCodec.decode(bufferType(encoded))) == moveSignature(move)
+
+
+@pytest.mark.parametrize("seed", SEEDS[:20])
+def test_streamRoundTrip(seed):
+    #a state followed by its legal moves, all in one buffer
+    state = randomPlayState(seed)
+    moves = AIPlayerUtils.listAllLegalMoves(state)
+    buffer = bytearray(StateCodec.encodedSize(state) + sum(StateCodec.encodedSize(move) for move in moves))
+    offset = StateCodec.encodeInto(state, buffer)
+    for move in moves:
+        offset = StateCodec.encodeInto(move, buffer, offset)
+    assert offset == len(buffer)
+
+    view = memoryview(buffer)
+    decoded, offset = StateCodec.decodeFrom(view)
+    assert stateSignature(decoded) == stateSignature(state)
+    for move in moves:
+        decodedMove, offset = StateCodec.decodeFrom(view, offset)
+        assert moveSignature(decodedMove) == moveSignature(move)
+    assert offset == len(buffer)
@@ -0,0 +1,45 @@
+import pytest
+from Constants import *
+import AIPlayerUtils
+from StateView import StateView
+from Benchmark import randomPlayState
+from stateHelpers import stateSignature, moveSignature
+
+#
+# test_StateView.py
+#
+# Checks that a player sees the same thing, in the same order, through a
+# StateView as through the flipped clone the engine used to give it (see
+# Game.getPlayerState).
+#
+
+SEEDS = range(100)
+
+
+##
+# helper that describes what is on each cell of a board.  (The coords of the
+# grass and food on a flipped clone's board aren't flipped, as clone() gives
+# the board its own copies of them, so the cells are compared by what is on
+# them rather than by the coords of what is on them.)
+def _boardContents(state):
+    return tuple(tuple((None if loc.ant is None else (loc.ant.type, loc.ant.player),
+                        None if loc.constr is None else loc.constr.type)
+                       for loc in column) for column in state.board)
+
+
+@pytest.mark.parametrize("playerId", [PLAYER_ONE, PLAYER_TWO])
+@pytest.mark.parametrize("seed", SEEDS)
+def test_viewMatchesClone(seed, playerId):
+    state = randomPlayState(seed)
+    state.whoseTurn = playerId
+    view = StateView(state, playerId)
+    clone = state.clone()
+    if playerId == PLAYER_TWO:
+        clone.flipBoard()
+
+    assert stateSignature(view) == stateSignature(clone)
+    assert _boardContents(view) == _boardContents(clone)
+    assert view.getZobristKey() == clone.getZobristKey()
+    assert [moveSignature(move) for move in AIPlayerUtils.listAllLegalMoves(view)] == \
+        [moveSignature(move) for move in AIPlayerUtils.listAllLegalMoves(clone)]
+    assert stateSignature(view.fastclone()) == stateSignature(clone)
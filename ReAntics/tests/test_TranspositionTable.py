@@ -0,0 +1,91 @@
+import pytest
+from Constants import *
+import AIPlayerUtils
+import TranspositionTable as TT
+from Search import AlphaBetaSearch
+from Benchmark import randomPlayState
+from stateHelpers import moveSignature
+from test_Search import _evaluate
+
+#
+# test_TranspositionTable.py
+#
+# Checks that a TranspositionTable changes how much an AlphaBetaSearch has
+# to search but not the value it finds, and that the table stays within
+# the size it is given.
+#
+
+SEEDS = range(25)
+
+
+##
+# helper that finds the score of a fixed-depth search
+def _score(state, depth, table):
+    search = AlphaBetaSearch(_evaluate, timeLimit=float("inf"), maxDepth=depth, table=table)
+    move = search.search(state)
+    assert moveSignature(move) in [moveSignature(legal) for legal in AIPlayerUtils.listAllLegalMoves(state)]
+    return search.stats
+
+
+@pytest.mark.parametrize("depth", [2, 3])
+@pytest.mark.parametrize("seed", SEEDS)
+def test_tableDoesNotChangeTheScore(seed, depth):
+    state = randomPlayState(seed)
+    if len(AIPlayerUtils.listAllLegalMoves(state, False)) == 1:
+        pytest.skip("nothing to search")
+    expected = _score(state, depth, None)
+    #a roomy table and one so small its entries keep replacing each other
+    for table in (TT.TranspositionTable(), TT.TranspositionTable(sizeMB=0)):
+        stats = _score(state, depth, table)
+        assert stats.score == expected.score
+        assert stats.depth == expected.depth
+        assert table.stores > 0
+    #the same table again, now holding the last search's results
+    stats = _score(state, depth, table)
+    assert stats.score == expected.score
+
+
+@pytest.mark.parametrize("sizeMB", [0, 0.01, 1, 16])
+def test_tableSizeIsBounded(sizeMB):
+    table = TT.TranspositionTable(sizeMB)
+    assert table.buckets >= 1
+    if sizeMB > 0:
+        assert 2 * table.buckets * TT.ENTRY_BYTES <= sizeMB * 1024 * 1024
+    for key in range(6 * table.buckets):
+        table.store(key * 7919, key % 5, TT.EXACT, float(key), None)
+        assert len(table) <= 2 * table.buckets
+    assert len(table) == 2 * table.buckets
+    table.clear()
+    assert len(table) == 0
+
+
+def test_tableStaysBoundedDuringSearch():
+    table = TT.TranspositionTable(sizeMB=0.01)
+    for seed in SEEDS:
+        state = randomPlayState(seed)
+        _score(state, 3, table)
+        assert len(table) <= 2 * table.buckets
+    assert table.stores > 2 * table.buckets
+
+
+def test_replacement():
+    table = TT.TranspositionTable(sizeMB=0)
+    assert table.buckets == 1
+    table.store(1, 5, TT.EXACT, 1.0, None)
+    #a shallower result goes in the always-replace entry ...
+    table.store(2, 2, TT.LOWER_BOUND, 2.0, None)
+    table.store(3, 1, TT.UPPER_BOUND, 3.0, None)
+    assert table.probe(1)[TT.DEPTH] == 5
+    assert table.probe(2) is None
+    assert table.probe(3)[TT.VALUE] == 3.0
+    #... until a new search, when the deep entry gives way
+    table.newSearch()
+    table.store(4, 1, TT.EXACT, 4.0, None)
+    assert table.probe(1) is None
+    assert table.probe(4)[TT.VALUE] == 4.0
+    #storing a state again keeps its move if none is given
+    move = AIPlayerUtils.listAllLegalMoves(randomPlayState(1))[0]
+    table.store(4, 2, TT.EXACT, 5.0, move)
+    table.store(4, 3, TT.EXACT, 6.0, None)
+    assert table.probe(4)[TT.MOVE] is move
+    assert len(table) == 2
@@ -0,0 +1,52 @@
+import random
+import pytest
+from Constants import *
+import AIPlayerUtils
+import Zobrist
+from CompactState import to_compact
+from Benchmark import randomPlayState
+
+#
+# test_Zobrist.py
+#
+# Checks that the Zobrist keys getNextState, getNextStateAdversarial and
+# CompactState.nextState update incrementally are the keys computeKey works
+# out from scratch, after one move and after a long run of them.
+#
+
+SEEDS = range(60)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_keyAfterEveryMove(seed):
+    state = randomPlayState(seed)
+    compact = to_compact(state)
+    for move in AIPlayerUtils.listAllLegalMoves(state):
+        for adversarial in (False, True):
+            if adversarial:
+                child = AIPlayerUtils.getNextStateAdversarial(state, move)
+            else:
+                child = AIPlayerUtils.getNextState(state, move)
+            compactChild = compact.nextState(move, adversarial)
+            assert child.zobristKey == Zobrist.computeKey(child), (str(move), adversarial)
+            assert compactChild.zobristKey == Zobrist.computeKey(compactChild), (str(move), adversarial)
+            assert compactChild.zobristKey == child.zobristKey, (str(move), adversarial)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_keyAlongRandomGame(seed):
+    rng = random.Random(seed)
+    state = randomPlayState(seed, 0)
+    compact = to_compact(state)
+    for ply in range(150):
+        if AIPlayerUtils.getWinner(state) is not None:
+            break
+        move = rng.choice(AIPlayerUtils.listAllLegalMoves(state))
+        adversarial = rng.random() < 0.8
+        if adversarial:
+            state = AIPlayerUtils.getNextStateAdversarial(state, move)
+        else:
+            state = AIPlayerUtils.getNextState(state, move)
+        compact = compact.nextState(move, adversarial)
+        assert state.zobristKey == Zobrist.computeKey(state), "move %d (%s)" % (ply, move)
+        assert compact.zobristKey == state.zobristKey, "move %d (%s)" % (ply, move)
@@ -0,0 +1,86 @@
+import random
+import pytest
+from Constants import *
+from Ant import Ant
+from Move import Move
+import AIPlayerUtils
+import Zobrist
+from CompactState import to_compact
+from Benchmark import randomPlayState, randomSetupState
+from stateHelpers import stateSignature
+
+#
+# test_applyMove.py
+#
+# Checks AIPlayerUtils.applyMove and undoMove on GameStates and
+# CompactStates: applying a move gives what getNextStateAdversarial gives,
+# and undoing it restores the state and its Zobrist key exactly, one move
+# at a time and after a long run of moves.
+#
+
+SEEDS = range(60)
+
+
+##
+# helper that returns the state and its key so they can be compared later
+def _contents(state):
+    return stateSignature(state), state.getZobristKey()
+
+
+@pytest.mark.parametrize("compact", [False, True], ids=["GameState", "CompactState"])
+@pytest.mark.parametrize("seed", SEEDS)
+def test_undoEveryMove(seed, compact):
+    state = randomPlayState(seed)
+    if compact:
+        state = to_compact(state)
+    before = _contents(state)
+    for move in AIPlayerUtils.listAllLegalMoves(state):
+        expected = AIPlayerUtils.getNextStateAdversarial(state, move)
+        token = AIPlayerUtils.applyMove(state, move)
+        assert _contents(state) == _contents(expected), str(move)
+        assert state.getZobristKey() == Zobrist.computeKey(state), str(move)
+        AIPlayerUtils.undoMove(state, token)
+        assert _contents(state) == before, str(move)
+
+
+@pytest.mark.parametrize("compact", [False, True], ids=["GameState", "CompactState"])
+@pytest.mark.parametrize("seed", SEEDS)
+def test_undoRandomGame(seed, compact):
+    rng = random.Random(seed)
+    state = randomPlayState(seed, 0)
+    if compact:
+        state = to_compact(state)
+    tokens = []
+    history = []
+    for ply in range(80):
+        if AIPlayerUtils.getWinner(state) is not None:
+            break
+        history.append(_contents(state))
+        tokens.append(AIPlayerUtils.applyMove(state, rng.choice(AIPlayerUtils.listAllLegalMoves(state))))
+    while len(tokens) > 0:
+        AIPlayerUtils.undoMove(state, tokens.pop())
+        assert _contents(state) == history.pop(), "undoing move %d" % len(tokens)
+
+
+@pytest.mark.parametrize("compact", [False, True], ids=["GameState", "CompactState"])
+def test_tunnelBuildChangesNothing(compact):
+    #getNextState ignores tunnel builds, even with an enemy on the anthill
+    #(which other moves would take capture health from)
+    state = randomSetupState(random.Random(0))
+    hill = state.inventories[PLAYER_ONE].getAnthill()
+    queen = state.inventories[PLAYER_ONE].getQueen()
+    #(row 4 is empty after a random setup)
+    queen.coords = (0, 4)
+    state.inventories[PLAYER_TWO].ants.append(Ant(hill.coords, DRONE, PLAYER_TWO))
+    state.board = None
+    if compact:
+        state = to_compact(state)
+    before = _contents(state)
+    move = Move(BUILD, [state.inventories[PLAYER_ONE].ants[1].coords], TUNNEL)
+
+    token = AIPlayerUtils.applyMove(state, move)
+    assert _contents(state) == before
+    AIPlayerUtils.undoMove(state, token)
+    assert _contents(state) == before
+    assert _contents(AIPlayerUtils.getNextState(state, move)) == before
+    assert _contents(AIPlayerUtils.getNextStateAdversarial(state, move)) == before
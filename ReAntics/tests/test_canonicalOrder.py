@@ -0,0 +1,55 @@
+import pytest
+from Constants import *
+import AIPlayerUtils
+from Benchmark import randomPlayState
+
+#
+# test_canonicalOrder.py
+#
+# Checks that searching in canonical move order (see
+# AIPlayerUtils.canonicalMoves) loses nothing: from seeded random states
+# every position a turn can reach, and every position after its END, is
+# compared with and without the filter.
+#
+
+#the seeds of the random states (see Benchmark.randomPlayState)
+SEEDS = range(200)
+
+
+##
+# helper: every position one turn can reach from the state, with or without
+# the canonical order filter.  Returns the Zobrist keys of the positions
+# reached during the turn and the keys of the positions after END.
+def _turnPositions(state, canonical):
+    visited = set()
+    positions = set()
+    turnEnds = set()
+
+    def visit(constraint):
+        if (state.getZobristKey(), constraint) in visited:
+            return
+        visited.add((state.getZobristKey(), constraint))
+        positions.add(state.getZobristKey())
+        moves = AIPlayerUtils.listAllLegalMoves(state, False)
+        if canonical:
+            moves = AIPlayerUtils.canonicalMoves(state, moves, constraint)
+        for move in moves:
+            childConstraint = AIPlayerUtils.moveOrderConstraint(state, move) if canonical else None
+            token = AIPlayerUtils.applyMove(state, move)
+            if move.moveType == END:
+                turnEnds.add(state.getZobristKey())
+            else:
+                visit(childConstraint)
+            AIPlayerUtils.undoMove(state, token)
+
+    visit(None)
+    return positions, turnEnds
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_canonicalOrderReachesEveryTurnEnd(seed):
+    state = randomPlayState(seed)
+    positions, turnEnds = _turnPositions(state, False)
+    canonicalPositions, canonicalEnds = _turnPositions(state, True)
+    assert canonicalEnds == turnEnds
+    assert canonicalPositions == positions
@@ -0,0 +1,79 @@
+import random
+import pytest
+from Constants import *
+import AIPlayerUtils
+import Zobrist
+from CompactState import to_compact
+from Benchmark import randomPlayState
+from stateHelpers import stateSignature
+
+#
+# test_getNextStates.py
+#
+# Checks AIPlayerUtils.getNextStates: each child is what getNextState (or
+# getNextStateAdversarial) returns for its move, and changing one child
+# leaves the parent and the other children as they were.
+#
+
+SEEDS = range(60)
+
+
+@pytest.mark.parametrize("adversarial", [False, True], ids=["search", "adversarial"])
+@pytest.mark.parametrize("seed", SEEDS)
+def test_childrenMatchGetNextState(seed, adversarial):
+    state = randomPlayState(seed)
+    nextState = AIPlayerUtils.getNextStateAdversarial if adversarial else AIPlayerUtils.getNextState
+    moves = AIPlayerUtils.listAllLegalMoves(state)
+    for parent in (state.fastclone(), state.fastclone().shareclone(), to_compact(state)):
+        expected = [nextState(parent, move) for move in moves]
+        children = AIPlayerUtils.getNextStates(parent, moves, adversarial)
+        assert len(children) == len(moves)
+        for move, child, single in zip(moves, children, expected):
+            assert stateSignature(child) == stateSignature(single), str(move)
+            assert child.zobristKey == single.zobristKey == Zobrist.computeKey(child), str(move)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_changingOneChildLeavesTheOthers(seed):
+    rng = random.Random(seed)
+    parent = randomPlayState(seed).fastclone()
+    moves = AIPlayerUtils.listAllLegalMoves(parent)
+    children = AIPlayerUtils.getNextStates(parent, moves, True)
+    parentBefore = stateSignature(parent)
+    childrenBefore = [stateSignature(child) for child in children]
+
+    changed = rng.randrange(len(children))
+    child = children[changed]
+    #through the move rules, in place and into a grandchild ...
+    for i in range(3):
+        if AIPlayerUtils.getWinner(child) is not None:
+            break
+        move = rng.choice(AIPlayerUtils.listAllLegalMoves(child))
+        AIPlayerUtils.getNextStateAdversarial(child, move)
+        AIPlayerUtils.applyMove(child, move)
+    #... and by hand, through the copy-on-write helpers
+    for inv in child.inventories[:2]:
+        for ant in list(inv.ants):
+            child.writableAnt(ant).health += 1
+        inv.foodCount += 1
+    hill = child.writableConstr(child.inventories[PLAYER_ONE].getAnthill())
+    hill.captureHealth -= 1
+
+    assert stateSignature(child) != childrenBefore[changed]
+    assert stateSignature(parent) == parentBefore
+    for i in range(len(children)):
+        if i != changed:
+            assert stateSignature(children[i]) == childrenBefore[i], str(moves[i])
+
+
+def test_childrenShareRecordsWrittenDirectly():
+    #the documented caveat: the parent is copy-on-write after getNextStates,
+    #so a record written directly changes in every child that shares it
+    parent = randomPlayState(5).fastclone()
+    moves = AIPlayerUtils.listAllLegalMoves(parent)
+    children = AIPlayerUtils.getNextStates(parent, moves)
+    assert parent.sharedRecords is not None
+    queen = parent.inventories[PLAYER_TWO].getQueen()
+    queen.health += 1
+    for child in children:
+        assert child.inventories[PLAYER_TWO].getQueen().health == queen.health